@@ -0,0 +1,116 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Tuple
+from engine import Engine, Actions, GameEvent
+from brick import Brick
+from particles import ParticleSystem
+from scheduler import Animation
+
+
+class DropAnimation(Animation):
+    """Animates a brick dropping to bottom of screen.  The engine's drop action then scores and locks it."""
+
+    def __init__(self, engine: Engine, rows_per_second: float = 90.0) -> None:
+        """Class constructor."""
+        super().__init__()
+        self.__engine: Engine = engine
+        self.__rows_per_second: float = rows_per_second
+        self.__rows: float = 0.0
+
+    def tick(self, seconds: float) -> List[GameEvent]:
+        """Moves the brick down its share of rows for this tick.  Returns the drop's events once it hits bottom."""
+        self.__rows += self.__rows_per_second * seconds
+        while self.__rows >= 1.0:
+            self.__rows -= 1.0
+            if self.__engine.matrix.move_brick_down():
+                self.finish()
+                return self.__engine.step(Actions.Drop)
+        return []
+
+
+class DropTrailAnimation(Animation):
+    """Streak left behind by an instant hard drop, shrinking down onto the landed brick over a few ticks.  Purely
+    visual, so play carries on while it runs."""
+
+    blocking = False
+
+    def __init__(self, brick: Brick, distance: int, ticks: int = 8) -> None:
+        """Class constructor.  Called before the brick falls DISTANCE rows."""
+        super().__init__()
+        left = brick.x
+        top = brick.y
+        landed = {(left + x, top + y + distance) for x, y in brick.cells}
+        cells = {(left + x, top + y + d) for x, y in brick.cells for d in range(0, distance)}
+        self.__cells: List[Tuple[int, int]] = sorted((x for x in cells - landed if x[1] > 0), key=lambda x: x[1])
+        self.__color_index: int = brick.color_index
+        self.__ticks: int = ticks
+        self.__ticks_left: int = ticks
+        self.__first: int = 0
+
+    @property
+    def cells(self) -> List[Tuple[int, int]]:
+        """Returns (x, y) matrix spaces the trail still covers."""
+        return self.__cells[self.__first:]
+
+    @property
+    def color_index(self) -> int:
+        """Returns palette index of the dropped brick's color."""
+        return self.__color_index
+
+    def tick(self, seconds: float) -> List[GameEvent]:
+        """Shrinks the trail from the top, finishes once it's gone."""
+        self.__ticks_left -= 1
+        self.__first = len(self.__cells) - ((len(self.__cells) * self.__ticks_left) // self.__ticks)
+        if self.__ticks_left <= 0:
+            self.finish()
+        return []
+
+
+class EraseRowsAnimation(Animation):
+    """Animates erasure of filled rows, a few columns per tick.  The engine then clears them and spawns the next brick."""
+
+    def __init__(self, engine: Engine, rows: List[int], columns_per_tick: int = 2) -> None:
+        """Class constructor."""
+        super().__init__()
+        self.__engine: Engine = engine
+        self.__rows: List[int] = rows
+        self.__columns_per_tick: int = columns_per_tick
+        self.__column: int = 1
+
+    def tick(self, seconds: float) -> List[GameEvent]:
+        """Erases the next columns of the filled rows.  Returns the clear's events once all are erased."""
+        matrix = self.__engine.matrix
+        for _ in range(0, self.__columns_per_tick):
+            for y in self.__rows:
+                matrix.set_cell_index(self.__column, y, 0, 0)
+            self.__column += 1
+            if self.__column >= matrix.width - 1:
+                self.finish()
+                return self.__engine.clear_rows()
+        return []
+
+
+class ExplosionAnimation(Animation):
+    """Animates exploding matrix spaces flying off screen, used on game over."""
+
+    def __init__(self, particles: ParticleSystem, frame_rate: float = 30.0) -> None:
+        """Class constructor.  Particles move as they did when drawn once per frame at FRAME_RATE: each frame
+        by their motion vector times seconds since the explosion started."""
+        super().__init__()
+        self.__particles: ParticleSystem = particles
+        self.__frame_rate: float = frame_rate
+        self.__time: float = 0.0
+
+    @property
+    def particles(self) -> ParticleSystem:
+        """Returns the exploding particles."""
+        return self.__particles
+
+    def tick(self, seconds: float) -> List[GameEvent]:
+        """Moves particles, finishes once all are off screen."""
+        self.__time += seconds
+        if self.__particles.step(self.__time * seconds * self.__frame_rate) == 0:
+            self.finish()
+        return []
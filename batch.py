@@ -0,0 +1,177 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Dict, Tuple, Optional, NamedTuple, Iterator, Callable, Union
+from multiprocessing import Pool
+from time import perf_counter
+import argparse
+import json
+import os
+from engine import Engine, GameEvent
+from game_stats import GameStats
+from pieces import GENERATORS
+from simulation import Simulation
+from replay import Replay
+from bot import Bot
+
+
+class Settings(NamedTuple):
+    """Rules and limits every game in a batch is played with."""
+    generator: str                              # piece generator name, see pieces.GENERATORS
+    drop_intervals: Optional[List[float]]       # brick drop interval (seconds) for each level, or standard
+    line_points: Optional[Dict[int, int]]       # points for clearing 1-4 rows at once, or standard
+    max_ticks: int                              # games still going after this many ticks are stopped
+    lookahead: bool                             # bot looks ahead to the next brick
+    beam: Optional[int]                         # best placements the bot rescores with lookahead, or all
+
+
+# advances a game one tick, returning its events
+Step = Callable[[], List[GameEvent]]
+
+
+class GameResult(NamedTuple):
+    """Outcome of one game."""
+    game: str           # seed, or replay file
+    score: int
+    lines: int
+    level: int
+    pieces: int         # bricks placed
+    ticks: int          # game length
+    topped_out: int     # 1 if the game ended, 0 if stopped at max ticks
+    singles: int
+    doubles: int
+    triples: int
+    quads: int
+
+
+def play(simulation: Simulation, game: str, step: Step, done: Callable[[], bool], max_ticks: int) -> GameResult:
+    """Plays a started game until DONE or max ticks, STEP advancing it a tick.  Returns its result."""
+    clears = [0, 0, 0, 0, 0]
+    pieces = 0
+    while (not done()) and (simulation.ticks < max_ticks):
+        for event in step():
+            if event.event_type == GameEvent.BrickLocked:
+                pieces += 1
+            elif event.event_type == GameEvent.RowsFilled:
+                clears[min(len(event.rows), 4)] += 1
+    engine = simulation.engine
+    stats = engine.stats
+    return GameResult(game, stats.current_score, stats.lines, stats.level, pieces, simulation.ticks,
+                      1 if engine.game_over else 0, clears[1], clears[2], clears[3], clears[4])
+
+
+def play_bot(seed: int, settings: Settings) -> GameResult:
+    """Plays a seeded game with the bot.  Returns its result."""
+    engine = Engine(GameStats(False), auto_clear=False, drop_intervals=settings.drop_intervals,
+                    generator=GENERATORS[settings.generator](seed), line_points=settings.line_points)
+    simulation = Simulation(engine)
+    simulation.new_game(GameStats(False), seed)
+    bot = Bot(lookahead=settings.lookahead, beam=settings.beam)
+
+    def step() -> List[GameEvent]:
+        """Lets the bot act whenever play isn't held up, then ticks."""
+        if not simulation.scheduler.busy:
+            simulation.push(bot.next_action(engine.matrix))
+        return simulation.tick()
+
+    def done() -> bool:
+        """Returns true once the game is over."""
+        return simulation.engine.game_over and not simulation.scheduler.busy
+
+    return play(simulation, str(seed), step, done, settings.max_ticks)
+
+
+def play_replay(path: str, settings: Settings) -> GameResult:
+    """Plays a recorded game's inputs, under the batch's drop intervals and line points if given.  Returns its result."""
+    playback = Replay.load(path).playback(drop_intervals=settings.drop_intervals, line_points=settings.line_points)
+    return play(playback.simulation, path, playback.tick, lambda: playback.done, settings.max_ticks)
+
+
+def run_chunk(job: Tuple[List[Union[int, str]], Settings]) -> List[GameResult]:
+    """Plays a chunk of games in a worker: seeds are bot games, strings replay files.  Returns their results
+    together, so each chunk costs one message back to the parent."""
+    games, settings = job
+    return [play_replay(x, settings) if isinstance(x, str) else play_bot(x, settings) for x in games]
+
+
+def chunks(games: List[Union[int, str]], size: int, settings: Settings) -> Iterator[Tuple[List[Union[int, str]], Settings]]:
+    """Yields jobs of at most SIZE games."""
+    for i in range(0, len(games), size):
+        yield games[i:i + size], settings
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Returns the nearest-rank percentile of a sorted list of values."""
+    if len(values) == 0:
+        return 0.0
+    return values[int(round((percent / 100.0) * (len(values) - 1)))]
+
+
+def summary(results: List[GameResult]) -> List[Tuple[str, float, float, float, float, float]]:
+    """Returns (column, mean, min, median, p95, max) rows of each numeric result column."""
+    rows = []
+    for i, column in enumerate(GameResult._fields):
+        if column == "game":
+            continue
+        values = sorted(float(x[i]) for x in results)
+        mean = sum(values) / len(values) if len(values) > 0 else 0.0
+        rows.append((column, mean, values[0] if values else 0.0, percentile(values, 50), percentile(values, 95), values[-1] if values else 0.0))
+    return rows
+
+
+def write_results(path: str, results: List[GameResult]) -> None:
+    """Writes results one column per field: JSON arrays if the path ends in .json, else CSV."""
+    with open(path, "w") as file:
+        if path.lower().endswith(".json"):
+            json.dump({column: [x[i] for x in results] for i, column in enumerate(GameResult._fields)}, file)
+        else:
+            file.write(",".join(GameResult._fields) + "\n")
+            for result in results:
+                file.write(",".join(str(x) for x in result) + "\n")
+
+
+def main() -> None:
+    """Plays a batch of games across worker processes, prints a summary."""
+    parser = argparse.ArgumentParser(description="Plays Bricker games headlessly across processes, reports statistics.")
+    parser.add_argument("replays", metavar="REPLAY", nargs="*", help="replay files to play, instead of bot games")
+    parser.add_argument("--games", type=int, default=100, help="bot games to play (default 100)")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first bot game, one more for each after")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default one per core)")
+    parser.add_argument("--chunk", type=int, default=10, help="games per worker job (default 10)")
+    parser.add_argument("--bag", action="store_true", help="deal pieces from shuffled bags of all seven shapes")
+    parser.add_argument("--no-lookahead", action="store_true", help="bot ignores the next brick")
+    parser.add_argument("--beam", type=int, metavar="N", help="bot rescores only its best N placements with lookahead (default all)")
+    parser.add_argument("--max-ticks", type=int, default=60 * 60 * 10, help="stop games after this many ticks (default ten minutes)")
+    parser.add_argument("--drop-intervals", metavar="SECONDS", help="comma separated drop interval of each level")
+    parser.add_argument("--line-points", metavar="POINTS", help="comma separated points for clearing 1-4 rows")
+    parser.add_argument("--results", metavar="FILE", help="write per game results to FILE (.csv or .json)")
+    args = parser.parse_args()
+
+    # settings
+    drop_intervals = [float(x) for x in args.drop_intervals.split(",")] if args.drop_intervals else None
+    line_points = dict(enumerate((int(x) for x in args.line_points.split(",")), 1)) if args.line_points else None
+    settings = Settings("bag" if args.bag else "random", drop_intervals, line_points, args.max_ticks, not args.no_lookahead, args.beam)
+    games: List[Union[int, str]] = list(args.replays) if len(args.replays) > 0 else [args.seed + x for x in range(0, args.games)]
+
+    # play, results arrive a chunk at a time
+    start = perf_counter()
+    results: List[GameResult] = []
+    with Pool(max(args.workers, 1)) as pool:
+        for chunk in pool.imap_unordered(run_chunk, chunks(games, max(args.chunk, 1), settings)):
+            results += chunk
+    seconds = perf_counter() - start
+
+    # report
+    print("{0} games in {1:.1f}s, {2:.1f} games/s, {3:.0f} ticks/s".format(
+        len(results), seconds, len(results) / seconds, sum(x.ticks for x in results) / seconds))
+    print("{0:<12}{1:>12}{2:>12}{3:>12}{4:>12}{5:>12}".format("", "mean", "min", "median", "p95", "max"))
+    for column, mean, low, median, p95, high in summary(results):
+        print("{0:<12}{1:>12.1f}{2:>12.0f}{3:>12.0f}{4:>12.0f}{5:>12.0f}".format(column, mean, low, median, p95, high))
+    if args.results is not None:
+        write_results(args.results, results)
+
+
+# start main function
+if __name__ == "__main__":
+    main()
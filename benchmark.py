@@ -0,0 +1,391 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Callable, Tuple, Dict, Any, Optional
+from random import Random
+from timeit import Timer
+from time import perf_counter
+import argparse
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from matrix import Matrix
+from brick import Brick
+from color import Color, Colors, PALETTE
+from engine import Engine, Actions
+from game_stats import GameStats, HighScore
+from simulation import Simulation
+from pieces import RandomGenerator
+from bot import Bot
+from vector_env import VectorEnv, numpy
+
+
+def time_call(func: Callable[[], object], number: int = 20000, repeat: int = 5) -> float:
+    """Returns best time per call, in microseconds."""
+    best = min(Timer(func).repeat(repeat, number))
+    return (best / number) * 1000000.0
+
+
+def time_with_setup(setup: Callable[[], Any], func: Callable[[Any], object], number: int = 2000) -> float:
+    """Returns median time per call, in microseconds, of a call that needs fresh state from an untimed setup."""
+    times = []
+    for _ in range(0, number):
+        state = setup()
+        start = perf_counter()
+        func(state)
+        times.append(perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000000.0
+
+
+def fill_rows(matrix: Matrix, seed: int, top: int) -> Matrix:
+    """Starts a seeded game on a matrix, then fills rows top to 20, one seeded gap per row, and spawns a brick.  Returns the matrix."""
+    generator = Random(seed)
+    matrix.new_game(seed)
+    for y in range(top, 21):
+        gap = generator.randint(1, 10)
+        for x in range(1, 11):
+            if x != gap:
+                matrix.set_cell(x, y, 1, Colors.Independence)
+    matrix.spawn_brick()
+    return matrix
+
+
+def empty_matrix(seed: int) -> Matrix:
+    """Returns an empty matrix with a seeded live brick."""
+    return fill_rows(Matrix(), seed, 21)
+
+
+def half_full_matrix(seed: int) -> Matrix:
+    """Returns a seeded matrix with the bottom ten rows filled, one gap per row."""
+    return fill_rows(Matrix(), seed, 11)
+
+
+def near_topout_matrix(seed: int) -> Matrix:
+    """Returns a seeded matrix with all but the top three rows filled, one gap per row."""
+    return fill_rows(Matrix(), seed, 4)
+
+
+def solid_rows_matrix(seed: int) -> Matrix:
+    """Returns a half full matrix with four of its rows solid, ready to be cleared."""
+    matrix = half_full_matrix(seed)
+    for y in (14, 16, 17, 20):
+        for x in range(1, 11):
+            matrix.set_cell(x, y, 1, Colors.TuftsBlue)
+    return matrix
+
+
+FIXTURES: Dict[str, Callable[[int], Matrix]] = {
+    "empty": empty_matrix,
+    "half_full": half_full_matrix,
+    "near_topout": near_topout_matrix
+}
+
+
+def legacy_collision(brick: Brick, matrix: List[List[int]]) -> bool:
+    """Reference list-of-lists collision check, as used before the bitboard."""
+    for x in range(0, brick.width):
+        for y in range(0, brick.height):
+            if (brick.grid[x][y] == 1) and (matrix[x + brick.x][y + brick.y] == 1):
+                return True
+    return False
+
+
+def legacy_identify_solid_rows(matrix: List[List[int]]) -> List[int]:
+    """Reference list-of-lists solid row scan, as used before the bitboard."""
+    rows_to_erase = []
+    for y in range(1, 21):
+        solid = True
+        for x in range(1, 11):
+            if matrix[x][y] != 1:
+                solid = False
+        if solid:
+            rows_to_erase.append(y)
+    return rows_to_erase
+
+
+def bench_bitboard() -> List[Tuple[str, float, float]]:
+    """Times list-of-lists versus bitboard matrix operations.  Returns (name, list usec, bitboard usec) rows."""
+    matrix = half_full_matrix(1)
+    bricks = [Brick(shape_num) for shape_num in range(1, 8)]
+    return [
+        ("collision (7 bricks)",
+         time_call(lambda: [legacy_collision(x, matrix.matrix) for x in bricks]),
+         time_call(lambda: [x.collision(matrix.rows) for x in bricks])),
+        ("identify_solid_rows",
+         time_call(lambda: legacy_identify_solid_rows(matrix.matrix)),
+         time_call(matrix.identify_solid_rows))
+    ]
+
+
+class LegacyColor:
+    """Reference color, as before it was a tuple: a __dict__ and a property per field."""
+
+    def __init__(self, r: int, g: int, b: int) -> None:
+        """Class constructor."""
+        self.__r = r
+        self.__g = g
+        self.__b = b
+
+    @property
+    def value(self) -> Tuple[int, int, int]:
+        """Returns the RGB values as a Tuple, built on each call."""
+        return self.__r, self.__g, self.__b
+
+
+class LegacyBrick:
+    """Reference brick, as before it was slotted."""
+
+    def __init__(self, shape_num: int) -> None:
+        """Class constructor."""
+        self.__shape_num: int = shape_num
+        self.__rotation: int = 0
+        self.__x: int = 4
+        self.__y: int = 0
+
+    @property
+    def x(self) -> int:
+        """Returns X position of brick."""
+        return self.__x
+
+    @property
+    def y(self) -> int:
+        """Returns Y position of brick."""
+        return self.__y
+
+
+class LegacyHighScore:
+    """Reference high score, as before it was a tuple."""
+
+    def __init__(self, initials: str, score: int) -> None:
+        """Class constructor."""
+        self.__initials: str = initials
+        self.__score: int = score
+
+
+def legacy_board_frame(brick: LegacyBrick, colors: List[LegacyColor], spaces: List[Tuple[int, int]]) -> List[Tuple[int, int, Tuple[int, int, int]]]:
+    """Reference per-frame pass over a full board, reading brick position and color value per space."""
+    return [(brick.x + x, brick.y + y, colors[x].value) for x, y in spaces]
+
+
+def board_frame(brick: Brick, colors: Tuple[Color, ...], spaces: List[Tuple[int, int]]) -> List[Tuple[int, int, Tuple[int, int, int]]]:
+    """Per-frame pass over a full board, brick position read once and colors used as the tuples they are."""
+    left = brick.x
+    top = brick.y
+    return [(left + x, top + y, colors[x]) for x, y in spaces]
+
+
+def allocated(build: Callable[[], object]) -> int:
+    """Returns bytes still allocated by what BUILD returns."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def bench_slots() -> Tuple[List[Tuple[str, float, float]], List[Tuple[str, int, int]]]:
+    """Times a full board's per-frame attribute reads, and measures memory, of dict-backed versus slotted and tuple
+    value types.  Returns (name, legacy usec, slotted usec) and (name, legacy bytes, slotted bytes) rows."""
+    spaces = [(x, y) for x in range(1, 11) for y in range(1, 21)]
+    legacy_colors = [LegacyColor(*x) for x in PALETTE]
+    legacy_brick = LegacyBrick(3)
+    brick = Brick(3)
+    times = [
+        ("color value (200 spaces)",
+         time_call(lambda: [legacy_colors[x].value for x, _ in spaces], 2000),
+         time_call(lambda: [PALETTE[x].value for x, _ in spaces], 2000)),
+        ("board frame (200 spaces)",
+         time_call(lambda: legacy_board_frame(legacy_brick, legacy_colors, spaces), 2000),
+         time_call(lambda: board_frame(brick, PALETTE, spaces), 2000))
+    ]
+    memory = [
+        ("color (200 spaces)",
+         allocated(lambda: [LegacyColor(x, y, 0) for x, y in spaces]),
+         allocated(lambda: [Color(x, y, 0) for x, y in spaces])),
+        ("brick (200 bricks)",
+         allocated(lambda: [LegacyBrick(3) for _ in spaces]),
+         allocated(lambda: [Brick(3) for _ in spaces])),
+        ("high score (200 scores)",
+         allocated(lambda: [LegacyHighScore("AAA", x * 1000 + y) for x, y in spaces]),
+         allocated(lambda: [HighScore("AAA", x * 1000 + y) for x, y in spaces]))
+    ]
+    return times, memory
+
+
+def rotate_all(bricks: List[Brick], rows: List[int]) -> None:
+    """Rotates each brick once."""
+    for brick in bricks:
+        brick.rotate(rows)
+
+
+def play_game(engine: Engine, seed: int, max_steps: int, on_step: Optional[Callable[[Engine], None]] = None) -> int:
+    """Plays a scripted game from a seed: random moves, then a drop.  Returns steps taken."""
+    generator = Random(seed)
+    engine.new_game(seed=seed)
+    steps = 0
+    while (not engine.game_over) and (steps < max_steps):
+        action = generator.choice((Actions.Left, Actions.Right, Actions.Rotate, Actions.Down, Actions.Nothing, Actions.Drop))
+        engine.step(action, 0.1)
+        if on_step is not None:
+            on_step(engine)
+        steps += 1
+    return steps
+
+
+def play_bot_game(seed: int, max_ticks: int) -> int:
+    """Plays a seeded game with the bot, at full speed.  Returns lines cleared."""
+    simulation = Simulation(Engine(GameStats(False), auto_clear=False, generator=RandomGenerator(seed)))
+    simulation.new_game(seed=seed)
+    bot = Bot()
+    while (simulation.scheduler.busy or not simulation.engine.game_over) and (simulation.ticks < max_ticks):
+        if not simulation.scheduler.busy:
+            simulation.push(bot.next_action(simulation.engine.matrix))
+        simulation.tick()
+    return simulation.engine.stats.lines
+
+
+def bench_engine(seed: int, quick: bool) -> Dict[str, float]:
+    """Times matrix and brick hot paths on each fixture.  Returns microseconds per call, by name."""
+    number = 2000 if quick else 20000
+    results = {}
+    for name, fixture in FIXTURES.items():
+        matrix = fixture(seed)
+        rows = matrix.rows
+        bricks = [Brick(shape_num) for shape_num in range(1, 8)]
+        results["collision/" + name] = time_call(lambda: [x.collision(rows) for x in bricks], number)
+        results["rotate/" + name] = time_call(lambda: rotate_all(bricks, rows), number)
+        results["spawn_brick/" + name] = time_call(matrix.spawn_brick, number)
+        results["identify_solid_rows/" + name] = time_call(matrix.identify_solid_rows, number)
+        results["add_brick_to_matrix/" + name] = time_with_setup(lambda: fixture(seed), lambda x: x.add_brick_to_matrix(), number // 10)
+        results["bot_choose/" + name] = time_with_setup(Bot, lambda x: x.choose(matrix), number // 100)
+    results["clear_rows/solid_rows"] = time_with_setup(lambda: solid_rows_matrix(seed),
+                                                       lambda x: x.clear_rows(x.identify_solid_rows()), number // 10)
+    results["game/headless"] = time_with_setup(lambda: Engine(GameStats(False)), lambda x: play_game(x, seed, 2000), 5 if quick else 20)
+    results["game/bot"] = time_with_setup(lambda: seed, lambda x: play_bot_game(x, 3000), 2 if quick else 5)
+    if numpy is not None:
+        env = VectorEnv(256, seed)
+        actions = numpy.random.default_rng(seed).integers(0, 6, (100, 256))
+        results["vector_env/step_256"] = time_call(lambda: [env.step(x) for x in actions], 2 if quick else 10) / 100
+    return results
+
+
+def bench_renderer(seed: int, quick: bool) -> Dict[str, float]:
+    """Times renderer hot paths on each fixture, drawing to an offscreen dummy display.  Returns microseconds per call, by name."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from pygame.time import Clock
+    from renderer import Renderer
+    pygame.init()
+    screen = pygame.display.set_mode((1000, 700))
+    renderer = Renderer("1.0", (1000, 700), screen, Clock())
+    stats = GameStats(False)
+    number = 50 if quick else 500
+    results = {}
+    for name, fixture in FIXTURES.items():
+        matrix = fixture(seed)
+        renderer.draw_matrix(matrix)
+        results["draw_matrix/" + name] = time_call(lambda: renderer.draw_matrix(matrix), number)
+        results["draw_frame/" + name] = time_call(lambda: renderer.draw_frame(matrix, stats, None), number)
+        results["update_frame/" + name] = time_call(lambda: renderer.update_frame(matrix, stats, None), number)
+    results["game/rendered"] = time_with_setup(
+        lambda: Engine(GameStats(False)),
+        lambda x: play_game(x, seed, 500, lambda engine: renderer.update_frame(engine.matrix, engine.stats, None)),
+        2 if quick else 5)
+    pygame.quit()
+    return results
+
+
+def run_suite(seed: int, quick: bool, headless_only: bool) -> Dict[str, Any]:
+    """Runs every benchmark.  Returns JSON-ready results with run details."""
+    results = bench_engine(seed, quick)
+    if not headless_only:
+        results.update(bench_renderer(seed, quick))
+    return {
+        "meta": {
+            "seed": seed,
+            "quick": quick,
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[Tuple[str, float, float, float]]:
+    """Returns (name, baseline usec, usec, percent change) of benchmarks slower than baseline by more than THRESHOLD percent."""
+    regressions = []
+    for name, after in results.items():
+        before = baseline.get(name)
+        if (before is not None) and (before > 0):
+            change = ((after - before) / before) * 100.0
+            if change > threshold:
+                regressions.append((name, before, after, change))
+    return regressions
+
+
+def main() -> None:
+    """Runs benchmarks, prints results."""
+    parser = argparse.ArgumentParser(description="Bricker engine and renderer benchmarks.")
+    parser.add_argument("--seed", type=int, default=1, help="fixture and game script seed")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for a fast sanity run")
+    parser.add_argument("--headless", action="store_true", help="skip renderer benchmarks")
+    parser.add_argument("--json", metavar="FILE", help="write results to FILE as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against saved JSON results, exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slowdown counted as a regression (default 10)")
+    parser.add_argument("--bitboard", action="store_true", help="print list-of-lists versus bitboard comparison instead")
+    parser.add_argument("--slots", action="store_true", help="print dict-backed versus slotted value type comparison instead")
+    args = parser.parse_args()
+
+    # legacy comparison
+    if args.bitboard:
+        print("{0:<24}{1:>12}{2:>12}{3:>10}".format("bitboard", "list usec", "bits usec", "speedup"))
+        for name, before, after in bench_bitboard():
+            print("{0:<24}{1:>12.2f}{2:>12.2f}{3:>9.1f}x".format(name, before, after, before / after))
+        return
+    if args.slots:
+        times, memory = bench_slots()
+        print("{0:<28}{1:>12}{2:>12}{3:>10}".format("slots", "dict usec", "slot usec", "speedup"))
+        for name, before, after in times:
+            print("{0:<28}{1:>12.2f}{2:>12.2f}{3:>9.1f}x".format(name, before, after, before / after))
+        print("{0:<28}{1:>12}{2:>12}{3:>10}".format("", "dict bytes", "slot bytes", "saved"))
+        for name, before, after in memory:
+            print("{0:<28}{1:>12,}{2:>12,}{3:>9.0f}%".format(name, before, after, ((before - after) / before) * 100.0))
+        return
+
+    # run, print
+    suite = run_suite(args.seed, args.quick, args.headless)
+    baseline: Dict[str, float] = {}
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)["results"]
+    print("{0:<32}{1:>14}{2:>14}{3:>10}".format("benchmark", "usec", "baseline", "change"))
+    for name, after in suite["results"].items():
+        saved = baseline.get(name)
+        if (saved is not None) and (saved > 0):
+            print("{0:<32}{1:>14.2f}{2:>14.2f}{3:>+9.1f}%".format(name, after, saved, ((after - saved) / saved) * 100.0))
+        else:
+            print("{0:<32}{1:>14.2f}".format(name, after))
+
+    # save
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(suite, file, indent=1)
+
+    # regressions?
+    if args.baseline is not None:
+        regressions = compare(suite["results"], baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print("REGRESSION {0}: {1:.2f} -> {2:.2f} usec ({3:+.1f}%)".format(name, before, after, change))
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+# start main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Iterable, Sequence, Tuple
+
+
+# Each matrix row is stored as an int bitmask, bit (x + PAD) set when column x is solid.  Columns
+# 0 and 11 are the side walls, and PAD extra solid bits on each side keep brick masks from ever
+# being shifted negative or off the board when a brick is nudged past the walls.
+PAD = 4
+MATRIX_WIDTH = 12
+ROW_BITS = MATRIX_WIDTH + (PAD * 2)
+FULL_ROW = (1 << ROW_BITS) - 1
+EMPTY_ROW = FULL_ROW & ~(((1 << (MATRIX_WIDTH - 2)) - 1) << (PAD + 1))
+
+
+def cell_bit(x: int) -> int:
+    """Returns the row bit of matrix column X."""
+    return 1 << (x + PAD)
+
+
+def row_mask(columns: Iterable[int]) -> int:
+    """Returns a row bitmask with the specified columns set, unshifted (bit 0 is column 0)."""
+    mask = 0
+    for x in columns:
+        mask |= 1 << x
+    return mask
+
+
+def grid_row_masks(grid: Sequence[Sequence[int]], width: int, height: int) -> Tuple[Tuple[int, int], ...]:
+    """Returns (row, mask) pairs for each non-empty row of a brick grid, unshifted."""
+    masks = []
+    for y in range(0, height):
+        mask = row_mask(x for x in range(0, width) if grid[x][y] == 1)
+        if mask != 0:
+            masks.append((y, mask))
+    return tuple(masks)
+
+
+def collides(rows: List[int], row_masks: Tuple[Tuple[int, int], ...], x: int, y: int) -> bool:
+    """Returns true if brick row masks placed at X/Y overlap a solid bit, or leave the matrix."""
+    shift = x + PAD
+    if shift < 0:
+        return True
+    height = len(rows)
+    for i, mask in row_masks:
+        row = y + i
+        shifted = mask << shift
+        if (row < 0) or (row >= height) or (shifted > FULL_ROW) or (rows[row] & shifted):
+            return True
+    return False
@@ -0,0 +1,529 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3
+
+Placement-search bot.  Every final placement the live brick can reach (slides, tucks and kicks included) is
+scored by weighted board features.  With lookahead, each placement, or only the best BEAM of them if a beam
+is set, is rescored by the best straight drop of the next brick; the next brick's slides and tucks aren't
+searched."""
+
+from typing import List, Tuple, Dict, Optional, NamedTuple
+from collections import deque
+from brick import Brick, SHAPES, ROTATION_KICKS
+from matrix import Matrix
+from engine import Actions
+from transposition import TranspositionTable, LRUTable
+import bitboard
+import zobrist
+
+
+class Weights(NamedTuple):
+    """Heuristic weights of board features, higher scores are better."""
+    height: float       # sum of column heights
+    lines: float        # lines cleared
+    holes: float        # empty spaces with a solid space above
+    bumpiness: float    # sum of height differences between neighboring columns
+
+
+DEFAULT_WEIGHTS = Weights(height=-0.510066, lines=0.760666, holes=-0.35663, bumpiness=-0.184483)
+
+
+class Drop(NamedTuple):
+    """A shape a brick can be dropped straight down in, its row bits shifted so the topmost solid space is bit 0."""
+    columns: Tuple[Tuple[int, int], ...]  # (bit length, row bits) of each column, left to right
+    lows: int  # sum of each column's topmost solid space
+    spaces: int  # solid spaces
+    bumpiness: int  # bumpiness between its own columns, once landed
+    first: int  # topmost solid space of its left column
+    last: int  # topmost solid space of its right column
+
+
+class Placement(NamedTuple):
+    """A final resting place of a brick, and the heuristic score of the board it leaves."""
+    shape_num: int
+    rotation: int
+    x: int
+    y: int
+    score: float
+
+
+# Search states are packed into one int: rotation, then x and y each offset by PAD so they're never negative.
+_X_RANGE = bitboard.MATRIX_WIDTH + (bitboard.PAD * 2)
+_FLOOR = 21
+_VISIBLE = ((1 << 20) - 1) << 1        # column bits of visible rows 1-20
+_KICKS = tuple((x << 6) + y for x, y in ROTATION_KICKS)
+
+
+def _pack(rotation: int, x: int, y: int) -> int:
+    """Returns a search state packed into an int."""
+    return (((rotation * _X_RANGE) + x + bitboard.PAD) << 6) | (y + bitboard.PAD)
+
+
+def _unpack(state: int) -> Tuple[int, int, int]:
+    """Returns (rotation, x, y) of a packed search state."""
+    rotation, x = divmod(state >> 6, _X_RANGE)
+    return rotation, x - bitboard.PAD, (state & 63) - bitboard.PAD
+
+
+def _shifted_masks() -> Tuple[Tuple[Tuple[Optional[Tuple[Tuple[int, int], ...]], ...], ...], ...]:
+    """Returns brick row masks pre-shifted to each x, by shape, rotation and x + PAD.  None where the brick
+    would leave the matrix sideways."""
+    shapes = []
+    for orientations in SHAPES:
+        rotations = []
+        for orientation in orientations:
+            columns = []
+            for shift in range(0, _X_RANGE):
+                masks = tuple((i, mask << shift) for i, mask in orientation.row_masks)
+                columns.append(None if any(x > bitboard.FULL_ROW for _, x in masks) else masks)
+            rotations.append(tuple(columns))
+        shapes.append(tuple(rotations))
+    return tuple(shapes)
+
+
+def _column_masks() -> Tuple[Tuple[Tuple[Tuple[int, int], ...], ...], ...]:
+    """Returns (column offset, row bits) of each brick column's solid spaces, by shape and rotation."""
+    shapes = []
+    for orientations in SHAPES:
+        rotations = []
+        for orientation in orientations:
+            columns: Dict[int, int] = {}
+            for x, y in orientation.cells:
+                columns[x] = columns.get(x, 0) | (1 << y)
+            rotations.append(tuple(sorted(columns.items())))
+        shapes.append(tuple(rotations))
+    return tuple(shapes)
+
+
+def _drops() -> Tuple[Tuple[Drop, ...], ...]:
+    """Returns the distinct shapes each brick can be dropped straight down in, by shape.  Rotations that are the
+    same shape moved over, e.g. the I brick's two horizontals, are listed once."""
+    shapes = []
+    for rotations in _column_masks():
+        drops: List[Drop] = []
+        for columns in rotations:
+            top = min((bits & -bits).bit_length() - 1 for _, bits in columns)
+            masks = tuple(bits >> top for _, bits in columns)
+            lows = [(bits & -bits).bit_length() - 1 for bits in masks]
+            drop = Drop(tuple((bits.bit_length(), bits) for bits in masks), sum(lows), sum(bin(bits).count("1") for bits in masks),
+                        sum(abs(lows[i + 1] - lows[i]) for i in range(0, len(lows) - 1)), lows[0], lows[-1])
+            if drop not in drops:
+                drops.append(drop)
+        shapes.append(tuple(drops))
+    return tuple(shapes)
+
+
+SHIFTED_MASKS = _shifted_masks()
+COLUMN_MASKS = _column_masks()
+DROPS = _drops()
+
+
+def _running_sums(values: List[int]) -> List[int]:
+    """Returns sums of the first 0, 1, 2... values, so any run of them sums by a subtraction."""
+    sums = [0]
+    for value in values:
+        sums.append(sums[-1] + value)
+    return sums
+
+
+def _solid_sides(columns: List[int]) -> Tuple[List[int], List[int]]:
+    """Returns, for each column index, rows solid in every column left of it, and in it and every column right of it."""
+    left = [_VISIBLE]
+    for column in columns:
+        left.append(left[-1] & column)
+    right = [_VISIBLE]
+    for column in reversed(columns):
+        right.append(right[-1] & column)
+    right.reverse()
+    return left, right
+
+
+def _shift(bits: int, y: int) -> int:
+    """Returns column bits of a brick moved to Y, which may be negative for bricks with empty top rows."""
+    return (bits << y) if y >= 0 else (bits >> -y)
+
+
+def fits(rows: List[int], shape_num: int, rotation: int, x: int, y: int) -> bool:
+    """Returns true if a brick fits the matrix row bitmasks at X/Y, the inverse of Brick.collision."""
+    shift = x + bitboard.PAD
+    if (shift < 0) or (shift >= _X_RANGE):
+        return False
+    masks = SHIFTED_MASKS[shape_num][rotation][shift]
+    if masks is None:
+        return False
+    height = len(rows)
+    for i, mask in masks:
+        row = y + i
+        if (row < 0) or (row >= height) or (rows[row] & mask):
+            return False
+    return True
+
+
+def columns_of(rows: List[int]) -> List[int]:
+    """Returns column bitmasks of the visible columns, bit y set when row y is solid, the floor included."""
+    columns = []
+    for x in range(1, bitboard.MATRIX_WIDTH - 1):
+        bit = bitboard.cell_bit(x)
+        column = 1 << _FLOOR
+        for y in range(1, _FLOOR):
+            if rows[y] & bit:
+                column |= 1 << y
+        columns.append(column)
+    return columns
+
+
+def place(columns: List[int], shape_num: int, rotation: int, x: int, y: int) -> Tuple[List[int], int]:
+    """Returns column bitmasks with a brick added and filled rows cleared, and the number of rows cleared."""
+    columns = list(columns)
+    for offset, bits in COLUMN_MASKS[shape_num][rotation]:
+        columns[x + offset - 1] |= _shift(bits, y)
+    return _clear(columns)
+
+
+def _clear(columns: List[int]) -> Tuple[List[int], int]:
+    """Returns column bitmasks with filled rows cleared, and the number of rows cleared."""
+    full = _VISIBLE
+    for column in columns:
+        full &= column
+    if full == 0:
+        return columns, 0
+    lines = 0
+    while full:
+        y = (full & -full).bit_length() - 1         # topmost first, rows above shift down past the rest
+        low = (1 << y) - 1
+        columns = [(column & ~((low << 1) | 1)) | ((column & low) << 1) for column in columns]
+        full &= ~(1 << y)
+        lines += 1
+    return columns, lines
+
+
+def landing(columns: List[int], shape_num: int, rotation: int, x: int) -> Optional[int]:
+    """Returns Y where a brick dropped straight down column X comes to rest, or None if it doesn't fit the matrix."""
+    y = _FLOOR
+    for offset, bits in COLUMN_MASKS[shape_num][rotation]:
+        column = x + offset - 1
+        if (column < 0) or (column >= len(columns)):
+            return None
+        top = (columns[column] & -columns[column]).bit_length() - 1
+        y = min(y, top - bits.bit_length())
+    top_space = SHAPES[shape_num][rotation].top_space
+    return y if y + top_space >= 1 else None
+
+
+def placed_hash(board_hash: int, shape_num: int, rotation: int, x: int, y: int) -> int:
+    """Returns the Zobrist hash of a board (see zobrist module) with a brick added, no rows cleared."""
+    for cell_x, cell_y in SHAPES[shape_num][rotation].cells:
+        board_hash ^= zobrist.CELL_KEYS[y + cell_y][x + cell_x]
+    return board_hash
+
+
+def columns_hash(columns: List[int]) -> int:
+    """Returns the Zobrist hash of a board given as column bitmasks, worked out from scratch."""
+    value = 0
+    for i, column in enumerate(columns):
+        bits = column & _VISIBLE
+        while bits:
+            low = bits & -bits
+            value ^= zobrist.CELL_KEYS[low.bit_length() - 1][i + 1]
+            bits ^= low
+    return value
+
+
+class Bot:
+    """Plays the game: finds every final placement the live brick can reach, scores the board each leaves
+    with weighted features, and steers the brick to the best one.  With lookahead, every placement (or the best
+    few, given a beam) is rescored by the best straight drop of the next brick.  Board scores and lookahead scores are
+    memoized in a transposition table by Zobrist hash, so boards met again aren't rescored."""
+
+    def __init__(self, weights: Weights = DEFAULT_WEIGHTS, lookahead: bool = True, beam: Optional[int] = None,
+                 table: Optional[TranspositionTable] = None) -> None:
+        """Class constructor.  BEAM is how many of the best placements are rescored with lookahead, all of them if
+        none.  Scores are memoized in TABLE, if given, else a private LRU table."""
+        self.__weights: Weights = weights
+        self.__lookahead: bool = lookahead
+        self.__beam: Optional[int] = beam
+        self.__table: TranspositionTable = table if table is not None else LRUTable()
+        self.__brick: Optional[Brick] = None
+        self.__target: Optional[Placement] = None
+        self.__plan: List[Tuple[int, int]] = []
+        self.__expected: int = -1
+        self.__searched: Optional[int] = None
+        self.__search_result: Tuple[Dict[int, Tuple[int, int]], List[int]] = ({}, [])
+
+    @property
+    def weights(self) -> Weights:
+        """Returns the heuristic weights."""
+        return self.__weights
+
+    @property
+    def beam(self) -> Optional[int]:
+        """Returns how many of the best placements are rescored with lookahead, none if all of them."""
+        return self.__beam
+
+    @property
+    def table(self) -> TranspositionTable:
+        """Returns the transposition table board scores are memoized in."""
+        return self.__table
+
+    @property
+    def target(self) -> Optional[Placement]:
+        """Returns the placement the live brick is being steered to, if any."""
+        return self.__target
+
+    def reset(self) -> None:
+        """Forgets the current plan, e.g. for a new game."""
+        self.__brick = None
+        self.__target = None
+        self.__plan = []
+        self.__expected = -1
+        self.__searched = None
+
+    @staticmethod
+    def search(rows: List[int], shape_num: int, rotation: int, x: int, y: int) -> Tuple[Dict[int, Tuple[int, int]], List[int]]:
+        """Breadth first search of the states a brick can reach from a start state, with the same moves and
+        rotation kicks as Brick.  Returns each visited state's (previous state, action), and the resting states:
+        those it can't move down from."""
+        # states are packed so moves are additions: down +1, sideways +/-64, rotation a whole block of columns
+        table = [masks for rotations in SHIFTED_MASKS[shape_num] for masks in rotations]
+        height = len(rows)
+        blocked = set()
+
+        def free(key: int) -> bool:
+            """Returns true if the brick fits in a state, memoizing those it doesn't."""
+            if key in blocked:
+                return False
+            masks = table[key >> 6]
+            if masks is not None:
+                top = (key & 63) - bitboard.PAD
+                for i, mask in masks:
+                    row = top + i
+                    if (row < 0) or (row >= height) or (rows[row] & mask):
+                        break
+                else:
+                    return True
+            blocked.add(key)
+            return False
+
+        start = _pack(rotation, x, y)
+        visited: Dict[int, Tuple[int, int]] = {start: (-1, Actions.Nothing)}
+        resting: List[int] = []
+        queue = deque([start])
+        turn = _X_RANGE << 6
+        while len(queue) > 0:
+            state = queue.popleft()
+
+            # down, else it rests here
+            key = state + 1
+            if key in visited:
+                pass
+            elif free(key):
+                visited[key] = (state, Actions.Down)
+                queue.append(key)
+            else:
+                resting.append(state)
+
+            # left, right
+            for action, key in ((Actions.Left, state - 64), (Actions.Right, state + 64)):
+                if (key not in visited) and free(key):
+                    visited[key] = (state, action)
+                    queue.append(key)
+
+            # rotate, first kick that fits
+            turned = (state + turn) if (state >> 6) < (3 * _X_RANGE) else (state - (3 * turn))
+            for kick in _KICKS:
+                key = turned + kick
+                if key in visited:
+                    break
+                if free(key):
+                    visited[key] = (state, Actions.Rotate)
+                    queue.append(key)
+                    break
+        return visited, resting
+
+    def evaluate(self, columns: List[int], lines: int) -> float:
+        """Returns the weighted score of a board, given as column bitmasks, and the lines that were cleared."""
+        height = 0
+        holes = 0
+        bumpiness = 0
+        last = -1
+        for column in columns:
+            top = (column & -column).bit_length() - 1
+            column_height = _FLOOR - top
+            height += column_height
+            holes += column_height - (bin(column).count("1") - 1)
+            if last >= 0:
+                bumpiness += abs(column_height - last)
+            last = column_height
+        weights = self.__weights
+        return (weights.height * height) + (weights.lines * lines) + (weights.holes * holes) + (weights.bumpiness * bumpiness)
+
+    def placements(self, matrix: Matrix) -> List[Placement]:
+        """Returns each distinct placement the live brick can reach, scored without lookahead."""
+        brick = matrix.brick
+        if brick is None:
+            return []
+        _, resting = self.__search_live(matrix)
+        return self.__score(columns_of(matrix.rows), matrix.board_hash, brick.shape_num, resting)
+
+    def __search_live(self, matrix: Matrix) -> Tuple[Dict[int, Tuple[int, int]], List[int]]:
+        """Searches from the live brick, reusing the last search if neither it nor the matrix has changed since."""
+        brick = matrix.brick
+        if brick is None:
+            self.__searched = None
+            return {}, []
+        searched = matrix.state_hash
+        if searched != self.__searched:
+            self.__search_result = self.search(matrix.rows, brick.shape_num, brick.rotation, brick.x, brick.y)
+            self.__searched = searched
+        return self.__search_result
+
+    def __score(self, columns: List[int], board_hash: int, shape_num: int, resting: List[int]) -> List[Placement]:
+        """Returns scored placements of resting states, one per distinct set of spaces filled."""
+        placements = []
+        seen = set()
+        table = self.__table
+        for state in resting:
+            rotation, x, y = _unpack(state)
+            key = placed_hash(board_hash, shape_num, rotation, x, y)
+            if key in seen:
+                continue
+            seen.add(key)
+            board, lines = place(columns, shape_num, rotation, x, y)
+            if lines > 0:
+                key = columns_hash(board)
+            score = table.get(key)
+            if score is None:
+                score = self.evaluate(board, 0)
+                table.put(key, score)
+            placements.append(Placement(shape_num, rotation, x, y, score + (self.__weights.lines * lines)))
+        return placements
+
+    def choose(self, matrix: Matrix) -> Optional[Placement]:
+        """Returns the best placement of the live brick, or none if there isn't one."""
+        placements = self.placements(matrix)
+        if len(placements) == 0:
+            return None
+        placements.sort(key=lambda x: x.score, reverse=True)
+        next_brick = matrix.next_brick
+        if (not self.__lookahead) or (next_brick is None):
+            return placements[0]
+
+        # rescore all, or the best few, by best straight drop of next brick, memoized by board and next brick
+        columns = columns_of(matrix.rows)
+        board_hash = matrix.board_hash
+        best = placements[0]
+        best_score = None
+        for placement in placements if self.__beam is None else placements[0:self.__beam]:
+            board, lines = place(columns, placement.shape_num, placement.rotation, placement.x, placement.y)
+            key = placed_hash(board_hash, placement.shape_num, placement.rotation, placement.x, placement.y) if lines == 0 else columns_hash(board)
+            key ^= zobrist.NEXT_KEYS[next_brick.shape_num]
+            score = self.__table.get(key, 1)
+            if score is None:
+                score = self.__best_drop(board, next_brick.shape_num)
+                self.__table.put(key, score, 1)
+            score += self.__weights.lines * lines
+            if (best_score is None) or (score > best_score):
+                best = placement
+                best_score = score
+        return best
+
+    def __best_drop(self, columns: List[int], shape_num: int) -> float:
+        """Returns score of the best straight drop of a brick, at any rotation and column.  Drops are scored from the
+        board's own features: a landed column's holes go up by its rise less the brick's spaces in it, and
+        bumpiness only changes at the brick's edges.  Drops that fill rows move every column, and are scored from
+        scratch."""
+        weights = self.__weights
+        count = len(columns)
+        heights = [_FLOOR - ((column & -column).bit_length() - 1) for column in columns]
+        bumps = [abs(heights[i + 1] - heights[i]) for i in range(0, count - 1)]
+        base = self.evaluate(columns, 0)
+        height_sums = _running_sums(heights)
+        bump_sums = _running_sums(bumps)
+        solid_left, solid_right = _solid_sides(columns)
+        best = None
+        for drop in DROPS[shape_num]:
+            width = len(drop.columns)
+            for left in range(0, count - width + 1):
+                right = left + width
+
+                # where it lands, skipped if it sticks out the top
+                y = _FLOOR
+                for i, (length, _) in enumerate(drop.columns):
+                    y = min(y, _FLOOR - heights[left + i] - length)
+                if y < 1:
+                    continue
+
+                # filling rows moves every column, else only the columns landed in and the bumpiness at their edges change
+                score = self.__filled_score(columns, drop, left, y) if solid_left[left] & solid_right[right] else None
+                if score is None:
+                    rise = (width * (_FLOOR - y)) - drop.lows - (height_sums[right] - height_sums[left])
+                    bumpiness = drop.bumpiness - (bump_sums[min(right, count - 1)] - bump_sums[max(left - 1, 0)])
+                    if left > 0:
+                        bumpiness += abs(heights[left - 1] - (_FLOOR - y - drop.first))
+                    if right < count:
+                        bumpiness += abs(heights[right] - (_FLOOR - y - drop.last))
+                    score = base + ((weights.height + weights.holes) * rise) - (weights.holes * drop.spaces) + (weights.bumpiness * bumpiness)
+                if (best is None) or (score > best):
+                    best = score
+        return best if best is not None else base - 1000.0
+
+    def __filled_score(self, columns: List[int], drop: Drop, left: int, y: int) -> Optional[float]:
+        """Returns score of a drop landed at LEFT/Y if it fills rows, scored from scratch as they're cleared, else none."""
+        board = list(columns)
+        full = _VISIBLE
+        for i, (_, bits) in enumerate(drop.columns):
+            board[left + i] |= bits << y
+        for column in board:
+            full &= column
+        if full == 0:
+            return None
+        board, lines = _clear(board)
+        return self.evaluate(board, lines)
+
+    def __plan_to(self, matrix: Matrix, target: Placement) -> Optional[List[Tuple[int, int]]]:
+        """Returns (action, state after) moves from the live brick to a target placement, or none if it can't reach it."""
+        visited, _ = self.__search_live(matrix)
+        state = _pack(target.rotation, target.x, target.y)
+        if state not in visited:
+            return None
+        plan = []
+        while True:
+            previous, action = visited[state]
+            if previous < 0:
+                break
+            plan.append((action, state))
+            state = previous
+        plan.reverse()
+        return plan
+
+    def next_action(self, matrix: Matrix) -> int:
+        """Returns the next action steering the live brick to the best placement.  Plans again when a new brick
+        spawns, or when the brick isn't where it was expected, e.g. after gravity moved it."""
+        brick = matrix.brick
+        if brick is None:
+            return Actions.Nothing
+
+        # new brick, or knocked off course?
+        if brick is not self.__brick:
+            self.__brick = brick
+            self.__target = self.choose(matrix)
+            self.__plan = []
+            self.__expected = -1
+        if self.__target is None:
+            return Actions.Drop
+        if (self.__expected >= 0) and (_pack(brick.rotation, brick.x, brick.y) != self.__expected):
+            plan = self.__plan_to(matrix, self.__target)
+            if plan is None:
+                self.__target = self.choose(matrix)
+                plan = self.__plan_to(matrix, self.__target) if self.__target is not None else []
+            self.__plan = plan if plan is not None else []
+        elif self.__expected < 0:
+            self.__plan = self.__plan_to(matrix, self.__target) or []
+
+        # drop once only down moves are left
+        if all(action == Actions.Down for action, _ in self.__plan):
+            self.__plan = []
+            self.__expected = -1
+            return Actions.Drop
+        action, self.__expected = self.__plan.pop(0)
+        return action
@@ -2,121 +2,164 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import List
-from time import perf_counter
-from color import Colors, Color
+from typing import List, Tuple, NamedTuple
+from color import Colors, Color, PALETTE_INDEXES
+import bitboard
+
+
+class Orientation(NamedTuple):
+    """Immutable geometry of one brick shape in one rotation, shared by all bricks."""
+    width: int
+    height: int
+    grid: Tuple[Tuple[int, ...], ...]           # grid[x][y], 1 if solid
+    cells: Tuple[Tuple[int, int], ...]          # (x, y) offsets of solid spaces
+    row_masks: Tuple[Tuple[int, int], ...]      # (row, bitmask) of solid rows, see bitboard
+    top_space: int                              # non-solid rows at top of grid
+    bottom_space: int                           # non-solid rows at bottom of grid
+    bottoms: Tuple[Tuple[int, int], ...]        # (x, y) offset of each solid column's lowest space, the brick's bottom profile
+
+
+def _build_orientations(size: int, cells: List[Tuple[int, int]]) -> Tuple[Orientation, ...]:
+    """Returns the four clockwise rotations of a square brick grid, given the solid cells of the first."""
+    orientations = []
+    for _ in range(0, 4):
+        grid = tuple(tuple(1 if (x, y) in cells else 0 for y in range(0, size)) for x in range(0, size))
+        solid_rows = sorted({y for _, y in cells})
+        orientations.append(Orientation(
+            width=size,
+            height=size,
+            grid=grid,
+            cells=tuple(sorted(cells)),
+            row_masks=bitboard.grid_row_masks(grid, size, size),
+            top_space=solid_rows[0],
+            bottom_space=(size - 1) - solid_rows[-1],
+            bottoms=tuple((x, max(y for cx, y in cells if cx == x)) for x in sorted({x for x, _ in cells}))))
+        cells = [(-y + (size - 1), x) for x, y in cells]
+    return tuple(orientations)
+
+
+# shape number (1-7) -> rotation (0-3) -> geometry
+SHAPES: Tuple[Tuple[Orientation, ...], ...] = (
+    (),
+    _build_orientations(4, [(0, 2), (1, 2), (2, 2), (3, 2)]),
+    _build_orientations(3, [(0, 1), (0, 2), (1, 2), (2, 2)]),
+    _build_orientations(3, [(2, 1), (0, 2), (1, 2), (2, 2)]),
+    _build_orientations(2, [(0, 0), (0, 1), (1, 0), (1, 1)]),
+    _build_orientations(3, [(1, 0), (2, 0), (0, 1), (1, 1)]),
+    _build_orientations(3, [(1, 1), (0, 2), (1, 2), (2, 2)]),
+    _build_orientations(3, [(0, 0), (1, 0), (1, 1), (2, 1)])
+)
+
+# shape number (1-7) -> color
+SHAPE_COLORS: Tuple[Color, ...] = (
+    Colors.Black,
+    Colors.SilverPink,
+    Colors.TuftsBlue,
+    Colors.ChromeYellow,
+    Colors.Independence,
+    Colors.ForestGreen,
+    Colors.Byzantine,
+    Colors.Coquelicot
+)
+SHAPE_COLOR_INDEXES: Tuple[int, ...] = tuple(PALETTE_INDEXES[x.value] for x in SHAPE_COLORS)
+
+class BrickState(NamedTuple):
+    """Immutable snapshot of a brick, see Brick.snapshot()."""
+    shape_num: int
+    rotation: int
+    x: int
+    y: int
+
+
+# (x, y) offsets tried in order after a rotation, until one doesn't collide
+ROTATION_KICKS: Tuple[Tuple[int, int], ...] = (
+    (0, 0),
+    (0, 1), (0, 2),
+    (0, -1), (0, -2),
+    (-1, 0), (-2, 0),
+    (1, 0), (2, 0)
+)
 
 
 class Brick:
     """Represents a live, moving brick that has not yet joined the static game matrix.
-    It will do so once it's hit bottom and come to rest."""
+    It will do so once it's hit bottom and come to rest.  Slotted, as bricks are read every frame and
+    the bot and clones make many."""
+
+    __slots__ = ("__shape_num", "__rotation", "__x", "__y")
 
     def __init__(self, shape_num: int) -> None:
         """Class constructor.  Creates one of seven basic shapes."""
         self.__shape_num: int = shape_num
-        if shape_num == 1:
-            self.__width: int = 4
-            self.__height: int = 4
-            self.__grid: List[List[int]] = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[0][2] = 1
-            self.__grid[1][2] = 1
-            self.__grid[2][2] = 1
-            self.__grid[3][2] = 1
-            self.__color = Colors.SilverPink
-        elif shape_num == 2:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[0][1] = 1
-            self.__grid[0][2] = 1
-            self.__grid[1][2] = 1
-            self.__grid[2][2] = 1
-            self.__color = Colors.TuftsBlue
-        elif shape_num == 3:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[2][1] = 1
-            self.__grid[0][2] = 1
-            self.__grid[1][2] = 1
-            self.__grid[2][2] = 1
-            self.__color = Colors.ChromeYellow
-        elif shape_num == 4:
-            self.__width = 2
-            self.__height = 2
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[0][0] = 1
-            self.__grid[0][1] = 1
-            self.__grid[1][0] = 1
-            self.__grid[1][1] = 1
-            self.__color = Colors.Independence
-        elif shape_num == 5:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[1][0] = 1
-            self.__grid[2][0] = 1
-            self.__grid[0][1] = 1
-            self.__grid[1][1] = 1
-            self.__color = Colors.ForestGreen
-        elif shape_num == 6:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[1][1] = 1
-            self.__grid[0][2] = 1
-            self.__grid[1][2] = 1
-            self.__grid[2][2] = 1
-            self.__color = Colors.Byzantine
-        elif shape_num == 7:
-            self.__width = 3
-            self.__height = 3
-            self.__grid = [[0 for x in range(self.__height)] for y in range(self.__width)]
-            self.__grid[0][0] = 1
-            self.__grid[1][0] = 1
-            self.__grid[1][1] = 1
-            self.__grid[2][1] = 1
-            self.__color = Colors.Coquelicot
-        self.__top_space: int = self.__get_top_space()
-        self.__bottom_space: int = self.__get_bottom_space()
-        self.__x: int = int((12 - self.__width) / 2)
-        self.__y: int = 1 - self.__top_space
-        self.__last_drop_time: float = perf_counter()
+        self.__rotation: int = 0
+        shape = SHAPES[shape_num][0]
+        self.__x: int = int((12 - shape.width) / 2)
+        self.__y: int = 1 - shape.top_space
 
     @property
     def shape_num(self) -> int:
         """Returns the shape number."""
         return self.__shape_num
 
+    @property
+    def rotation(self) -> int:
+        """Returns the rotation index (0-3)."""
+        return self.__rotation
+
+    @property
+    def orientation(self) -> Orientation:
+        """Returns shared geometry of the current shape and rotation."""
+        return SHAPES[self.__shape_num][self.__rotation]
+
     @property
     def width(self) -> int:
         """Returns brick width."""
-        return self.__width
+        return SHAPES[self.__shape_num][self.__rotation].width
 
     @property
     def height(self) -> int:
         """Returns brick height."""
-        return self.__height
+        return SHAPES[self.__shape_num][self.__rotation].height
 
     @property
-    def grid(self) -> List[List[int]]:
+    def grid(self) -> Tuple[Tuple[int, ...], ...]:
         """Returns brick grid."""
-        return self.__grid
+        return SHAPES[self.__shape_num][self.__rotation].grid
+
+    @property
+    def cells(self) -> Tuple[Tuple[int, int], ...]:
+        """Returns (x, y) offsets of the brick's solid spaces."""
+        return SHAPES[self.__shape_num][self.__rotation].cells
+
+    @property
+    def row_masks(self) -> Tuple[Tuple[int, int], ...]:
+        """Returns (row, bitmask) pairs of the brick grid's solid rows."""
+        return SHAPES[self.__shape_num][self.__rotation].row_masks
 
     @property
     def color(self) -> Color:
         """Returns brick color."""
-        return self.__color
+        return SHAPE_COLORS[self.__shape_num]
+
+    @property
+    def color_index(self) -> int:
+        """Returns brick color as palette index."""
+        return SHAPE_COLOR_INDEXES[self.__shape_num]
 
     @property
     def top_space(self) -> int:
         """Returns non-solid spaces at top of brick grid."""
-        return self.__top_space
+        return SHAPES[self.__shape_num][self.__rotation].top_space
 
     @property
     def bottom_space(self) -> int:
         """Returns non-solid spaces at bottom of brick grid."""
-        return self.__bottom_space
+        return SHAPES[self.__shape_num][self.__rotation].bottom_space
+
+    @property
+    def bottoms(self) -> Tuple[Tuple[int, int], ...]:
+        """Returns (x, y) offset of each solid column's lowest space."""
+        return SHAPES[self.__shape_num][self.__rotation].bottoms
 
     @property
     def x(self) -> int:
@@ -128,111 +171,66 @@ class Brick:
         """Returns Y position of brick."""
         return self.__y
 
-    def __get_top_space(self) -> int:
-        """Calculates non-solid spaces at top of brick grid."""
-        top_space = 0
-        for y in range(0, self.__height):
-            empty = True
-            for x in range(0, self.__width):
-                if self.__grid[x][y] == 1:
-                    empty = False
-            if empty:
-                top_space += 1
-            else:
-                break
-        return top_space
-
-    def __get_bottom_space(self) -> int:
-        """Calculates non-solid spaces at bottom of brick grid."""
-        bottom_space = 0
-        for y in reversed(range(0, self.__height)):
-            empty = True
-            for x in range(0, self.__width):
-                if self.__grid[x][y] == 1:
-                    empty = False
-            if empty:
-                bottom_space += 1
-            else:
-                break
-        return bottom_space
-
-    def collision(self, matrix) -> bool:
-        """Returns true on brick collision."""
-        for x in range(0, self.__width):
-            for y in range(0, self.__height):
-                matrix_x = x + self.__x
-                matrix_y = y + self.__y
-                if (self.__grid[x][y] == 1) and (matrix[matrix_x][matrix_y] == 1):
-                    return True
-        return False
+    @staticmethod
+    def from_state(state: BrickState) -> 'Brick':
+        """Returns a brick restored from a snapshot."""
+        brick = Brick(state.shape_num)
+        brick.place(state.x, state.y, state.rotation)
+        return brick
+
+    def snapshot(self) -> BrickState:
+        """Returns the brick's shape, rotation and position."""
+        return BrickState(self.__shape_num, self.__rotation, self.__x, self.__y)
+
+    def place(self, x: int, y: int, rotation: int) -> None:
+        """Moves brick to a position and rotation, without checking for collision."""
+        self.__x = x
+        self.__y = y
+        self.__rotation = rotation
+
+    def collision(self, rows: List[int]) -> bool:
+        """Returns true on brick collision with the matrix row bitmasks."""
+        return bitboard.collides(rows, SHAPES[self.__shape_num][self.__rotation].row_masks, self.__x, self.__y)
 
-    def move_left(self, matrix) -> None:
+    def move_left(self, rows: List[int]) -> None:
         """Moves brick left, prevents collision."""
         self.__x -= 1
-        if self.collision(matrix):
+        if self.collision(rows):
             self.__x += 1
 
-    def move_right(self, matrix) -> None:
+    def move_right(self, rows: List[int]) -> None:
         """Moves brick right, prevents collision."""
         self.__x += 1
-        if self.collision(matrix):
+        if self.collision(rows):
             self.__x -= 1
 
-    def move_down(self, matrix) -> bool:
+    def move_down(self, rows: List[int]) -> bool:
         """Moves brick down, prevents collision.  Returns true if move would have hit bottom."""
-        self.__last_drop_time = perf_counter()
         self.__y += 1
-        if self.collision(matrix):
+        if self.collision(rows):
             self.__y -= 1
             return True
         return False
 
-    def is_drop_time(self, interval) -> bool:
-        """Returns true if its time to drop brick (gravity)."""
-        now = perf_counter()
-        elapsed = now - self.__last_drop_time
-        drop_time = elapsed >= interval
-        return drop_time
-
-    def rotate(self, matrix) -> None:
-        """Rotates brick."""
-
-        new_grid = [[0 for x in range(self.__width)] for y in range(self.__height)]
-        for x1 in range(0, self.__width):
-            for y1 in range(0, self.__height):
-                x2 = -y1 + (self.__height - 1)
-                y2 = x1
-                new_grid[x2][y2] = self.__grid[x1][y1]
-        self.__grid = new_grid
-
-        steps = 0
-        while self.collision(matrix):
-            self.__y += 1
-            steps += 1
-            if steps >= 3:
-                self.__y -= 3
-                break
-
-        steps = 0
-        while self.collision(matrix):
-            self.__y -= 1
-            steps += 1
-            if steps >= 3:
-                self.__y += 3
-                break
-
-        steps = 0
-        while self.collision(matrix):
-            self.__x -= 1
-            steps += 1
-            if steps >= 3:
-                self.__x += 3
-                break
-
-        steps = 0
-        while self.collision(matrix):
-            self.__x += 1
-            steps += 1
-            if steps >= 3:
-                self.__x -= 3
-                break
+    def drop_distance(self, rows: List[int]) -> int:
+        """Returns how many rows brick can fall before it comes to rest."""
+        row_masks = SHAPES[self.__shape_num][self.__rotation].row_masks
+        distance = 0
+        while not bitboard.collides(rows, row_masks, self.__x, self.__y + distance + 1):
+            distance += 1
+        return distance
+
+    def move_to_bottom(self, distance: int) -> None:
+        """Moves brick down DISTANCE rows, as returned by drop_distance, without checking for collision."""
+        self.__y += distance
+
+    def rotate(self, rows: List[int]) -> None:
+        """Rotates brick clockwise, trying each kick offset in turn.  Stays put if no offset fits."""
+        rotation = (self.__rotation + 1) % 4
+        row_masks = SHAPES[self.__shape_num][rotation].row_masks
+        for x, y in ROTATION_KICKS:
+            if not bitboard.collides(rows, row_masks, self.__x + x, self.__y + y):
+                self.__rotation = rotation
+                self.__x += x
+                self.__y += y
+                return
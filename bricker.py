@@ -2,23 +2,38 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import Tuple, List
-from time import perf_counter
+from typing import Tuple, List, Optional
+import argparse
 import pygame
 from pygame import Surface
 from pygame.time import Clock
-from matrix import Matrix
 from color import Colors
 from renderer import Renderer
+from sprite_atlas import SpriteAtlas
 from game_stats import GameStats
-from exploding_space import ExplodingSpace
+from particles import ParticleSystem
+from engine import Engine, Actions
+from scheduler import FixedStepScheduler
+from animations import ExplosionAnimation
+from profiler import FrameProfiler
+from pieces import PieceGenerator, RandomGenerator, BagGenerator
+from simulation import Simulation
+from replay import Replay, ReplayWriter
+from bot import Bot
 
 
 class Bricker:
     """Contains main game logic and entry point."""
 
-    def __init__(self) -> None:
-        """Class constructor."""
+    def __init__(self, profile_path: Optional[str] = None, generator: Optional[PieceGenerator] = None, seed: Optional[int] = None,
+                 record_path: Optional[str] = None, attract_seconds: Optional[float] = None, instant_drop: bool = True, ghost: bool = True,
+                 practice: bool = False) -> None:
+        """Class constructor.  If a profile path is given, frame stage timings are written to it on exit (.csv or .json).
+        If a seed is given, every game restarts the piece sequence from it.  If a record path is given, each game is
+        recorded to it as a replay, overwriting the last.  If attract seconds are given, the bot plays a demo once
+        the menu has been left idle that long.  Hard drops land instantly leaving a trail, unless instant drop is
+        false, when the fall is animated and input waits.  Ghost shows where the brick will land.  In practice mode,
+        backspace takes back the last brick placed (not while recording)."""
 
         # load version
         try:
@@ -34,14 +49,18 @@ class Bricker:
         self.__screen_size: Tuple[int, int] = (1000, 700)
         self.__screen: Surface = pygame.display.set_mode(self.__screen_size)
         self.__clock: Clock = Clock()
-        self.__renderer: Renderer = Renderer(version, self.__screen_size, self.__screen, self.__clock)
-        self.__matrix: Matrix = Matrix()
-        self.__stats: GameStats = GameStats()
-        self.__level_drop_intervals: List[float] = []
-        interval = 2.0
-        for _ in range(0, 10):
-            interval *= 0.8
-            self.__level_drop_intervals.append(interval)
+        self.__profiler: FrameProfiler = FrameProfiler()
+        self.__profile_path: Optional[str] = profile_path
+        self.__renderer: Renderer = Renderer(version, self.__screen_size, self.__screen, self.__clock, self.__profiler)
+        self.__renderer.ghost = ghost
+        self.__instant_drop: bool = instant_drop
+        self.__simulation: Simulation = Simulation(Engine(GameStats(), auto_clear=False, generator=generator), FixedStepScheduler(60),
+                                                   instant_drop, instant_drop, 100 if practice else 0)
+        self.__seed: Optional[int] = seed
+        self.__record_path: Optional[str] = record_path
+        self.__recorder: Optional[ReplayWriter] = None
+        self.__attract_seconds: Optional[float] = attract_seconds
+        self.__render_fps: int = 60     # frame rate limit, independent of the simulation tick rate
 
 
     def main(self) -> None:
@@ -70,6 +89,11 @@ class Bricker:
                 self.explode_spaces()
                 break
 
+        # finish recording, write frame timings
+        self.stop_recording()
+        if self.__profile_path is not None:
+            self.__profiler.dump(self.__profile_path)
+
 
     def menu_loop(self, in_game: bool) -> int:
         """The main menu loop."""
@@ -80,16 +104,28 @@ class Bricker:
             menu_selection = 2
 
         # loop until selection
+        idle_since = pygame.time.get_ticks()
         while True:
 
-            # limit fps
-            self.__clock.tick(60)
+            # draw menu, only redrawn when the selection changes
+            self.__renderer.draw_menu(self.__simulation.engine.matrix, self.__simulation.engine.stats, menu_selection, in_game)
 
-            # handle user events
-            for event in pygame.event.get():
+            # wait for user events, demo once idle
+            events = self.__renderer.wait_events()
+            if any(x.type == pygame.KEYDOWN for x in events):
+                idle_since = pygame.time.get_ticks()
+            elif (self.__attract_seconds is not None) and (pygame.time.get_ticks() - idle_since >= self.__attract_seconds * 1000.0):
+                self.attract_loop()
+                self.__renderer.invalidate()
+                idle_since = pygame.time.get_ticks()
+            for event in events:
+
+                # window uncovered
+                if event.type == pygame.VIDEOEXPOSE:
+                    self.__renderer.invalidate()
 
                 # up
-                if event.type == pygame.KEYDOWN and (event.key == pygame.K_LEFT or event.key == pygame.K_UP):
+                elif event.type == pygame.KEYDOWN and (event.key == pygame.K_LEFT or event.key == pygame.K_UP):
                     menu_selection -= 1
                     if in_game:
                         if menu_selection < 1:
@@ -112,9 +148,6 @@ class Bricker:
                 elif event.type == pygame.KEYDOWN and (event.key == pygame.K_SPACE or event.key == pygame.K_RETURN):
                     return menu_selection
 
-            # draw menu
-            self.__renderer.draw_menu(self.__matrix, self.__stats, menu_selection, in_game)
-
 
     def high_score_loop(self) -> None:
         """The main menu loop."""
@@ -129,12 +162,14 @@ class Bricker:
         # loop
         while not done:
 
-            # limit fps
-            self.__clock.tick(60)
+            # draw frame, only redrawn when the initials change
+            self.__renderer.draw_initials_input(self.__simulation.engine.matrix, self.__simulation.engine.stats, chars)
 
-            # handle user events
-            for event in pygame.event.get():
-                if event.type == pygame.KEYDOWN:
+            # wait for user events
+            for event in self.__renderer.wait_events():
+                if event.type == pygame.VIDEOEXPOSE:
+                    self.__renderer.invalidate()
+                elif event.type == pygame.KEYDOWN:
                     if str(pygame.key.name(event.key)) in letters + numbers:
                         if pos < 3:
                             char = str(pygame.key.name(event.key))
@@ -149,52 +184,50 @@ class Bricker:
                     elif event.key == pygame.K_RETURN:
                         done = True
 
-            # draw frame
-            self.__renderer.draw_initials_input(self.__matrix, self.__stats, chars)
-
         # add new high score
         initials = "".join(chars).lower()
-        self.__stats.add_high_score(initials)
+        self.__simulation.engine.stats.add_high_score(initials)
 
 
     def game_loop(self) -> bool:
         """The main game loop.  Returns true if still in game (menu opened)."""
 
-        # vars
-        game_over = False
+        # don't count time spent in menus
+        self.__clock.tick()
 
         # event loop
-        while not game_over:
-
-            # reset hit flag
-            hit = False
+        while self.__simulation.scheduler.busy or not self.__simulation.engine.game_over:
 
             # limit fps
-            self.__clock.tick(60)
+            elapsed = self.__clock.tick(self.__render_fps) / 1000.0
+            self.__profiler.start_frame()
 
             # handle user events
             for event in pygame.event.get():
 
                 # left
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
-                    self.move_brick_left()
+                    self.__simulation.push(Actions.Left)
 
                 # right
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_RIGHT:
-                    self.move_brick_right()
+                    self.__simulation.push(Actions.Right)
 
                 # down
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_DOWN:
-                    self.move_brick_down()
+                    self.__simulation.push(Actions.Down)
 
                 # rotate
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_UP:
-                    self.rotate_brick()
+                    self.__simulation.push(Actions.Rotate)
 
                 # drop
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                    self.drop_brick_to_bottom()
-                    hit = True
+                    self.__simulation.push(Actions.Drop)
+
+                # undo, practice mode only
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE:
+                    self.__simulation.undo()
 
                 # menu
                 elif event.type == pygame.KEYDOWN and (event.key == pygame.K_ESCAPE or event.key == pygame.K_q):
@@ -203,193 +236,180 @@ class Bricker:
                 # level up
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_PAGEUP:
                     if self.__renderer.debug:
-                        self.__stats.level += 1
-                        if self.__stats.level > 10:
-                            self.__stats.level = 10
+                        self.__simulation.set_level(min(self.__simulation.engine.stats.level + 1, 10))
 
                 # level down
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_PAGEDOWN:
                     if self.__renderer.debug:
-                        self.__stats.level -= 1
-                        if self.__stats.level < 1:
-                            self.__stats.level = 1
+                        self.__simulation.set_level(max(self.__simulation.engine.stats.level - 1, 1))
 
                 # debug toggle
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_d:
                     self.__renderer.debug = not self.__renderer.debug
 
-            # drop brick timer?
-            if self.is_drop_time():    # add drop interval
-                hit = self.move_brick_down()
-
-            # brick hit bottom?
-            if hit:
-                game_over = self.brick_hit()
+            # advance simulation in fixed ticks
+            self.__profiler.lap("events")
+            for _ in range(0, self.__simulation.scheduler.advance(elapsed)):
+                self.__simulation.tick()
+            self.__profiler.lap("logic")
 
             # draw frame
-            self.__renderer.update_frame(self.__matrix, self.__stats, None)
+            self.__renderer.update_frame(self.__simulation.engine.matrix, self.__simulation.engine.stats, None, trail=self.__simulation.trail)
+            self.__profiler.end_frame()
 
         # game over
+        self.stop_recording()
         self.explode_spaces()
-        if self.__stats.is_high_score():
+        if self.__simulation.engine.stats.is_high_score():
             self.high_score_loop()
         return False
 
 
-    def new_game(self) -> None:
-        """Resets state and starts a new game."""
-        self.__stats = GameStats()
-        self.__matrix.new_game()
+    def replay_loop(self, path: str, speed: float = 1.0) -> None:
+        """Plays a recorded game at SPEED times real time, until it ends or escape is pressed.  Left and right
+        arrows seek back and forward ten seconds."""
+
+        # play replay in place of a game
+        playback = Replay.load(path).playback(speed, drop_trail=True)
+        self.__simulation = playback.simulation
+        seek_ticks = playback.replay.tick_rate * 10
+        self.__clock.tick()
 
+        # event loop
+        while not playback.done:
+
+            # limit fps
+            elapsed = self.__clock.tick(self.__render_fps) / 1000.0
+
+            # handle user events
+            for event in pygame.event.get():
 
-    def move_brick_left(self) -> None:
-        """Moves brick left."""
-        self.__matrix.move_brick_left()
+                # seek back
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
+                    playback.seek(max(self.__simulation.ticks - seek_ticks, 0))
 
+                # seek forward
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_RIGHT:
+                    playback.seek(self.__simulation.ticks + seek_ticks)
 
-    def move_brick_right(self) -> None:
-        """Moves brick right."""
-        self.__matrix.move_brick_right()
+                # quit
+                elif event.type == pygame.KEYDOWN and (event.key == pygame.K_ESCAPE or event.key == pygame.K_q):
+                    return
 
+                # debug toggle
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_d:
+                    self.__renderer.debug = not self.__renderer.debug
 
-    def move_brick_down(self) -> bool:
-        """Moves brick down.  Returns true if brick hits bottom."""
-        hit = self.__matrix.move_brick_down()
-        if hit:
-            self.__stats.increment_score(1)
-        return hit
+            # advance recorded game in fixed ticks
+            for _ in range(0, self.__simulation.scheduler.advance(elapsed * speed)):
+                if not playback.done:
+                    playback.tick()
 
+            # draw frame
+            self.__renderer.update_frame(self.__simulation.engine.matrix, self.__simulation.engine.stats, None, trail=self.__simulation.trail)
 
-    def rotate_brick(self) -> None:
-        """Rotates brick."""
-        self.__matrix.rotate_brick()
+        # game over
+        self.explode_spaces()
 
 
-    def drop_brick_to_bottom(self) -> None:
-        """Animates a brick dropping to bottom of screen."""
-        hit = False
-        while not hit:
-            self.__renderer.clock.tick(30)
-            for _ in range(0, 3):
-                hit = self.move_brick_down()
-                if hit:
-                    break
-            self.__renderer.event_pump()
-            self.__renderer.update_frame(self.__matrix, self.__stats, None)
-        self.__stats.increment_score(2)
+    def attract_loop(self, actions_per_second: float = 12.0) -> None:
+        """Plays bot demo games, apart from any paused game, until a key is pressed."""
 
+        # demo game, bot moves at a watchable pace
+        simulation = Simulation(Engine(GameStats(), auto_clear=False, generator=RandomGenerator()), FixedStepScheduler(60),
+                                self.__instant_drop, self.__instant_drop)
+        simulation.new_game(GameStats())
+        bot = Bot()
+        ticks_per_action = max(int(simulation.scheduler.tick_rate / actions_per_second), 1)
+        self.__clock.tick()
 
-    def is_drop_time(self) -> bool:
-        """Returns true if it's time for brick to drop."""
-        if self.__matrix.brick is not None:
-            drop_interval = self.__level_drop_intervals[self.__stats.level - 1]
-            return self.__matrix.brick.is_drop_time(drop_interval)
-        return False
+        # event loop
+        while True:
 
+            # limit fps
+            elapsed = self.__clock.tick(self.__render_fps) / 1000.0
 
-    def brick_hit(self) -> bool:
-        """Executed when brick hits bottom and comes to rest.  Spawns new brick.  Returns true on new brick collision (game over)."""
-        self.__matrix.add_brick_to_matrix()
-        rows_to_erase = self.__matrix.identify_solid_rows()
-        if len(rows_to_erase) > 0:
-            rows = len(rows_to_erase)
-            self.__stats.add_lines(rows)
-            points = 40
-            if rows == 2:
-                points = 100
-            elif rows == 3:
-                points = 300
-            elif rows == 4:
-                points = 1200
-            self.__stats.increment_score(points)
-            self.erase_filled_rows(rows_to_erase)
-            self.drop_grid()
-            self.__renderer.event_pump()
-            self.__renderer.update_frame(self.__matrix, self.__stats, None)
-        collision = self.__matrix.spawn_brick()
-        return collision
+            # any key ends demo
+            for event in pygame.event.get():
+                if event.type == pygame.KEYDOWN:
+                    return
 
+            # advance demo in fixed ticks, next game once over
+            for _ in range(0, simulation.scheduler.advance(elapsed)):
+                if (not simulation.scheduler.busy) and (simulation.ticks % ticks_per_action == 0):
+                    simulation.push(bot.next_action(simulation.engine.matrix))
+                simulation.tick()
+            if simulation.engine.game_over and not simulation.scheduler.busy:
+                simulation.new_game(GameStats())
+                bot.reset()
 
-    def erase_filled_rows(self, rows_to_erase: List[int]) -> None:
-        """Animates erasure of filled rows."""
-        for x in range(1, 11):
-            for y in rows_to_erase:
-                self.__matrix.matrix[x][y] = 0
-                self.__matrix.color[x][y] = Colors.Black
-            if (x % 2) == 0:
-                self.__renderer.event_pump()
-                self.__renderer.update_frame(self.__matrix, self.__stats, None)
-
-
-    def drop_grid(self) -> None:
-        """Drops hanging pieces to resting place."""
-        while self.drop_grid_once():
-            pass
-
-
-    def drop_grid_once(self) -> bool:
-        """Drops hanging pieces, bottom-most row."""
-        top_filled_row = 0
-        for row in range(1, 21):
-            empty = True
-            for x in range(1, 11):
-                if self.__matrix.matrix[x][row] == 1:
-                    empty = False
-                    break
-            if not empty:
-                top_filled_row = row
-                break
-        if top_filled_row == 0:
-            return False
-        bottom_empty_row = 0
-        for row in range(20, (top_filled_row - 1), -1):
-            empty = True
-            for x in range(1, 11):
-                if self.__matrix.matrix[x][row] == 1:
-                    empty = False
-                    break
-            if empty:
-                bottom_empty_row = row
-                break
-        if bottom_empty_row == 0:
-            return False
-        for y in range(bottom_empty_row, 1, -1):
-            for x in range(1, 11):
-                self.__matrix.matrix[x][y] = self.__matrix.matrix[x][y - 1]
-                self.__matrix.color[x][y] = self.__matrix.color[x][y - 1]
-        for x in range(1, 11):
-            self.__matrix.matrix[x][1] = 0
-            self.__matrix.color[x][1] = Colors.Black
-        return True
+            # draw frame
+            self.__renderer.update_frame(simulation.engine.matrix, simulation.engine.stats, None, trail=simulation.trail)
 
 
-    def explode_spaces(self) -> None:
-        """Explodes matrix spaces outwards on game over."""
-        self.__matrix.add_brick_to_matrix()
-        spaces: List[ExplodingSpace] = []
+    def new_game(self) -> None:
+        """Resets state and starts a new game."""
+        self.stop_recording()
+        self.__simulation.new_game(GameStats(), self.__seed)
+        if self.__record_path is not None:
+            self.__recorder = ReplayWriter(self.__record_path, self.__simulation)
+            self.__simulation.recorder = self.__recorder
+
+
+    def stop_recording(self) -> None:
+        """Finishes recording the current game, if any."""
+        if self.__recorder is not None:
+            self.__recorder.close(self.__simulation.ticks)
+            self.__simulation.recorder = None
+            self.__recorder = None
+
+
+    def explode_spaces(self, shards: int = 1) -> None:
+        """Explodes matrix spaces outwards on game over, optionally split into shards x shards particles."""
+        matrix = self.__simulation.engine.matrix
+        matrix.add_brick_to_matrix()
+        screen_size = self.__renderer.screen_size
+        size = SpriteAtlas.BORDERED_SIZE
+        particles = ParticleSystem((-size, -size, screen_size[0], screen_size[1]), shards)
+        spaces: List[Tuple[float, float, int]] = []
         for x in range(1, 11):
             for y in range(1, 21):
-                if self.__matrix.matrix[x][y] == 1:
-                    space_x = (((x - 1) * 33) + 2) + ((self.__renderer.screen_size[0] - 333) // 2) - 1
-                    space_y = (((y - 1) * 33) + 2) + ((self.__renderer.screen_size[1] - 663) // 2) - 1
-                    spaces.append(ExplodingSpace(space_x, space_y, self.__matrix.color[x][y]))
-                    self.__matrix.matrix[x][y] = 0
-                    self.__matrix.color[x][y] = Colors.Black
-        start_time = perf_counter()
-        have_spaces = True
-        while have_spaces:
-            seconds = perf_counter() - start_time
-            have_spaces = False
-            for space in spaces:
-                space.x += space.x_motion * seconds
-                space.y += space.y_motion * seconds
-                if (space.x > 0) and (space.x < 1000) and (space.y > 0) and (space.y < 700):
-                    have_spaces = True
-            self.__clock.tick(30)
-            self.__renderer.update_frame(self.__matrix, self.__stats, spaces)
+                if matrix.matrix[x][y] == 1:
+                    space_x = (((x - 1) * 33) + 2) + ((screen_size[0] - 333) // 2) - 1
+                    space_y = (((y - 1) * 33) + 2) + ((screen_size[1] - 663) // 2) - 1
+                    spaces.append((space_x, space_y, matrix.color_index_at(x, y)))
+                    matrix.set_cell(x, y, 0, Colors.Black)
+        particles.explode(spaces, size)
+
+        # run explosion until all particles are off screen
+        self.__simulation.scheduler.reset()
+        self.__simulation.scheduler.start(ExplosionAnimation(particles))
+        while self.__simulation.scheduler.busy:
+            elapsed = self.__clock.tick(self.__render_fps) / 1000.0
+            self.__renderer.event_pump()
+            for _ in range(0, self.__simulation.scheduler.advance(elapsed)):
+                self.__simulation.scheduler.tick()
+            self.__renderer.update_frame(matrix, self.__simulation.engine.stats, particles, self.__simulation.scheduler.alpha)
 
 
 # start main function
 if __name__ == "__main__":
-    bricker = Bricker()
-    bricker.main()
+    parser = argparse.ArgumentParser(description="Bricker - A Tetris-like brick game.")
+    parser.add_argument("--profile", metavar="FILE", help="write frame stage timings to FILE on exit (.csv or .json)")
+    parser.add_argument("--seed", type=int, help="play the same piece sequence every game")
+    parser.add_argument("--bag", action="store_true", help="deal pieces from shuffled bags of all seven shapes")
+    parser.add_argument("--record", metavar="FILE", help="record each game to FILE as a replay, overwriting the last")
+    parser.add_argument("--replay", metavar="FILE", help="watch a recorded game instead of playing")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier (default 1)")
+    parser.add_argument("--attract", type=float, metavar="SECONDS", help="bot plays a demo after the menu is idle SECONDS, "
+                        "scoring every placement it can reach by the next brick's best straight drop")
+    parser.add_argument("--animated-drop", action="store_true", help="animate hard drops, input waits until the brick lands")
+    parser.add_argument("--no-ghost", action="store_true", help="don't show where the brick will land")
+    parser.add_argument("--practice", action="store_true", help="backspace takes back the last brick placed")
+    args = parser.parse_args()
+    bricker = Bricker(args.profile, BagGenerator() if args.bag else RandomGenerator(), args.seed, args.record, args.attract,
+                      not args.animated_drop, not args.no_ghost, args.practice)
+    if args.replay is not None:
+        bricker.replay_loop(args.replay, args.speed)
+    else:
+        bricker.main()
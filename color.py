@@ -2,37 +2,19 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import Tuple
+from typing import Tuple, List, Dict, NamedTuple
 
 
-class Color:
-    """Stores RGB color information."""
-
-    def __init__(self, r: int, g: int, b: int) -> None:
-        """Class constructor."""
-        self.__r = r
-        self.__g = g
-        self.__b = b
-
-    @property
-    def r(self) -> int:
-        """Red value."""
-        return self.__r
-
-    @property
-    def g(self) -> int:
-        """Green value."""
-        return self.__g
-
-    @property
-    def b(self) -> int:
-        """Blue value."""
-        return self.__b
+class Color(NamedTuple):
+    """Immutable RGB color.  It's a tuple, so pygame takes it as is."""
+    r: int
+    g: int
+    b: int
 
     @property
     def value(self) -> Tuple[int, int, int]:
-        """Returns the RGB values as a Tuple, needed for pygame."""
-        return self.__r, self.__g, self.__b
+        """Returns the RGB values as a Tuple, needed for pygame.  That's the color itself, nothing is built."""
+        return self
 
 
 class Colors:
@@ -54,3 +36,13 @@ class Colors:
     ForestGreen = Color(54, 137, 38)
     TuftsBlue = Color(74, 125, 219)
     TestBack = Color(25, 0, 0)
+
+    @staticmethod
+    def palette() -> List[Color]:
+        """Returns every static color, in definition order."""
+        return [x for x in vars(Colors).values() if isinstance(x, Color)]
+
+
+# fixed palette of the static colors, matrix color planes store indexes into it (0 is black)
+PALETTE: Tuple[Color, ...] = tuple(Colors.palette())
+PALETTE_INDEXES: Dict[Tuple[int, int, int], int] = {x.value: i for i, x in enumerate(PALETTE)}
@@ -0,0 +1,260 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Optional, Dict, Tuple, NamedTuple
+from matrix import Matrix, MatrixState
+from pieces import PieceGenerator
+from game_stats import GameStats, StatsState
+
+
+class Actions:
+    """Contains the player actions accepted by the engine."""
+    Nothing = 0
+    Left = 1
+    Right = 2
+    Down = 3
+    Rotate = 4
+    Drop = 5
+
+
+class GameEvent:
+    """A game event emitted by the engine, for the front end to animate."""
+    BrickLocked = 1
+    RowsFilled = 2
+    RowsCleared = 3
+    BrickSpawned = 4
+    GameOver = 5
+
+    def __init__(self, event_type: int, rows: Optional[List[int]] = None, points: int = 0) -> None:
+        """Class constructor."""
+        self.__event_type: int = event_type
+        self.__rows: List[int] = rows if rows is not None else []
+        self.__points: int = points
+
+    @property
+    def event_type(self) -> int:
+        """Returns the event type."""
+        return self.__event_type
+
+    @property
+    def rows(self) -> List[int]:
+        """Returns the matrix rows involved, if any."""
+        return self.__rows
+
+    @property
+    def points(self) -> int:
+        """Returns points scored by the event, if any."""
+        return self.__points
+
+
+class EngineState(NamedTuple):
+    """Immutable snapshot of a game in progress, see Engine.snapshot()."""
+    matrix: MatrixState
+    stats: StatsState
+    time: float
+    last_drop_time: float
+    pending_rows: Tuple[int, ...]
+    game_over: bool
+
+
+class Engine:
+    """Headless game rules.  Owns the matrix, stats and scoring, and advances on explicit steps
+    using a virtual clock, so games can be simulated without a display or real time."""
+
+    line_points = {1: 40, 2: 100, 3: 300, 4: 1200}
+
+    def __init__(self, stats: Optional[GameStats] = None, auto_clear: bool = True, drop_intervals: Optional[List[float]] = None,
+                 generator: Optional[PieceGenerator] = None, line_points: Optional[Dict[int, int]] = None) -> None:
+        """Class constructor.  When auto_clear is false, filled rows wait for clear_rows() so they can be animated.
+        Bricks come from the piece generator, if given, else an unseeded random one.  Line points, if given,
+        replace the standard points for clearing 1-4 rows at once."""
+        self.__matrix: Matrix = Matrix(generator)
+        self.__stats: GameStats = stats if stats is not None else GameStats(False)
+        self.__auto_clear: bool = auto_clear
+        self.__level_drop_intervals: List[float] = drop_intervals if drop_intervals is not None else self.default_drop_intervals()
+        self.__line_points: Dict[int, int] = line_points if line_points is not None else dict(Engine.line_points)
+        self.__time: float = 0.0
+        self.__last_drop_time: float = 0.0
+        self.__pending_rows: List[int] = []
+        self.__game_over: bool = False
+
+    @property
+    def matrix(self) -> Matrix:
+        """Returns the game matrix."""
+        return self.__matrix
+
+    @property
+    def stats(self) -> GameStats:
+        """Returns the game stats."""
+        return self.__stats
+
+    @property
+    def time(self) -> float:
+        """Returns the virtual clock, in seconds since the game started."""
+        return self.__time
+
+    @property
+    def last_drop_time(self) -> float:
+        """Returns the virtual clock time of the brick's last drop, gravity drops it again a drop interval later."""
+        return self.__last_drop_time
+
+    @property
+    def game_over(self) -> bool:
+        """Returns true once the game has ended."""
+        return self.__game_over
+
+    @property
+    def pending_rows(self) -> List[int]:
+        """Returns filled rows waiting for clear_rows(), when auto-clear is off."""
+        return self.__pending_rows
+
+    @property
+    def level_drop_intervals(self) -> List[float]:
+        """Returns brick drop interval (seconds) for each level."""
+        return self.__level_drop_intervals
+
+    @property
+    def points_per_lines(self) -> Dict[int, int]:
+        """Returns points for clearing 1-4 rows at once."""
+        return self.__line_points
+
+    @property
+    def drop_interval(self) -> float:
+        """Returns brick drop interval (seconds) for current level."""
+        level = min(max(self.__stats.level, 1), len(self.__level_drop_intervals))
+        return self.__level_drop_intervals[level - 1]
+
+    @staticmethod
+    def default_drop_intervals() -> List[float]:
+        """Returns the standard drop intervals for levels 1-10."""
+        intervals = []
+        interval = 2.0
+        for _ in range(0, 10):
+            interval *= 0.8
+            intervals.append(interval)
+        return intervals
+
+    def new_game(self, stats: Optional[GameStats] = None, seed: Optional[int] = None) -> List[GameEvent]:
+        """Resets state and starts a new game.  If a seed is given the piece sequence restarts from it."""
+        self.__stats = stats if stats is not None else GameStats(False)
+        self.__time = 0.0
+        self.__last_drop_time = 0.0
+        self.__pending_rows = []
+        self.__game_over = False
+        self.__matrix.new_game(seed)
+        return [GameEvent(GameEvent.BrickSpawned)]
+
+    def snapshot(self) -> EngineState:
+        """Returns the game in progress as an immutable state, for undo, save and resume, or search."""
+        return EngineState(self.__matrix.snapshot(), self.__stats.snapshot(), self.__time, self.__last_drop_time,
+                           tuple(self.__pending_rows), self.__game_over)
+
+    def restore(self, state: EngineState) -> None:
+        """Returns the game to a snapshot.  The stats object is kept, with its high scores."""
+        self.__matrix.restore(state.matrix)
+        self.__stats.restore(state.stats)
+        self.__time = state.time
+        self.__last_drop_time = state.last_drop_time
+        self.__pending_rows = list(state.pending_rows)
+        self.__game_over = state.game_over
+
+    def set_clock(self, time: float, last_drop_time: float) -> None:
+        """Sets the virtual clock and last drop time, used to resume a game from saved state."""
+        self.__time = time
+        self.__last_drop_time = last_drop_time
+
+    def step(self, action: int = Actions.Nothing, elapsed: float = 0.0) -> List[GameEvent]:
+        """Applies a player action, advances the virtual clock and applies gravity.  Returns resulting events."""
+
+        # nothing to do?
+        if self.__game_over or (len(self.__pending_rows) > 0):
+            return []
+
+        # player action
+        hit = False
+        if action == Actions.Left:
+            self.move_brick_left()
+        elif action == Actions.Right:
+            self.move_brick_right()
+        elif action == Actions.Down:
+            self.move_brick_down()
+        elif action == Actions.Rotate:
+            self.rotate_brick()
+        elif action == Actions.Drop:
+            self.drop_brick_to_bottom()
+            hit = True
+
+        # gravity
+        self.__time += elapsed
+        if (not hit) and self.is_drop_time():
+            hit = self.move_brick_down()
+
+        # brick hit bottom?
+        if hit:
+            return self.brick_hit()
+        return []
+
+    def move_brick_left(self) -> None:
+        """Moves brick left."""
+        self.__matrix.move_brick_left()
+
+    def move_brick_right(self) -> None:
+        """Moves brick right."""
+        self.__matrix.move_brick_right()
+
+    def move_brick_down(self) -> bool:
+        """Moves brick down, resets drop timer.  Returns true if brick hits bottom."""
+        self.__last_drop_time = self.__time
+        hit = self.__matrix.move_brick_down()
+        if hit:
+            self.__stats.increment_score(1)
+        return hit
+
+    def rotate_brick(self) -> None:
+        """Rotates brick."""
+        self.__matrix.rotate_brick()
+
+    def drop_brick_to_bottom(self) -> None:
+        """Drops brick to bottom instantly."""
+        self.__matrix.drop_brick()
+        self.move_brick_down()
+        self.__stats.increment_score(2)
+
+    def is_drop_time(self) -> bool:
+        """Returns true if it's time for brick to drop (gravity)."""
+        if self.__matrix.brick is not None:
+            return (self.__time - self.__last_drop_time) >= self.drop_interval
+        return False
+
+    def brick_hit(self) -> List[GameEvent]:
+        """Executed when brick hits bottom and comes to rest.  Scores filled rows and spawns new brick."""
+        events = [GameEvent(GameEvent.BrickLocked)]
+        self.__matrix.add_brick_to_matrix()
+        rows_to_erase = self.__matrix.identify_solid_rows()
+        if len(rows_to_erase) > 0:
+            rows = len(rows_to_erase)
+            points = self.__line_points[min(rows, 4)]
+            self.__stats.add_lines(rows)
+            self.__stats.increment_score(points)
+            events.append(GameEvent(GameEvent.RowsFilled, rows_to_erase, points))
+            self.__pending_rows = rows_to_erase
+            if not self.__auto_clear:
+                return events
+        events += self.clear_rows()
+        return events
+
+    def clear_rows(self) -> List[GameEvent]:
+        """Erases pending filled rows, drops hanging pieces and spawns the next brick."""
+        events = []
+        if len(self.__pending_rows) > 0:
+            events.append(GameEvent(GameEvent.RowsCleared, self.__pending_rows))
+            self.__matrix.clear_rows(self.__pending_rows)
+            self.__pending_rows = []
+        self.__last_drop_time = self.__time
+        if self.__matrix.spawn_brick():
+            self.__game_over = True
+            events.append(GameEvent(GameEvent.GameOver))
+        else:
+            events.append(GameEvent(GameEvent.BrickSpawned))
+        return events
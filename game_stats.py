@@ -2,17 +2,25 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import List
+from typing import List, NamedTuple
 import sys
 import os.path
 
 
+class StatsState(NamedTuple):
+    """Immutable snapshot of the current game's stats, see GameStats.snapshot()."""
+    score: int
+    lines: int
+    level: int
+
+
 class GameStats:
     """Stores current score, high scores, and other game statistics."""
 
-    def __init__(self) -> None:
-        """Class constructor."""
-        self.__high_scores: List[HighScore] = self.__load_high_scores()
+    def __init__(self, persist: bool = True) -> None:
+        """Class constructor.  High scores are loaded from and saved to disk only when persist is true."""
+        self.__persist: bool = persist
+        self.__high_scores: List[HighScore] = self.__load_high_scores() if persist else []
         self.__current_score: int = 0
         self.__lines: int = 0
         self.__level: int = 1
@@ -42,6 +50,16 @@ class GameStats:
         """Sets the current level."""
         self.__level = value
 
+    def snapshot(self) -> StatsState:
+        """Returns the current game's score, lines and level.  High scores aren't included."""
+        return StatsState(self.__current_score, self.__lines, self.__level)
+
+    def restore(self, state: StatsState) -> None:
+        """Sets the current game's score, lines and level from a snapshot."""
+        self.__current_score = state.score
+        self.__lines = state.lines
+        self.__level = state.level
+
     def __load_high_scores(self) -> List['HighScore']:
         """Load high scores from file."""
         scores = []
@@ -79,7 +97,8 @@ class GameStats:
         """Adds new score, sorts and limits to top 10, saves to disk."""
         self.__high_scores.append(HighScore(initials, self.__current_score))
         self.__high_scores = self.__sort_scores(self.__high_scores)
-        self.__save_high_scores(self.__high_scores)
+        if self.__persist:
+            self.__save_high_scores(self.__high_scores)
 
     @staticmethod
     def __sort_scores(scores: List['HighScore']) -> List['HighScore']:
@@ -99,20 +118,7 @@ class GameStats:
         self.__current_score += value
 
 
-class HighScore:
+class HighScore(NamedTuple):
     """Stores a single high score."""
-
-    def __init__(self, initials: str, score: int) -> None:
-        """Class constructor."""
-        self.__initials: str = initials
-        self.__score: int = score
-
-    @property
-    def initials(self) -> str:
-        """Returns gamer's initials."""
-        return self.__initials
-
-    @property
-    def score(self) -> int:
-        """Returns high-score value."""
-        return self.__score
+    initials: str       # gamer's initials
+    score: int          # high-score value
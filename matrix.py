@@ -2,29 +2,50 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import List, Optional
-from random import randint
-from brick import Brick
-from color import Color
+from typing import List, Optional, Set, Tuple, NamedTuple
+from brick import Brick, BrickState
+from pieces import PieceGenerator, RandomGenerator
+from color import Color, PALETTE, PALETTE_INDEXES
+import bitboard
+import zobrist
+
+
+class MatrixState(NamedTuple):
+    """Immutable snapshot of a matrix, see Matrix.snapshot()."""
+    rows: Tuple[int, ...]           # row bitmasks, see bitboard
+    colors: bytes                   # color plane, see Matrix.color_indexes
+    brick: Optional[BrickState]     # live brick, if any
+    seed: int                       # piece sequence seed
+    dealt: int                      # bricks taken from the sequence
 
 
 class Matrix:
     """Stores the 10x20 game matrix.  Contains matrix-related game logic."""
 
-    def __init__(self) -> None:
-        """Class constructor."""
+    def __init__(self, generator: Optional[PieceGenerator] = None, source: Optional['Matrix'] = None) -> None:
+        """Class constructor.  Bricks come from the piece generator, if given, else an unseeded random one.  Given a
+        SOURCE matrix, its board and live brick are taken over, the board shared until either changes it (see clone)."""
         self.__width: int = 12     # 10 visible slots, plus border for collision detection
         self.__height: int = 22    # 20 visible slots, plus border for collision detection
-        self.__matrix: List[List[int]] = [[0 for x in range(self.__height)] for y in range(self.__width)]
-        self.__color: List[List[Color]] = [[Color(0, 0, 0) for x in range(self.__height)] for y in range(self.__width)]
-        for x in range(0, 12):
-            self.__matrix[x][0] = 1
-            self.__matrix[x][21] = 1
-        for y in range(0, 22):
-            self.__matrix[0][y] = 1
-            self.__matrix[11][y] = 1
+        self.__matrix: List[List[int]] = []
+        self.__colors: bytearray = bytearray()
+        self.__rows: List[int] = []
+        self.__row_counts: List[int] = []
+        self.__column_counts: List[int] = []
+        self.__column_heights: List[int] = []
+        self.__column_holes: List[int] = []
+        self.__holes: int = 0
+        self.__full_rows: Set[int] = set()
+        self.__hash: int = 0
         self.__brick: Optional[Brick] = None
-        self.__next_brick: Optional[Brick] = None
+        self.__generator: PieceGenerator = generator if generator is not None else RandomGenerator()
+        self.__changed_cells: Set[Tuple[int, int]] = set()
+        self.__shared: bool = False
+        self.__shared_generator: bool = False
+        if source is not None:
+            self.__share(source)
+        else:
+            self.__new_board()
 
     @property
     def width(self) -> int:
@@ -42,9 +63,49 @@ class Matrix:
         return self.__matrix
 
     @property
-    def color(self) -> List[List[Color]]:
-        """Returns color matrix."""
-        return self.__color
+    def rows(self) -> List[int]:
+        """Returns game matrix as row bitmasks (see bitboard module).  The matrix property is a list view of the same."""
+        return self.__rows
+
+    @property
+    def row_fill_counts(self) -> List[int]:
+        """Returns solid visible spaces in each row, indexed by y, kept up to date as cells change.  Read only."""
+        return self.__row_counts
+
+    @property
+    def column_heights(self) -> List[int]:
+        """Returns height of each column's top solid space above the floor, indexed by x (walls 0), kept up to date
+        as cells change.  Read only."""
+        return self.__column_heights
+
+    @property
+    def column_holes(self) -> List[int]:
+        """Returns empty spaces below each column's top solid space, indexed by x (walls 0), kept up to date as cells
+        change.  Read only."""
+        return self.__column_holes
+
+    @property
+    def holes(self) -> int:
+        """Returns empty spaces below the top of their column, all columns."""
+        return self.__holes
+
+    @property
+    def board_hash(self) -> int:
+        """Returns the Zobrist hash of the solid visible spaces (see zobrist module), kept up to date as cells change."""
+        return self.__hash
+
+    @property
+    def state_hash(self) -> int:
+        """Returns the Zobrist hash of the solid visible spaces and the live brick's shape, rotation and position."""
+        brick = self.__brick
+        if brick is None:
+            return self.__hash
+        return self.__hash ^ zobrist.brick_key(brick.shape_num, brick.rotation, brick.x, brick.y)
+
+    @property
+    def color_indexes(self) -> bytearray:
+        """Returns color plane, one palette index per space, rows first ([y * width + x])."""
+        return self.__colors
 
     @property
     def brick(self) -> Optional[Brick]:
@@ -54,73 +115,306 @@ class Matrix:
     @property
     def next_brick(self) -> Optional[Brick]:
         """Returns next brick."""
-        return self.__next_brick
+        return self.__generator.next_brick
+
+    @property
+    def generator(self) -> PieceGenerator:
+        """Returns the piece generator."""
+        self.__unshare_generator()
+        return self.__generator
+
+    def preview(self, count: int) -> List[Brick]:
+        """Returns the next COUNT bricks to spawn."""
+        return self.__generator.peek(count)
 
-    def new_game(self) -> None:
-        """Resets the game."""
+    def new_game(self, seed: Optional[int] = None) -> None:
+        """Resets the game.  If a seed is given the piece sequence restarts from it, else it carries on."""
         self.__brick = None
-        self.__next_brick = None
+        if seed is not None:
+            self.__unshare_generator()
+            self.__generator.reset(seed)
+        self.__new_board()
+        self.spawn_brick()
+
+    def __new_board(self) -> None:
+        """Empties the board, all but the walls and floor."""
         self.__matrix = [[0 for x in range(self.__height)] for y in range(self.__width)]
-        self.__color = [[Color(0, 0, 0) for x in range(self.__height)] for y in range(self.__width)]
+        self.__colors = bytearray(self.__width * self.__height)
         for x in range(0, 12):
             self.__matrix[x][0] = 1
             self.__matrix[x][21] = 1
         for y in range(0, 22):
             self.__matrix[0][y] = 1
             self.__matrix[11][y] = 1
-        self.spawn_brick()
+        self.__rows = self.__new_rows()
+        self.__shared = False
+        self.__reset_indexes()
+        self.__mark_all_changed()
+
+    def __share(self, source: 'Matrix') -> None:
+        """Takes over a source matrix's board storage, copy on write, and a copy of its live brick."""
+        self.__matrix = source.matrix
+        self.__colors = source.color_indexes
+        self.__rows = source.rows
+        self.__row_counts = source.row_fill_counts
+        self.__column_heights = source.column_heights
+        self.__column_holes = source.column_holes
+        self.__column_counts = [height - holes for height, holes in zip(self.__column_heights, self.__column_holes)]
+        self.__holes = source.holes
+        self.__full_rows = set(source.identify_solid_rows())
+        self.__hash = source.board_hash
+        self.__brick = Brick.from_state(source.brick.snapshot()) if source.brick is not None else None
+        self.__shared = True
+        self.__shared_generator = True
+        self.__mark_all_changed()
+
+    def snapshot(self) -> MatrixState:
+        """Returns the matrix, live brick and piece sequence position as an immutable state."""
+        brick = self.__brick.snapshot() if self.__brick is not None else None
+        return MatrixState(tuple(self.__rows), bytes(self.__colors), brick, self.__generator.seed, self.__generator.dealt)
+
+    def restore(self, state: MatrixState) -> None:
+        """Returns the matrix, live brick and piece sequence to a snapshot.  Spaces that differ are recorded as
+        changed.  The piece sequence is only replayed from its seed if its position moved."""
+        old_rows = self.__rows
+        old_colors = self.__colors
+        self.__rows = list(state.rows)
+        self.__colors = bytearray(state.colors)
+        self.__matrix = [[1 if row & bit else 0 for row in self.__rows] for bit in [bitboard.cell_bit(x) for x in range(self.__width)]]
+        self.__shared = False
+        self.__rebuild_indexes()
+        width = self.__width
+        for y in range(1, self.__height - 1):
+            if (old_rows[y] != self.__rows[y]) or (old_colors[y * width:(y + 1) * width] != self.__colors[y * width:(y + 1) * width]):
+                self.__changed_cells.update((x, y) for x in range(1, width - 1))
+        self.__brick = Brick.from_state(state.brick) if state.brick is not None else None
+        if (self.__generator.seed != state.seed) or (self.__generator.dealt != state.dealt):
+            self.__unshare_generator()
+            self.__generator.reset(state.seed, state.dealt)
+
+    def clone(self) -> 'Matrix':
+        """Returns an independent copy of the matrix, live brick and piece sequence.  The board and piece sequence
+        are shared until either copy changes them, then that copy takes its own (copy on write), so clones that
+        are only searched cost next to nothing."""
+        self.__shared = True
+        self.__shared_generator = True
+        return Matrix(self.__generator, self)
 
     def spawn_brick(self) -> bool:
-        """Spawns a random new brick.  Returns true on collision (game over)."""
-        if self.__next_brick is None:
-            shape_num = randint(1, 7)
-            self.__next_brick = Brick(shape_num)
-        self.__brick = self.__next_brick
-        shape_num = randint(1, 7)
-        self.__next_brick = Brick(shape_num)
-        collision = self.__brick.collision(self.__matrix)
+        """Spawns the next brick in sequence.  Returns true on collision (game over)."""
+        self.__unshare_generator()
+        self.__brick = self.__generator.next()
+        collision = self.__brick.collision(self.__rows)
         return collision
 
     def add_brick_to_matrix(self) -> None:
         """Moves resting brick to matrix."""
         if self.__brick is not None:
-            for x in range(0, self.__brick.width):
-                for y in range(0, self.__brick.height):
-                    if self.__brick.grid[x][y] == 1:
-                        self.__matrix[x + self.__brick.x][y + self.__brick.y] = 1
-                        self.__color[x + self.__brick.x][y + self.__brick.y] = self.__brick.color
+            brick = self.__brick
+            color_index = brick.color_index
+            left = brick.x
+            top = brick.y
+            for x, y in brick.cells:
+                self.set_cell_index(x + left, y + top, 1, color_index)
         self.__brick = None
 
+    def color_at(self, x: int, y: int) -> Color:
+        """Returns color of a single matrix space."""
+        return PALETTE[self.__colors[(y * self.__width) + x]]
+
+    def color_index_at(self, x: int, y: int) -> int:
+        """Returns palette index of a single matrix space's color."""
+        return self.__colors[(y * self.__width) + x]
+
+    def set_cell(self, x: int, y: int, value: int, color: Color) -> None:
+        """Sets a single matrix space, recording it as changed if it differs and is visible."""
+        self.set_cell_index(x, y, value, PALETTE_INDEXES[color.value])
+
+    def set_cell_index(self, x: int, y: int, value: int, color_index: int) -> None:
+        """Sets a single matrix space, color given as palette index, recording it as changed if it differs and is visible."""
+        i = (y * self.__width) + x
+        old_value = self.__matrix[x][y]
+        if (old_value != value) or (self.__colors[i] != color_index):
+            if self.__shared:
+                self.__unshare()
+            self.__matrix[x][y] = value
+            self.__colors[i] = color_index
+            if value == 1:
+                self.__rows[y] |= bitboard.cell_bit(x)
+            else:
+                self.__rows[y] &= ~bitboard.cell_bit(x)
+            if (0 < x < self.__width - 1) and (0 < y < self.__height - 1):
+                self.__changed_cells.add((x, y))
+                if old_value != value:
+                    self.__index_cell(x, y, value)
+
+    def __unshare(self) -> None:
+        """Takes a private copy of board storage shared with a clone, before changing it."""
+        self.__matrix = [list(x) for x in self.__matrix]
+        self.__rows = list(self.__rows)
+        self.__colors = bytearray(self.__colors)
+        self.__row_counts = list(self.__row_counts)
+        self.__column_counts = list(self.__column_counts)
+        self.__column_heights = list(self.__column_heights)
+        self.__column_holes = list(self.__column_holes)
+        self.__full_rows = set(self.__full_rows)
+        self.__shared = False
+
+    def __unshare_generator(self) -> None:
+        """Takes a private copy of a piece sequence shared with a clone, before it's advanced or handed out."""
+        if self.__shared_generator:
+            self.__generator = self.__generator.clone()
+            self.__shared_generator = False
+
+    def __index_cell(self, x: int, y: int, value: int) -> None:
+        """Updates row fill counts, column heights, holes and the board hash for a visible space that was just filled or emptied."""
+        width = self.__width - 2
+        height = self.__height - 1 - y
+        self.__hash ^= zobrist.CELL_KEYS[y][x]
+        if value == 1:
+            self.__row_counts[y] += 1
+            if self.__row_counts[y] == width:
+                self.__full_rows.add(y)
+            self.__column_counts[x] += 1
+            if height > self.__column_heights[x]:
+                self.__column_heights[x] = height
+        else:
+            if self.__row_counts[y] == width:
+                self.__full_rows.discard(y)
+            self.__row_counts[y] -= 1
+            self.__column_counts[x] -= 1
+            if height == self.__column_heights[x]:
+                column = self.__matrix[x]
+                top = y + 1
+                while (top < self.__height - 1) and (column[top] == 0):
+                    top += 1
+                self.__column_heights[x] = self.__height - 1 - top
+        holes = self.__column_heights[x] - self.__column_counts[x]
+        self.__holes += holes - self.__column_holes[x]
+        self.__column_holes[x] = holes
+
+    def take_changed_cells(self) -> Set[Tuple[int, int]]:
+        """Returns visible spaces changed since the last call, and clears the change set."""
+        changed = self.__changed_cells
+        self.__changed_cells = set()
+        return changed
+
+    def __new_rows(self) -> List[int]:
+        """Returns row bitmasks of an empty matrix, walls set."""
+        rows = [bitboard.EMPTY_ROW for _ in range(self.__height)]
+        rows[0] = bitboard.FULL_ROW
+        rows[-1] = bitboard.FULL_ROW
+        return rows
+
+    def __reset_indexes(self) -> None:
+        """Resets row fill counts, column heights and holes to those of an empty matrix."""
+        self.__row_counts = [0 for _ in range(self.__height)]
+        self.__column_counts = [0 for _ in range(self.__width)]
+        self.__column_heights = [0 for _ in range(self.__width)]
+        self.__column_holes = [0 for _ in range(self.__width)]
+        self.__holes = 0
+        self.__full_rows = set()
+        self.__hash = 0
+
+    def __rebuild_indexes(self) -> None:
+        """Recounts row fill counts, column heights, holes and the board hash from the whole matrix."""
+        self.__reset_indexes()
+        floor = self.__height - 1
+        for x in range(1, self.__width - 1):
+            column = self.__matrix[x]
+            count = 0
+            height = 0
+            for y in range(1, floor):
+                if column[y] == 1:
+                    count += 1
+                    self.__row_counts[y] += 1
+                    self.__hash ^= zobrist.CELL_KEYS[y][x]
+                    if height == 0:
+                        height = floor - y
+            self.__column_counts[x] = count
+            self.__column_heights[x] = height
+            self.__column_holes[x] = height - count
+            self.__holes += height - count
+        self.__full_rows = {y for y in range(1, floor) if self.__row_counts[y] == self.__width - 2}
+
+    def __mark_all_changed(self) -> None:
+        """Records every visible space as changed."""
+        self.__changed_cells = {(x, y) for x in range(1, self.__width - 1) for y in range(1, self.__height - 1)}
+
     def move_brick_left(self) -> None:
         """Moves brick to the left."""
         if self.__brick is not None:
-            self.__brick.move_left(self.__matrix)
+            self.__brick.move_left(self.__rows)
 
     def move_brick_right(self) -> None:
         """ Moves brick to the right. """
         if self.__brick is not None:
-            self.__brick.move_right(self.__matrix)
+            self.__brick.move_right(self.__rows)
 
     def move_brick_down(self) -> bool:
         """Moves brick down.  Returns true if brick hits bottom."""
         hit = False
         if self.__brick is not None:
-            hit = self.__brick.move_down(self.__matrix)
+            hit = self.__brick.move_down(self.__rows)
         return hit
 
+    def drop_distance(self) -> int:
+        """Returns how many rows the brick can fall before it comes to rest.  Worked out from the column heights and
+        the brick's bottom profile in one pass, unless the brick is tucked under an overhang."""
+        brick = self.__brick
+        if brick is None:
+            return 0
+        distance = self.__height
+        floor = self.__height - 1
+        heights = self.__column_heights
+        left = brick.x
+        top = brick.y
+        for x, y in brick.bottoms:
+            space = (floor - heights[left + x]) - (top + y) - 1
+            if space < 0:
+                return brick.drop_distance(self.__rows)
+            if space < distance:
+                distance = space
+        return distance
+
+    def drop_brick(self) -> int:
+        """Moves brick straight down to where it comes to rest.  Returns rows fallen."""
+        distance = self.drop_distance()
+        if self.__brick is not None:
+            self.__brick.move_to_bottom(distance)
+        return distance
+
     def rotate_brick(self) -> None:
         """Rotates brick."""
         if self.__brick is not None:
-            self.__brick.rotate(self.__matrix)
+            self.__brick.rotate(self.__rows)
 
     def identify_solid_rows(self) -> List[int]:
-        """Checks matrix for solid rows, returns list of solid rows to erase."""
-        rows_to_erase = []
-        for y in range(1, 21):
-            solid = True
-            for x in range(1, 11):
-                if self.__matrix[x][y] != 1:
-                    solid = False
-            if solid:
-                rows_to_erase.append(y)
-        return rows_to_erase
+        """Returns solid rows to erase, top to bottom, from the rows kept full as cells change."""
+        return sorted(self.__full_rows)
+
+    def erase_rows(self, rows: List[int]) -> None:
+        """Empties the specified rows."""
+        for x in range(1, self.__width - 1):
+            for y in rows:
+                self.set_cell_index(x, y, 0, 0)
+
+    def drop_grid(self) -> None:
+        """Drops hanging pieces to resting place."""
+        self.clear_rows([])
+
+    def clear_rows(self, rows: List[int]) -> None:
+        """Erases the specified rows and drops hanging pieces to resting place, in a single bottom-up pass."""
+        cleared = set(rows)
+        target = self.__height - 2
+        for y in range(self.__height - 2, 0, -1):
+            if (y in cleared) or (self.__row_counts[y] == 0):
+                continue
+            if y != target:
+                for x in range(1, self.__width - 1):
+                    self.set_cell_index(x, target, self.__matrix[x][y], self.__colors[(y * self.__width) + x])
+            target -= 1
+        for y in range(target, 0, -1):
+            if self.__row_counts[y] != 0:
+                for x in range(1, self.__width - 1):
+                    self.set_cell_index(x, y, 0, 0)
@@ -0,0 +1,105 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Tuple, Any
+from matrix import Matrix
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # type: ignore[assignment]
+
+
+# Boards are stored rows first, [y][x], with the same walls, floor and ceiling as Matrix: shape
+# (22, 12) for one board or (count, 22, 12) for a batch.  The color plane holds palette indexes
+# into color.PALETTE, the same layout as Matrix.color_indexes, 0 (black) where empty.
+HEIGHT = 22
+WIDTH = 12
+
+
+def require_numpy() -> None:
+    """Raises ImportError if NumPy is not installed."""
+    if numpy is None:
+        raise ImportError("NumPy is required for NumPy-backed boards (pip install numpy).")
+
+
+def new_boards(count: int) -> Tuple[Any, Any]:
+    """Returns occupancy and color planes for a batch of empty boards, shaped (count, 22, 12)."""
+    require_numpy()
+    occupancy = numpy.zeros((count, HEIGHT, WIDTH), dtype=numpy.uint8)
+    occupancy[:, 0, :] = 1
+    occupancy[:, -1, :] = 1
+    occupancy[:, :, 0] = 1
+    occupancy[:, :, -1] = 1
+    colors = numpy.zeros((count, HEIGHT, WIDTH), dtype=numpy.uint8)
+    return occupancy, colors
+
+
+def solid_rows(occupancy: Any) -> Any:
+    """Returns a boolean mask of filled visible rows, shaped (..., 22)."""
+    solid = occupancy[..., 1:-1].all(axis=-1)
+    solid[..., 0] = False
+    solid[..., -1] = False
+    return solid
+
+
+def clear_solid_rows(occupancy: Any, colors: Any) -> Any:
+    """Erases filled rows of one board or a batch in place, dropping the rows above them (and closing any
+    empty gaps, as Matrix.drop_grid does) with a single gather per plane.  Returns lines cleared per board."""
+    require_numpy()
+
+    # rows to remove: filled, or empty
+    visible = occupancy[..., 1:-1, :]
+    solid = visible[..., 1:-1].all(axis=-1)
+    remove = solid | ~visible[..., 1:-1].any(axis=-1)
+
+    # stable sort moves removed rows to the top, kept rows keep their order
+    order = numpy.argsort(~remove, axis=-1, kind="stable")[..., None]
+    order = numpy.broadcast_to(order, visible.shape)
+    new_occupancy = numpy.take_along_axis(visible, order, axis=-2)
+    new_colors = numpy.take_along_axis(colors[..., 1:-1, :], order, axis=-2)
+
+    # blank the removed rows now at the top
+    blank = numpy.arange(visible.shape[-2]) < remove.sum(axis=-1)[..., None]
+    new_occupancy[blank, 1:-1] = 0
+    new_colors[blank] = 0
+    occupancy[..., 1:-1, :] = new_occupancy
+    colors[..., 1:-1, :] = new_colors
+    return solid.sum(axis=-1)
+
+
+class NumpyBoard:
+    """A single game matrix backed by NumPy occupancy and color planes."""
+
+    def __init__(self) -> None:
+        """Class constructor.  Creates an empty board."""
+        occupancy, colors = new_boards(1)
+        self.__occupancy: Any = occupancy[0]
+        self.__colors: Any = colors[0]
+
+    @staticmethod
+    def from_matrix(matrix: Matrix) -> 'NumpyBoard':
+        """Returns a board copied from a game matrix."""
+        board = NumpyBoard()
+        board.occupancy[:, :] = numpy.array(matrix.matrix, dtype=numpy.uint8).T
+        board.colors[:, :] = numpy.frombuffer(bytes(matrix.color_indexes), dtype=numpy.uint8).reshape(HEIGHT, WIDTH)
+        return board
+
+    @property
+    def occupancy(self) -> Any:
+        """Returns occupancy plane, (22, 12) [y][x], 1 if solid."""
+        return self.__occupancy
+
+    @property
+    def colors(self) -> Any:
+        """Returns color plane, (22, 12) [y][x] palette indexes."""
+        return self.__colors
+
+    def identify_solid_rows(self) -> List[int]:
+        """Returns list of filled rows."""
+        return [int(x) for x in numpy.flatnonzero(solid_rows(self.__occupancy))]
+
+    def clear_solid_rows(self) -> int:
+        """Erases filled rows and drops the rows above into place.  Returns lines cleared."""
+        return int(clear_solid_rows(self.__occupancy, self.__colors))
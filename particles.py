@@ -0,0 +1,140 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Tuple, Optional, Any
+from array import array
+from random import Random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # type: ignore[assignment]
+
+
+class ParticleSystem:
+    """Exploding matrix space particles, used on game over.  Positions, velocities and sprites are held in
+    parallel NumPy arrays (array module arrays if NumPy isn't installed), integrated and culled in one step."""
+
+    def __init__(self, bounds: Tuple[float, float, float, float], shards: int = 1, seed: Optional[int] = None) -> None:
+        """Class constructor.  Particles leaving bounds (left, top, right, bottom) are culled.  Each exploding
+        space splits into shards x shards particles."""
+        self.__bounds: Tuple[float, float, float, float] = bounds
+        self.__shards: int = max(shards, 1)
+        self.__random: Random = Random(seed)
+        self.__rng: Any = numpy.random.default_rng(seed) if numpy is not None else None
+        self.__x: Any = self.__new_array("d", [])
+        self.__y: Any = self.__new_array("d", [])
+        self.__last_x: Any = self.__new_array("d", [])
+        self.__last_y: Any = self.__new_array("d", [])
+        self.__x_motion: Any = self.__new_array("d", [])
+        self.__y_motion: Any = self.__new_array("d", [])
+        self.__sprite: Any = self.__new_array("H", [])
+
+    @property
+    def shards(self) -> int:
+        """Returns shards per side each exploding space splits into."""
+        return self.__shards
+
+    @property
+    def count(self) -> int:
+        """Returns number of live particles."""
+        return len(self.__x)
+
+    @staticmethod
+    def __new_array(type_code: str, values: List[Any]) -> Any:
+        """Returns a particle array of the given array module type code."""
+        if numpy is not None:
+            return numpy.array(values, dtype=numpy.float64 if type_code == "d" else numpy.uint16)
+        return array(type_code, values)
+
+    def __random_motion(self, count: int) -> Any:
+        """Returns random motion vectors, 50-350 pixels per second in either direction."""
+        if self.__rng is not None:
+            speed = (self.__rng.integers(0, 3001, count) / 10.0) + 50.0
+            return speed * self.__rng.choice((-1.0, 1.0), count)
+        motion = array("d", [])
+        for _ in range(0, count):
+            speed = (float(self.__random.randint(0, 3000)) / 10.0) + 50.0
+            motion.append(-speed if self.__random.randint(0, 1) == 1 else speed)
+        return motion
+
+    def explode(self, spaces: List[Tuple[float, float, int]], size: int) -> None:
+        """Adds particles for exploding spaces, given as (x, y, palette index) of each space's sprite of
+        width and height SIZE.  Sprite numbers are palette index * shards^2 + shard number (rows first)."""
+        shards = self.__shards
+        shard_size = size // shards
+        x, y, sprite = [], [], []
+        for space_x, space_y, color_index in spaces:
+            for shard in range(0, shards * shards):
+                x.append(space_x + ((shard % shards) * shard_size))
+                y.append(space_y + ((shard // shards) * shard_size))
+                sprite.append((color_index * shards * shards) + shard)
+        x_motion = self.__random_motion(len(x))
+        y_motion = self.__random_motion(len(x))
+        if numpy is not None:
+            self.__x = numpy.concatenate((self.__x, x))
+            self.__y = numpy.concatenate((self.__y, y))
+            self.__last_x = numpy.concatenate((self.__last_x, x))
+            self.__last_y = numpy.concatenate((self.__last_y, y))
+            self.__x_motion = numpy.concatenate((self.__x_motion, x_motion))
+            self.__y_motion = numpy.concatenate((self.__y_motion, y_motion))
+            self.__sprite = numpy.concatenate((self.__sprite, numpy.array(sprite, dtype=numpy.uint16)))
+        else:
+            self.__x.extend(x)
+            self.__y.extend(y)
+            self.__last_x.extend(x)
+            self.__last_y.extend(y)
+            self.__x_motion.extend(x_motion)
+            self.__y_motion.extend(y_motion)
+            self.__sprite.extend(sprite)
+
+    def step(self, seconds: float) -> int:
+        """Moves every particle along its motion vector for SECONDS, then culls particles out of bounds.
+        Returns number of live particles."""
+        left, top, right, bottom = self.__bounds
+        if numpy is not None:
+            self.__last_x = self.__x.copy()
+            self.__last_y = self.__y.copy()
+            self.__x += self.__x_motion * seconds
+            self.__y += self.__y_motion * seconds
+            alive = (self.__x > left) & (self.__x < right) & (self.__y > top) & (self.__y < bottom)
+            if not alive.all():
+                self.__x = self.__x[alive]
+                self.__y = self.__y[alive]
+                self.__last_x = self.__last_x[alive]
+                self.__last_y = self.__last_y[alive]
+                self.__x_motion = self.__x_motion[alive]
+                self.__y_motion = self.__y_motion[alive]
+                self.__sprite = self.__sprite[alive]
+            return len(self.__x)
+        self.__last_x = array("d", self.__x)
+        self.__last_y = array("d", self.__y)
+        keep = []
+        for i in range(0, len(self.__x)):
+            x = self.__x[i] + (self.__x_motion[i] * seconds)
+            y = self.__y[i] + (self.__y_motion[i] * seconds)
+            self.__x[i] = x
+            self.__y[i] = y
+            if (left < x < right) and (top < y < bottom):
+                keep.append(i)
+        if len(keep) < len(self.__x):
+            self.__x = array("d", [self.__x[i] for i in keep])
+            self.__y = array("d", [self.__y[i] for i in keep])
+            self.__last_x = array("d", [self.__last_x[i] for i in keep])
+            self.__last_y = array("d", [self.__last_y[i] for i in keep])
+            self.__x_motion = array("d", [self.__x_motion[i] for i in keep])
+            self.__y_motion = array("d", [self.__y_motion[i] for i in keep])
+            self.__sprite = array("H", [self.__sprite[i] for i in keep])
+        return len(self.__x)
+
+    def sprites(self, alpha: float = 1.0) -> Tuple[List[int], List[int], List[int]]:
+        """Returns integer x positions, y positions and sprite numbers of live particles, interpolated ALPHA
+        (0-1) of the way from their positions before the last step to their current ones."""
+        if numpy is not None:
+            x = self.__x if alpha >= 1.0 else self.__last_x + ((self.__x - self.__last_x) * alpha)
+            y = self.__y if alpha >= 1.0 else self.__last_y + ((self.__y - self.__last_y) * alpha)
+            return x.astype(numpy.int32).tolist(), y.astype(numpy.int32).tolist(), self.__sprite.tolist()
+        x = [int(a + ((b - a) * alpha)) for a, b in zip(self.__last_x, self.__x)]
+        y = [int(a + ((b - a) * alpha)) for a, b in zip(self.__last_y, self.__y)]
+        return x, y, self.__sprite.tolist()
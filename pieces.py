@@ -0,0 +1,134 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Optional, Deque, Dict, Type, Any
+from abc import ABC, abstractmethod
+from collections import deque
+import copy
+from random import Random, SystemRandom
+from brick import Brick
+
+
+class PieceGenerator(ABC):
+    """Seeded brick sequence with a lookahead queue.  Bricks are generated ahead of time in batches, so
+    spawning only pops the queue.  Subclasses decide the order of shapes."""
+
+    name = ""
+
+    def __init__(self, seed: Optional[int] = None, preview: int = 1, batch_size: int = 70) -> None:
+        """Class constructor.  Without a seed, one is picked at random (see seed property).  At least PREVIEW
+        bricks after the current one are always queued."""
+        self.__preview: int = max(preview, 1)
+        self.__batch_size: int = max(batch_size, self.__preview + 1)
+        self.__seed: int = 0
+        self.__random: Random = Random()
+        self.__queue: Deque[Brick] = deque()
+        self.__dealt: int = 0
+        self.reset(seed)
+
+    @property
+    def seed(self) -> int:
+        """Returns the seed of the current sequence."""
+        return self.__seed
+
+    @property
+    def preview(self) -> int:
+        """Returns the number of upcoming bricks guaranteed to be queued."""
+        return self.__preview
+
+    @property
+    def random(self) -> Random:
+        """Returns the sequence's random number generator."""
+        return self.__random
+
+    @property
+    def dealt(self) -> int:
+        """Returns number of bricks taken from the sequence since it was started."""
+        return self.__dealt
+
+    @property
+    def next_brick(self) -> Brick:
+        """Returns the brick that will spawn next."""
+        return self.__queue[0]
+
+    def reset(self, seed: Optional[int] = None, dealt: int = 0) -> None:
+        """Restarts the sequence from a seed, or a random one, with the first DEALT bricks already taken."""
+        self.__seed = seed if seed is not None else SystemRandom().randrange(1 << 32)
+        self.__random = Random(self.__seed)
+        self.__queue = deque()
+        self.__dealt = dealt
+        while dealt > 0:
+            shapes = self.generate_batch(self.__batch_size)
+            if len(shapes) > dealt:
+                self.__queue.extend(Brick(x) for x in shapes[dealt:])
+            dealt -= min(dealt, len(shapes))
+        self.__fill()
+
+    def clone(self) -> 'PieceGenerator':
+        """Returns an independent copy of the sequence, at the same position."""
+        return copy.copy(self)
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Takes the attributes of a generator being copied (see clone) or unpickled, with its own random number
+        generator and queue, so the two advance independently."""
+        self.__dict__.update(state)
+        random = Random()
+        random.setstate(self.__random.getstate())
+        self.__random = random
+        self.__queue = deque(Brick(x.shape_num) for x in self.__queue)
+
+    def peek(self, count: int) -> List[Brick]:
+        """Returns the next COUNT bricks to spawn, without removing them."""
+        while len(self.__queue) < count:
+            self.__queue.extend(Brick(x) for x in self.generate_batch(self.__batch_size))
+        return [self.__queue[i] for i in range(0, count)]
+
+    def next(self) -> Brick:
+        """Removes and returns the next brick to spawn."""
+        brick = self.__queue.popleft()
+        self.__dealt += 1
+        self.__fill()
+        return brick
+
+    def __fill(self) -> None:
+        """Generates another batch of bricks if the queue is shorter than the preview."""
+        if len(self.__queue) <= self.__preview:
+            self.__queue.extend(Brick(x) for x in self.generate_batch(self.__batch_size))
+
+    @abstractmethod
+    def generate_batch(self, count: int) -> List[int]:
+        """Returns at least COUNT upcoming shape numbers (1-7)."""
+
+
+class RandomGenerator(PieceGenerator):
+    """Each shape picked independently at random, as the original game did."""
+
+    name = "random"
+
+    def generate_batch(self, count: int) -> List[int]:
+        """Returns COUNT random shape numbers."""
+        randint = self.random.randint
+        return [randint(1, 7) for _ in range(0, count)]
+
+
+class BagGenerator(PieceGenerator):
+    """Shapes dealt from shuffled bags of all seven, so no shape is starved or repeated more than twice running."""
+
+    name = "bag"
+
+    def generate_batch(self, count: int) -> List[int]:
+        """Returns enough whole shuffled bags to cover COUNT shape numbers."""
+        shapes: List[int] = []
+        while len(shapes) < count:
+            bag = [1, 2, 3, 4, 5, 6, 7]
+            self.random.shuffle(bag)
+            shapes += bag
+        return shapes
+
+
+# generator name -> class
+GENERATORS: Dict[str, Type[PieceGenerator]] = {
+    RandomGenerator.name: RandomGenerator,
+    BagGenerator.name: BagGenerator
+}
@@ -0,0 +1,121 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Dict, Tuple
+from array import array
+from time import perf_counter
+import json
+
+
+class FrameProfiler:
+    """Records how long each stage of a frame takes into a fixed-size ring buffer of recent frames.  Stages are
+    timed as laps: each lap is charged the time since the previous one, so instrumenting a hot path costs one
+    clock read per stage."""
+
+    def __init__(self, size: int = 600) -> None:
+        """Class constructor.  Keeps the most recent SIZE frames."""
+        self.__size: int = size
+        self.__stages: List[str] = []
+        self.__stage_index: Dict[str, int] = {}
+        self.__times: List[array] = []
+        self.__totals: array = array("d", bytes(8 * size))
+        self.__current: List[float] = []
+        self.__head: int = 0
+        self.__count: int = 0
+        self.__frames: int = 0
+        self.__start: float = perf_counter()
+        self.__mark: float = self.__start
+
+    @property
+    def stages(self) -> List[str]:
+        """Returns names of the stages seen so far, in first-seen order."""
+        return self.__stages
+
+    @property
+    def frames(self) -> int:
+        """Returns number of frames recorded since creation."""
+        return self.__frames
+
+    @property
+    def count(self) -> int:
+        """Returns number of frames held in the ring buffer."""
+        return self.__count
+
+    def start_frame(self) -> None:
+        """Starts timing a new frame."""
+        for i in range(0, len(self.__current)):
+            self.__current[i] = 0.0
+        self.__start = perf_counter()
+        self.__mark = self.__start
+
+    def lap(self, stage: str) -> None:
+        """Charges the time since the last lap (or frame start) to a stage.  A stage may be charged more than once per frame."""
+        now = perf_counter()
+        i = self.__stage_index.get(stage)
+        if i is None:
+            i = self.__add_stage(stage)
+        self.__current[i] += now - self.__mark
+        self.__mark = now
+
+    def end_frame(self) -> None:
+        """Stores the frame's stage times in the ring buffer, overwriting the oldest frame once full."""
+        head = self.__head
+        for i, value in enumerate(self.__current):
+            self.__times[i][head] = value
+        self.__totals[head] = perf_counter() - self.__start
+        self.__head = (head + 1) % self.__size
+        self.__count = min(self.__count + 1, self.__size)
+        self.__frames += 1
+
+    def __add_stage(self, stage: str) -> int:
+        """Adds a stage column, zero for frames recorded before it was first seen.  Returns its index."""
+        self.__stage_index[stage] = len(self.__stages)
+        self.__stages.append(stage)
+        self.__times.append(array("d", bytes(8 * self.__size)))
+        self.__current.append(0.0)
+        return len(self.__stages) - 1
+
+    def __ordered(self, values: array) -> List[float]:
+        """Returns buffered values of a column, oldest frame first."""
+        if self.__count < self.__size:
+            return values[0:self.__count].tolist()
+        return values[self.__head:].tolist() + values[0:self.__head].tolist()
+
+    @staticmethod
+    def percentile(values: List[float], percent: float) -> float:
+        """Returns the nearest-rank percentile of a list of values."""
+        if len(values) == 0:
+            return 0.0
+        ordered = sorted(values)
+        rank = int(round((percent / 100.0) * (len(ordered) - 1)))
+        return ordered[rank]
+
+    def summary(self) -> List[Tuple[str, float, float, float, float]]:
+        """Returns (stage, p50, p95, p99, worst frame) rows in milliseconds, for each stage then the frame total.
+        Worst frame is the stage's share of the slowest buffered frame."""
+        totals = self.__ordered(self.__totals)
+        worst = totals.index(max(totals)) if len(totals) > 0 else -1
+        rows = []
+        for stage, values in zip(self.__stages + ["total"], self.__times + [self.__totals]):
+            ordered = totals if values is self.__totals else self.__ordered(values)
+            rows.append((stage,
+                         self.percentile(ordered, 50) * 1000.0,
+                         self.percentile(ordered, 95) * 1000.0,
+                         self.percentile(ordered, 99) * 1000.0,
+                         (ordered[worst] * 1000.0) if worst >= 0 else 0.0))
+        return rows
+
+    def dump(self, path: str) -> None:
+        """Writes the buffered frames, oldest first, in milliseconds: JSON if the path ends in .json, else CSV."""
+        columns = [self.__ordered(x) for x in self.__times] + [self.__ordered(self.__totals)]
+        frames = [[round(x * 1000.0, 4) for x in row] for row in zip(*columns)]
+        header = self.__stages + ["total"]
+        with open(path, "w") as file:
+            if path.lower().endswith(".json"):
+                summary = [dict(zip(("stage", "p50", "p95", "p99", "worst"), x)) for x in self.summary()]
+                json.dump({"stages": header, "frames": frames, "summary": summary}, file, indent=1)
+            else:
+                file.write(",".join(header) + "\n")
+                for row in frames:
+                    file.write(",".join(str(x) for x in row) + "\n")
@@ -2,33 +2,61 @@
 Copyright (C) 2017-2020  John Hyland
 GNU GENERAL PUBLIC LICENSE Version 3"""
 
-from typing import Tuple, List, Optional
+from typing import Tuple, List, Optional, Dict, Set, Any, Callable
 import pygame
-from pygame import Surface
+from pygame import Surface, Rect
+from pygame.event import Event
 from pygame.font import Font
 from pygame.time import Clock
-from color import Colors
+from color import Colors, PALETTE
 from matrix import Matrix
 from game_stats import GameStats
-from exploding_space import ExplodingSpace
+from particles import ParticleSystem
+from animations import DropTrailAnimation
+from text_cache import TextCache
+from sprite_atlas import SpriteAtlas
+from profiler import FrameProfiler
+from surface_pool import SurfacePool
 
 
 class Renderer:
     """Handles surface drawing, blitting, rendering."""
 
-    def __init__(self, version: str, screen_size: Tuple[int, int], screen: Surface, clock: Clock) -> None:
-        """Class constructor."""
+    def __init__(self, version: str, screen_size: Tuple[int, int], screen: Surface, clock: Clock, profiler: Optional[FrameProfiler] = None) -> None:
+        """Class constructor.  Frame stages are timed into the profiler, if given, else a private one."""
         self.__version: str = version
         self.__screen_size: Tuple[int, int] = screen_size
         self.__screen: Surface = screen
         self.__clock: Clock = clock
+        self.__profiler: FrameProfiler = profiler if profiler is not None else FrameProfiler()
         self.__font_title: Font = Font("zorque.ttf", 64)
         self.__font_large: Font = Font("zorque.ttf", 42)
         self.__font_med: Font = Font("zorque.ttf", 28)
         self.__font_small: Font = Font("zorque.ttf", 18)
         self.__font_tiny: Font = Font("zorque.ttf", 12)
+        self.__pool: SurfacePool = SurfacePool()
         self.__blank_grid_surface: Surface = self.draw_blank_grid()
+        self.__atlas: SpriteAtlas = SpriteAtlas(PALETTE)
         self.__debug: bool = False
+        self.__ghost: bool = True
+        self.__trail: Optional[DropTrailAnimation] = None
+        self.__full_redraw: bool = True
+        self.__regions: Dict[str, Tuple[Surface, Rect]] = {}
+        self.__panels: Dict[str, Tuple[Any, Surface]] = {}
+        self.__text_cache: TextCache = TextCache()
+        self.__board_surface: Surface = self.__blank_grid_surface.copy()
+        self.__board_area: Rect = self.__board_surface.get_rect()
+        self.__board_debug: bool = False
+        self.__board_matrix: Optional[Matrix] = None
+        self.__matrix_surface: Surface = self.__blank_grid_surface.copy()
+        self.__dirty_cells: Set[Tuple[int, int]] = set()
+        self.__brick_cells: Dict[Tuple[int, int], Tuple[Optional[int], bool, bool]] = {}
+        self.__frame: Surface = Surface(screen_size).convert(screen)
+        self.__snapshot: Surface = Surface(screen_size).convert(screen)
+        self.__snapshot_valid: bool = False
+        self.__overlay_key: Any = None
+        self.__frames: int = 0
+        self.__frame_allocations: int = 0
 
     @property
     def screen_size(self) -> Tuple[int, int]:
@@ -40,6 +68,26 @@ class Renderer:
         """Returns clock instance."""
         return self.__clock
 
+    @property
+    def profiler(self) -> FrameProfiler:
+        """Returns the frame stage profiler."""
+        return self.__profiler
+
+    @property
+    def allocations(self) -> int:
+        """Returns number of surfaces allocated since creation: new pooled panel surfaces, plus rasterized text."""
+        return self.__pool.allocations + self.__text_cache.misses
+
+    @property
+    def frame_allocations(self) -> int:
+        """Returns number of surfaces allocated during the last update_frame()."""
+        return self.__frame_allocations
+
+    @property
+    def text_cache(self) -> TextCache:
+        """Returns rendered text cache."""
+        return self.__text_cache
+
     @property
     def debug(self) -> bool:
         """Returns debug flag."""
@@ -50,88 +98,319 @@ class Renderer:
         """Sets debug flag."""
         self.__debug = value
 
-    @staticmethod
-    def __create_surface(size: Tuple[int, int]) -> Surface:
-        """Returns a new Surface instance."""
-        surface = Surface(size, pygame.SRCALPHA, 32)
-        surface = surface.convert_alpha(surface)
-        return surface
+    @property
+    def ghost(self) -> bool:
+        """Returns true if the live brick's landing place is shown."""
+        return self.__ghost
+
+    @ghost.setter
+    def ghost(self, value: bool) -> None:
+        """Shows or hides the live brick's landing place."""
+        self.__ghost = value
+
+    def __create_surface(self, size: Tuple[int, int]) -> Surface:
+        """Returns a cleared transparent surface from the pool.  Only cached panel surfaces are released back."""
+        return self.__pool.acquire(size)
 
     @staticmethod
     def event_pump() -> None:
         """Pumps the event queue, allowing frames to be rendered outside primary event loop."""
         pygame.event.pump()
 
-    def update_frame(self, matrix: Matrix, stats: GameStats, spaces: Optional[List[ExplodingSpace]]) -> None:
-        """Draws and flips the entire screen frame."""
-        frame = self.draw_frame(matrix, stats, spaces)
-        self.__screen.blit(frame, (0, 0))
+    @staticmethod
+    def wait_events(timeout: int = 1000) -> List[Event]:
+        """Blocks until an event arrives, or TIMEOUT milliseconds pass.  Returns all queued events."""
+        try:
+            event = pygame.event.wait(timeout)
+        except TypeError:
+            event = pygame.event.wait()     # pygame 1.9 has no timeout
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def update_frame(self, matrix: Matrix, stats: GameStats, particles: Optional[ParticleSystem], alpha: float = 1.0,
+                     trail: Optional[DropTrailAnimation] = None) -> None:
+        """Draws the screen frame.  Only regions that changed since the last frame are pushed to the display.
+        Particles are drawn ALPHA (0-1) of the way between their last two simulation ticks.  An instant drop's
+        trail, if given, is drawn behind the live brick."""
+
+        # game state may have moved on, menus need a fresh snapshot
+        self.__snapshot_valid = False
+        self.__trail = trail
+        self.__overlay_key = None
+        self.__frames += 1
+        allocations = self.allocations
+
+        # exploding particles cover the whole screen, draw straight to screen and flip
+        if particles is not None:
+            self.__draw_frame_to(self.__screen, matrix, stats, particles, alpha)
+            self.__profiler.lap("frame")
+            pygame.display.flip()
+            self.__profiler.lap("flip")
+            self.__invalidate_screen()
+            self.__frame_allocations = self.allocations - allocations
+            return
+
+        # redraw changed regions directly to screen
+        force = self.__full_redraw
+        if force:
+            self.__screen.fill(Colors.Black.value)
+            self.__profiler.lap("blit")
+        rects = self.__update_regions(matrix, stats, force)
+        self.__full_redraw = False
+
+        # push to display
+        if force:
+            pygame.display.flip()
+        elif len(rects) > 0:
+            pygame.display.update(rects)
+        self.__profiler.lap("flip")
+        self.__frame_allocations = self.allocations - allocations
+
+    def invalidate(self) -> None:
+        """Forces the next frame to be fully redrawn, every board space and the menu snapshot included.  Called after
+        anything draws over the whole screen, or another game was drawn in between (e.g. the attract demo)."""
+        self.__invalidate_screen()
+        self.__board_matrix = None
+        self.__snapshot_valid = False
+
+    def __invalidate_screen(self) -> None:
+        """Forces the next frame to be pushed to screen in full.  The board surface is left as is."""
+        self.__full_redraw = True
+        self.__regions = {}
+        self.__overlay_key = None
+
+    def __draw_overlay(self, matrix: Matrix, stats: GameStats, name: str, key: Any, draw: Callable[[], Surface]) -> None:
+        """Draws a box centered over a snapshot of the game frame.  Skipped if the box hasn't changed since last drawn."""
+        if self.__overlay_key == (name, key):
+            return
+        if not self.__snapshot_valid:
+            self.__draw_frame_to(self.__snapshot, matrix, stats, None)
+            self.__snapshot_valid = True
+        surface = self.__get_panel(name, key, draw)
+        self.__screen.blit(self.__snapshot, (0, 0))
+        self.__screen.blit(surface, ((self.__screen_size[0] - surface.get_width()) // 2, (self.__screen_size[1] - surface.get_height()) // 2))
         pygame.display.flip()
+        self.__full_redraw = True
+        self.__regions = {}
+        self.__overlay_key = (name, key)
+
+    def __update_regions(self, matrix: Matrix, stats: GameStats, force: bool) -> List[Rect]:
+        """Redraws each screen region whose inputs changed since the last frame.  Returns list of dirty rects."""
 
-    def draw_frame(self, matrix: Matrix, stats: GameStats, spaces: Optional[List[ExplodingSpace]]) -> Surface:
-        """Draws the primary game screen surface."""
+        # vars
+        side_width = (self.__screen_size[0] - 333) // 2
+        rects: List[Rect] = []
+
+        # game matrix
+        rects += self.__update_matrix_cells(matrix, (side_width, (self.__screen_size[1] - 663) // 2), force)
+
+        # clear regions no longer drawn
+        panels = self.__get_panels(matrix, stats)
+        drawn = {x[0] for x in panels}
+        cleared = []
+        for name in [x for x in self.__regions if x not in drawn]:
+            rect = self.__regions.pop(name)[1]
+            self.__screen.fill(Colors.Black.value, rect)
+            rects.append(rect)
+            cleared.append(rect)
+
+        # side panels, redrawn if changed or partly cleared
+        for name, surface, position in panels:
+            overlapped = (len(cleared) > 0) and (Rect(position, surface.get_size()).collidelist(cleared) >= 0)
+            self.__update_region(name, surface, position, force or overlapped, rects)
+        self.__profiler.lap("blit")
+
+        return rects
+
+    def __update_region(self, name: str, surface: Surface, position: Tuple[int, int], force: bool, rects: List[Rect]) -> None:
+        """Redraws a single screen region if its panel surface changed since it was last drawn."""
+        region = self.__regions.get(name)
+        if (not force) and (region is not None) and (region[0] is surface):
+            return
+        rect = Rect(position, surface.get_size())
+        dirty = rect if region is None else rect.union(region[1])
+        self.__screen.fill(Colors.Black.value, dirty)
+        self.__screen.blit(surface, rect)
+        self.__regions[name] = (surface, rect)
+        rects.append(dirty)
+
+    def __get_panels(self, matrix: Matrix, stats: GameStats) -> List[Tuple[str, Surface, Tuple[int, int]]]:
+        """Returns name, surface and screen position of each side panel.  Panels are only re-drawn when their inputs change."""
 
         # vars
         side_width = (self.__screen_size[0] - 333) // 2
         left_x = ((side_width - 250) // 2) + 5
         right_x = side_width + 333 + left_x
+        debug = self.__debug
+        next_shape = matrix.next_brick.shape_num if matrix.next_brick is not None else 0
+        high_scores = tuple((x.initials, x.score) for x in stats.high_scores)
+
+        # controls, or frame stage timings in debug mode
+        title_surface = self.__get_panel("title", debug, self.draw_title)
+        if debug:
+            controls = ("profile", self.__get_panel("profile", self.__frames // 30, self.draw_profile), (left_x, 210))
+        else:
+            controls = ("controls", self.__get_panel("controls", debug, self.draw_controls), (left_x, 210))
+
+        # panels
+        panels = [
+            ("title", title_surface, ((side_width - title_surface.get_width()) // 2, 30)),
+            controls,
+            ("next", self.__get_panel("next", (next_shape, debug), lambda: self.draw_next(matrix)), (left_x, 480)),
+            ("level", self.__get_panel("level", (stats.level, debug), lambda: self.draw_level(stats)), (right_x, 36)),
+            ("lines", self.__get_panel("lines", (stats.lines, debug), lambda: self.draw_lines(stats)), (right_x, 156)),
+            ("score", self.__get_panel("score", (stats.current_score, debug), lambda: self.draw_current_score(stats)), (right_x, 276)),
+            ("high_scores", self.__get_panel("high_scores", (high_scores, debug), lambda: self.draw_high_scores(stats)), (right_x, 396))
+        ]
+
+        # fps?
+        if debug:
+            fps_surface = self.__get_panel("fps", self.__frames // 30, self.draw_fps)
+            panels.append(("fps", fps_surface, (left_x, (self.__screen_size[1] - fps_surface.get_height()) - 15)))
+            self.__profiler.lap("fps")
+
+        return panels
+
+    def __get_panel(self, name: str, key: Any, draw: Callable[[], Surface]) -> Surface:
+        """Returns cached panel surface, re-drawing it only when its key changed.  The replaced surface goes back to the pool."""
+        panel = self.__panels.get(name)
+        if (panel is None) or (panel[0] != key):
+            replaced = panel
+            panel = (key, draw())
+            self.__panels[name] = panel
+            if replaced is not None:
+                self.__pool.release(replaced[1])
+        self.__profiler.lap(name)
+        return panel[1]
+
+    def __sync_board(self, matrix: Matrix) -> None:
+        """Redraws matrix spaces that changed since the last sync onto the persistent board surface.  Every space is
+        redrawn if a different matrix was synced last, as its changes were never seen, or the debug dots toggled."""
+        changed = matrix.take_changed_cells()
+        if (matrix is not self.__board_matrix) or (self.__board_debug != self.__debug):
+            self.__board_matrix = matrix
+            self.__board_debug = self.__debug
+            changed = {(x, y) for x in range(1, matrix.width - 1) for y in range(1, matrix.height - 1)}
+        blits = []
+        tile_at = self.__atlas.tile_at
+        color_index_at = matrix.color_index_at
+        spaces = matrix.matrix if self.__debug else None
+        dot, dot_area = self.__atlas.dot
+        for x, y in changed:
+            position = ((x - 1) * 33) + 2, ((y - 1) * 33) + 2
+            source, area = tile_at(color_index_at(x, y))
+            blits.append((source, position, area))
+            if (spaces is not None) and (spaces[x][y] == 1):
+                blits.append((dot, (position[0] + 15, position[1] + 15), dot_area))
+        self.__board_surface.blits(blits, False)
+        self.__dirty_cells |= changed
+
+    def __get_brick_cells(self, matrix: Matrix) -> Dict[Tuple[int, int], Tuple[Optional[int], bool, bool]]:
+        """Returns the live brick overlay, as palette index (None if transparent), ghost flag and debug-dot flag per visible
+        matrix space.  Ghost spaces show where the brick will land, and any drop trail."""
+        cells: Dict[Tuple[int, int], Tuple[Optional[int], bool, bool]] = {}
+        brick = matrix.brick
+        trail = self.__trail
+        if trail is not None:
+            spaces = matrix.matrix
+            ghost = (trail.color_index, True, False)
+            for x, y in trail.cells:
+                if spaces[x][y] == 0:
+                    cells[(x, y)] = ghost
+        if brick is not None:
+            # read brick once, its properties aren't free
+            color = brick.color_index
+            left = brick.x
+            top = brick.y
+            orientation = brick.orientation
+            if self.__ghost:
+                distance = matrix.drop_distance()
+                if distance > 0:
+                    ghost = (color, True, False)
+                    for x, y in orientation.cells:
+                        cells[(left + x, top + y + distance)] = ghost
+            if self.__debug:
+                for x in range(0, orientation.width):
+                    for y in range(0, orientation.height):
+                        cell = cells.get((left + x, top + y), (None, False, False))
+                        cells[(left + x, top + y)] = (cell[0], cell[1], True)
+            solid = (color, False, False)
+            for x, y in orientation.cells:
+                cells[(left + x, top + y)] = solid
+            right = matrix.width - 1
+            bottom = matrix.height - 1
+            for x, y in [x for x in cells if not ((0 < x[0] < right) and (0 < x[1] < bottom))]:
+                del cells[(x, y)]
+        return cells
+
+    def __brick_cell_blits(self, cell: Tuple[Optional[int], bool, bool], position: Tuple[int, int]) -> List[Tuple[Surface, Tuple[int, int], Rect]]:
+        """Returns atlas blits drawing a single live brick overlay space."""
+        blits = []
+        if cell[0] is not None:
+            source, area = self.__atlas.ghost_tile_at(cell[0]) if cell[1] else self.__atlas.tile_at(cell[0])
+            blits.append((source, position, area))
+        if cell[2]:
+            blits.append((self.__atlas.dot[0], (position[0] + 15, position[1] + 15), self.__atlas.dot[1]))
+        return blits
+
+    def __update_matrix_cells(self, matrix: Matrix, origin: Tuple[int, int], force: bool) -> List[Rect]:
+        """Redraws changed board spaces and the moved live brick directly to screen.  Returns list of dirty rects."""
+        self.__sync_board(matrix)
+        brick_cells = self.__get_brick_cells(matrix)
+        rects = []
+        blits: List[Tuple[Surface, Tuple[int, int], Rect]] = []
+        self.__profiler.lap("matrix")
+        if force:
+            blits.append((self.__board_surface, origin, self.__board_area))
+            for (x, y), cell in brick_cells.items():
+                blits += self.__brick_cell_blits(cell, (origin[0] + ((x - 1) * 33) + 2, origin[1] + ((y - 1) * 33) + 2))
+            rects.append(Rect(origin, self.__board_surface.get_size()))
+        else:
+            dirty = self.__dirty_cells
+            if brick_cells != self.__brick_cells:
+                dirty |= self.__brick_cells.keys()
+                dirty |= brick_cells.keys()
+            for x, y in dirty:
+                cell_rect = Rect(((x - 1) * 33) + 2, ((y - 1) * 33) + 2, 32, 32)
+                screen_rect = cell_rect.move(origin)
+                blits.append((self.__board_surface, screen_rect.topleft, cell_rect))
+                if (x, y) in brick_cells:
+                    blits += self.__brick_cell_blits(brick_cells[(x, y)], screen_rect.topleft)
+                rects.append(screen_rect)
+        self.__screen.blits(blits, False)
+        self.__profiler.lap("blit")
+        self.__dirty_cells = set()
+        self.__brick_cells = brick_cells
+        return rects
+
+    def draw_frame(self, matrix: Matrix, stats: GameStats, particles: Optional[ParticleSystem], alpha: float = 1.0) -> Surface:
+        """Draws the primary game screen surface.  The surface is reused by the next call."""
+        self.__draw_frame_to(self.__frame, matrix, stats, particles, alpha)
+        return self.__frame
+
+    def __draw_frame_to(self, frame: Surface, matrix: Matrix, stats: GameStats, particles: Optional[ParticleSystem], alpha: float = 1.0) -> None:
+        """Draws the primary game screen onto a screen-sized surface."""
 
-        # create new frame
-        frame = Surface(self.__screen_size)
-        frame = frame.convert(frame)
+        # vars
+        side_width = (self.__screen_size[0] - 333) // 2
+
+        # clear frame
         frame.fill(Colors.Black.value)
 
         # game matrix
         matrix_surface = self.draw_matrix(matrix)
         frame.blit(matrix_surface, (side_width, (self.__screen_size[1] - 663) // 2))
 
-        # spaces
-        if spaces is not None:
-            for space in spaces:
-                x = int(space.x)
-                y = int(space.y)
-                rect = x, y, 34, 34
-                pygame.draw.rect(frame, space.color.value, rect)
-                pygame.draw.line(frame, Colors.Black.value, (x, y), (x + 34, y))
-                pygame.draw.line(frame, Colors.Black.value, (x, y + 34), (x + 34, y + 34))
-                pygame.draw.line(frame, Colors.Black.value, (x, y), (x, y + 34))
-                pygame.draw.line(frame, Colors.Black.value, (x + 34, y), (x + 34, y + 34))
-
-        # title
-        title_surface = self.draw_title()
-        frame.blit(title_surface, ((side_width - title_surface.get_width()) // 2, 30))
-
-        # controls
-        controls_surface = self.draw_controls()
-        frame.blit(controls_surface, (left_x, 210))
-
-        # next
-        next_surface = self.draw_next(matrix)
-        frame.blit(next_surface, (left_x, 480))
-
-        # level
-        level_surface = self.draw_level(stats)
-        frame.blit(level_surface, (right_x, 36))
-
-        # lines
-        lines_surface = self.draw_lines(stats)
-        frame.blit(lines_surface, (right_x, 156))
-
-        # current score
-        current_score_surface = self.draw_current_score(stats)
-        frame.blit(current_score_surface, (right_x, 276))
-
-        # high scores
-        high_scores_surface = self.draw_high_scores(stats)
-        frame.blit(high_scores_surface, (right_x, 396))
-
-        # draw fps?
-        if self.__debug:
-            fps_surface = self.__font_small.render("fps: {0:.2f}".format(self.clock.get_fps()), True, Colors.White.value)
-            frame.blit(fps_surface, (left_x, (self.__screen_size[1] - fps_surface.get_height()) - 15))
+        # particles
+        if particles is not None:
+            tiles = self.__atlas.shard_tiles(particles.shards)
+            xs, ys, sprites = particles.sprites(alpha)
+            frame.blits([(tiles[s][0], (x, y), tiles[s][1]) for x, y, s in zip(xs, ys, sprites)], False)
 
-        # return
-        return frame
+        # side panels
+        for _, surface, position in self.__get_panels(matrix, stats):
+            frame.blit(surface, position)
 
     @staticmethod
     def draw_blank_grid() -> Surface:
@@ -161,8 +440,8 @@ class Renderer:
 
     def draw_title(self) -> Surface:
         """Draws the title surface."""
-        title_surface = self.__font_title.render("bricker", True, Colors.White.value)
-        version_surface = self.__font_tiny.render(f"V{self.__version}   (C) 2017-2020  JOHN HYLAND", True, Colors.White.value)
+        title_surface = self.__text_cache.render(self.__font_title, "bricker", True, Colors.White.value)
+        version_surface = self.__text_cache.render(self.__font_tiny, f"V{self.__version}   (C) 2017-2020  JOHN HYLAND", True, Colors.White.value)
         surface = self.__create_surface((title_surface.get_width(), (title_surface.get_height() + version_surface.get_height())))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
@@ -174,19 +453,19 @@ class Renderer:
         """Draw controls surface."""
         width = 240
         space = 18
-        title_surface = self.__font_med.render("controls", True, Colors.White.value)
-        left_1 = self.__font_small.render("left", True, Colors.White.value)
-        left_2 = self.__font_small.render("right", True, Colors.White.value)
-        left_3 = self.__font_small.render("down", True, Colors.White.value)
-        left_4 = self.__font_small.render("rotate", True, Colors.White.value)
-        left_5 = self.__font_small.render("drop", True, Colors.White.value)
-        left_6 = self.__font_small.render("pause", True, Colors.White.value)
-        right_1 = self.__font_small.render("left", True, Colors.White.value)
-        right_2 = self.__font_small.render("right", True, Colors.White.value)
-        right_3 = self.__font_small.render("down", True, Colors.White.value)
-        right_4 = self.__font_small.render("up", True, Colors.White.value)
-        right_5 = self.__font_small.render("space", True, Colors.White.value)
-        right_6 = self.__font_small.render("esc", True, Colors.White.value)
+        title_surface = self.__text_cache.render(self.__font_med, "controls", True, Colors.White.value)
+        left_1 = self.__text_cache.render(self.__font_small, "left", True, Colors.White.value)
+        left_2 = self.__text_cache.render(self.__font_small, "right", True, Colors.White.value)
+        left_3 = self.__text_cache.render(self.__font_small, "down", True, Colors.White.value)
+        left_4 = self.__text_cache.render(self.__font_small, "rotate", True, Colors.White.value)
+        left_5 = self.__text_cache.render(self.__font_small, "drop", True, Colors.White.value)
+        left_6 = self.__text_cache.render(self.__font_small, "pause", True, Colors.White.value)
+        right_1 = self.__text_cache.render(self.__font_small, "left", True, Colors.White.value)
+        right_2 = self.__text_cache.render(self.__font_small, "right", True, Colors.White.value)
+        right_3 = self.__text_cache.render(self.__font_small, "down", True, Colors.White.value)
+        right_4 = self.__text_cache.render(self.__font_small, "up", True, Colors.White.value)
+        right_5 = self.__text_cache.render(self.__font_small, "space", True, Colors.White.value)
+        right_6 = self.__text_cache.render(self.__font_small, "esc", True, Colors.White.value)
         line_height = left_1.get_height()
         surface = self.__create_surface((width, title_surface.get_height() + (line_height * 6) + space))
         if self.__debug:
@@ -209,29 +488,58 @@ class Renderer:
     def draw_next(self, matrix: Matrix) -> Surface:
         """Draw next brick surface."""
         width = 240
-        title_surface = self.__font_med.render("next", True, Colors.White.value)
+        title_surface = self.__text_cache.render(self.__font_med, "next", True, Colors.White.value)
         surface = self.__create_surface((width, 135 + title_surface.get_height()))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
         if matrix.next_brick is not None:
             next_brick = matrix.next_brick
             size = (next_brick.width * 32) + (next_brick.width - 1)
-            brick_surface = self.__create_surface((size, size))
-            for x in range(0, next_brick.width):
-                for y in range(0, next_brick.height):
-                    if next_brick.grid[x][y] == 1:
-                        rect = (x * 33), (y * 33), 32, 32
-                        pygame.draw.rect(brick_surface, next_brick.color.value, rect)
-            surface.blit(brick_surface, ((width - size) // 2, title_surface.get_height() - (next_brick.top_space * 33) + 24))
+            left = (width - size) // 2
+            top = title_surface.get_height() - (next_brick.top_space * 33) + 24
+            source, area = self.__atlas.tile_at(next_brick.color_index)
+            blits = []
+            for x, y in next_brick.cells:
+                blits.append((source, (left + (x * 33), top + (y * 33)), area))
+            surface.blits(blits, False)
         surface.blit(title_surface, (0, 0))
         return surface
 
+    def __draw_glyphs(self, surface: Surface, font: Font, text: str, position: Tuple[int, int]) -> None:
+        """Draws white text one cached glyph at a time, so ever-changing numbers don't rasterize new text surfaces."""
+        x, y = position
+        for char in text:
+            glyph = self.__text_cache.render(font, char, True, Colors.White.value)
+            surface.blit(glyph, (x, y))
+            x += glyph.get_width()
+
+    def draw_fps(self) -> Surface:
+        """Draw debug fps and surface allocation counter surface."""
+        text = "fps: {0:.2f}   allocs: {1} (+{2})".format(self.clock.get_fps(), self.allocations, self.__frame_allocations)
+        surface = self.__create_surface((250, self.__font_small.get_linesize()))
+        self.__draw_glyphs(surface, self.__font_small, text, (0, 0))
+        return surface
+
+    def draw_profile(self) -> Surface:
+        """Draw frame stage timing surface, shown in place of controls in debug mode."""
+        width = 250
+        columns = (0, 100, 138, 176, 214)
+        rows: List[Tuple[str, ...]] = [("stage (ms)", "p50", "p95", "p99", "worst")]
+        rows += [(x[0],) + tuple("{0:.2f}".format(y) for y in x[1:]) for x in self.__profiler.summary()]
+        line_height = self.__font_tiny.get_linesize()
+        surface = self.__create_surface((width, line_height * len(rows)))
+        surface.fill(Colors.PortlandOrange.value)
+        for y, row in enumerate(rows):
+            for x, text in zip(columns, row):
+                self.__draw_glyphs(surface, self.__font_tiny, text, (x, y * line_height))
+        return surface
+
     def draw_level(self, stats: GameStats) -> Surface:
         """Draw level surface."""
         width = 240
         space = 4
-        title_surface = self.__font_med.render("level", True, Colors.White.value)
-        level_surface = self.__font_large.render("{:,}".format(stats.level), True, Colors.White.value)
+        title_surface = self.__text_cache.render(self.__font_med, "level", True, Colors.White.value)
+        level_surface = self.__text_cache.render(self.__font_large, "{:,}".format(stats.level), True, Colors.White.value)
         surface = self.__create_surface((width, title_surface.get_height() + space + level_surface.get_height()))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
@@ -243,8 +551,8 @@ class Renderer:
         """Draw lines surface."""
         width = 240
         space = 4
-        title_surface = self.__font_med.render("lines", True, Colors.White.value)
-        lines_surface = self.__font_large.render("{:,}".format(stats.lines), True, Colors.White.value)
+        title_surface = self.__text_cache.render(self.__font_med, "lines", True, Colors.White.value)
+        lines_surface = self.__text_cache.render(self.__font_large, "{:,}".format(stats.lines), True, Colors.White.value)
         surface = self.__create_surface((width, title_surface.get_height() + space + lines_surface.get_height()))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
@@ -256,8 +564,8 @@ class Renderer:
         """Draw current score surface."""
         width = 240
         space = 4
-        title_surface = self.__font_med.render("score", True, Colors.White.value)
-        score_surface = self.__font_large.render("{:,}".format(stats.current_score), True, Colors.White.value)
+        title_surface = self.__text_cache.render(self.__font_med, "score", True, Colors.White.value)
+        score_surface = self.__text_cache.render(self.__font_large, "{:,}".format(stats.current_score), True, Colors.White.value)
         surface = self.__create_surface((width, title_surface.get_height() + space + score_surface.get_height()))
         if self.__debug:
             surface.fill(Colors.PortlandOrange.value)
@@ -269,7 +577,7 @@ class Renderer:
         """Draw high score surface."""
         width = 240
         space = 10
-        title_surface = self.__font_med.render("high scores", True, Colors.White.value)
+        title_surface = self.__text_cache.render(self.__font_med, "high scores", True, Colors.White.value)
         line_height = self.__font_small.get_height()
         height = title_surface.get_height() + space + (line_height * 10)
         surface = self.__create_surface((width, height))
@@ -278,42 +586,28 @@ class Renderer:
         surface.blit(title_surface, (0, 0))
         line = 0
         for score in stats.high_scores:
-            left = self.__font_small.render(score.initials, True, Colors.White.value)
-            right = self.__font_small.render("{:,}".format(score.score), True, Colors.White.value)
+            left = self.__text_cache.render(self.__font_small, score.initials, True, Colors.White.value)
+            right = self.__text_cache.render(self.__font_small, "{:,}".format(score.score), True, Colors.White.value)
             surface.blit(left, (10, (title_surface.get_height() + space + (line * line_height))))
             surface.blit(right, (width - right.get_width(), (title_surface.get_height() + space + (line * line_height))))
             line += 1
         return surface
 
     def draw_matrix(self, matrix: Matrix) -> Surface:
-        """Draws the game matrix, once per frame."""
-        matrix_surface = self.__create_surface((333, 663))
-        matrix_surface.blit(self.__blank_grid_surface, (0, 0))
-
-        for x in range(1, matrix.width - 1):
-            for y in range(1, matrix.height - 1):
-                color = matrix.color[x][y]
-                if color != (0, 0, 0):
-                    rect = ((x - 1) * 33) + 2, ((y - 1) * 33) + 2, 32, 32
-                    pygame.draw.rect(matrix_surface, color.value, rect)
-                if self.__debug and (matrix.matrix[x][y] == 1):
-                    rect = ((x - 1) * 33) + 17, ((y - 1) * 33) + 17, 2, 2
-                    pygame.draw.rect(matrix_surface, Colors.White.value, rect)
-
-        if matrix.brick is not None:
-            for x in range(0, matrix.brick.width):
-                for y in range(0, matrix.brick.height):
-                    if matrix.brick.grid[x][y] == 1:
-                        rect = (((matrix.brick.x - 1) + x) * 33) + 2, (((matrix.brick.y - 1) + y) * 33) + 2, 32, 32
-                        pygame.draw.rect(matrix_surface, matrix.brick.color.value, rect)
-                    elif self.__debug:
-                        rect = (((matrix.brick.x - 1) + x) * 33) + 17, (((matrix.brick.y - 1) + y) * 33) + 17, 2, 2
-                        pygame.draw.rect(matrix_surface, Colors.White.value, rect)
-
-        return matrix_surface
+        """Draws the game matrix, composited from the persistent board surface and live brick overlay."""
+        self.__sync_board(matrix)
+        blits: List[Tuple[Surface, Tuple[int, int], Rect]] = [(self.__board_surface, (0, 0), self.__board_area)]
+        for (x, y), cell in self.__get_brick_cells(matrix).items():
+            blits += self.__brick_cell_blits(cell, (((x - 1) * 33) + 2, ((y - 1) * 33) + 2))
+        self.__matrix_surface.blits(blits, False)
+        return self.__matrix_surface
 
     def draw_menu(self, matrix: Matrix, stats: GameStats, menu_selection: int, in_game: bool) -> None:
-        """Draws the main menu frame."""
+        """Draws the main menu frame, if the selection changed since last drawn."""
+        self.__draw_overlay(matrix, stats, "menu", (menu_selection, in_game), lambda: self.draw_menu_box(menu_selection, in_game))
+
+    def draw_menu_box(self, menu_selection: int, in_game: bool) -> Surface:
+        """Draws the main menu box surface."""
         width = 400
         spacing = 25
 
@@ -329,9 +623,9 @@ class Renderer:
         elif menu_selection == 3:
             quit_color = Colors.FluorescentOrange
 
-        resume_surface = self.__font_large.render("resume", True, resume_color.value)
-        new_surface = self.__font_large.render("new game", True, new_color.value)
-        quit_surface = self.__font_large.render("quit", True, quit_color.value)
+        resume_surface = self.__text_cache.render(self.__font_large, "resume", True, resume_color.value)
+        new_surface = self.__text_cache.render(self.__font_large, "new game", True, new_color.value)
+        quit_surface = self.__text_cache.render(self.__font_large, "quit", True, quit_color.value)
 
         surface = self.__create_surface((width, (resume_surface.get_height() * 3) + (spacing * 4) + 4))
         surface.fill(Colors.Black.value)
@@ -346,39 +640,25 @@ class Renderer:
         surface.blit(resume_surface, ((surface.get_width() - resume_surface.get_width()) // 2, spacing + 2))
         surface.blit(new_surface, ((surface.get_width() - new_surface.get_width()) // 2, (spacing * 2) + new_surface.get_height() + 2))
         surface.blit(quit_surface, ((surface.get_width() - quit_surface.get_width()) // 2, (spacing * 3) + (quit_surface.get_height() * 2) + 2))
-
-        frame = self.draw_frame(matrix, stats, None)
-        frame.blit(surface, ((frame.get_width() - surface.get_width()) // 2, (frame.get_height() - surface.get_height()) // 2))
-
-        self.event_pump()
-        self.__screen.blit(frame, (0, 0))
-        pygame.display.flip()
+        return surface
 
     def draw_initials_input(self, matrix, stats, chars) -> None:
-        """Draws the high score initials input frame."""
+        """Draws the high score initials input frame, if the initials changed since last drawn."""
+        self.__draw_overlay(matrix, stats, "initials", tuple(chars), lambda: self.draw_initials_box(chars))
+
+    def draw_initials_box(self, chars) -> Surface:
+        """Draws the high score initials input box surface."""
         width = 400
         spacing = 15
         char_width = 60
         char_height = 82
 
-        line1 = self.__font_med.render("new high score!", True, Colors.White.value)
-        line2 = self.__font_med.render("enter initials:", True, Colors.White.value)
-
-        char1 = self.__font_title.render(chars[0], True, Colors.FluorescentOrange.value)
-        char2 = self.__font_title.render(chars[1], True, Colors.FluorescentOrange.value)
-        char3 = self.__font_title.render(chars[2], True, Colors.FluorescentOrange.value)
-
-        slot1 = self.__create_surface((char_width, char_height))
-        slot2 = self.__create_surface((char_width, char_height))
-        slot3 = self.__create_surface((char_width, char_height))
-        slot1.blit(char1, (((char_width - char1.get_width()) // 2), ((char_height - char1.get_height()) // 2)))
-        slot2.blit(char2, (((char_width - char2.get_width()) // 2), ((char_height - char2.get_height()) // 2)))
-        slot3.blit(char3, (((char_width - char3.get_width()) // 2), ((char_height - char3.get_height()) // 2)))
+        line1 = self.__text_cache.render(self.__font_med, "new high score!", True, Colors.White.value)
+        line2 = self.__text_cache.render(self.__font_med, "enter initials:", True, Colors.White.value)
 
-        initials = self.__create_surface((char_width * 3, char_height))
-        initials.blit(slot1, (0, 0))
-        initials.blit(slot2, (char_width, 0))
-        initials.blit(slot3, (char_width * 2, 0))
+        char1 = self.__text_cache.render(self.__font_title, chars[0], True, Colors.FluorescentOrange.value)
+        char2 = self.__text_cache.render(self.__font_title, chars[1], True, Colors.FluorescentOrange.value)
+        char3 = self.__text_cache.render(self.__font_title, chars[2], True, Colors.FluorescentOrange.value)
 
         surface = self.__create_surface((width, (spacing * 3) + line1.get_height() + line2.get_height() + char_height + 4))
         surface.fill(Colors.Black.value)
@@ -393,11 +673,10 @@ class Renderer:
 
         surface.blit(line1, ((surface.get_width() - line1.get_width()) // 2, spacing + 2))
         surface.blit(line2, ((surface.get_width() - line2.get_width()) // 2, spacing + line1.get_height() + 2))
-        surface.blit(initials, ((surface.get_width() - initials.get_width()) // 2, (spacing * 2) + line1.get_height() + line2.get_height() + 2))
-
-        frame = self.draw_frame(matrix, stats, None)
-        frame.blit(surface, ((frame.get_width() - surface.get_width()) // 2, (frame.get_height() - surface.get_height()) // 2))
-
-        self.event_pump()
-        self.__screen.blit(frame, (0, 0))
-        pygame.display.flip()
+        initials_x = (surface.get_width() - (char_width * 3)) // 2
+        initials_y = (spacing * 2) + line1.get_height() + line2.get_height() + 2
+        for i, char in enumerate((char1, char2, char3)):
+            slot = Rect(initials_x + (char_width * i), initials_y, char_width, char_height)
+            surface.blit(char, (slot.x + ((char_width - char.get_width()) // 2), slot.y + ((char_height - char.get_height()) // 2)),
+                         Rect(max((char.get_width() - char_width) // 2, 0), max((char.get_height() - char_height) // 2, 0), char_width, char_height))
+        return surface
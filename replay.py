@@ -0,0 +1,360 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Tuple, Optional, BinaryIO, Dict
+from array import array
+from bisect import bisect_right
+from time import perf_counter
+import argparse
+import math
+import struct
+from engine import Engine, GameEvent
+from game_stats import GameStats
+from pieces import GENERATORS
+from scheduler import FixedStepScheduler
+from simulation import Simulation, Recorder
+
+
+# file layout: header, then entries of (tick delta varint, code byte, payload)
+MAGIC = b"BRKR"
+VERSION = 2
+HEADER = struct.Struct("<4sBHQ")                # magic, version, tick rate, seed; then generator name, drop intervals and flags
+INSTANT_DROP = 0x01                             # flag, hard drops land instantly (version 1 replays animate them)
+KEYFRAME = struct.Struct("<ddIIIHBBbb200s")     # time, last drop time, score, lines, dealt, level, shape, rotation, x, y, cells
+LEVEL = 0x20                                    # level set, level byte follows
+KEYFRAME_CODE = 0xFE                            # keyframe, KEYFRAME struct follows
+END = 0xFF                                      # recording finished
+
+
+def _varint(value: int) -> bytes:
+    """Returns an unsigned integer as a little-endian base 128 varint."""
+    data = bytearray()
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Returns a varint and the offset after it.  Raises IndexError if the data ends first."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class ReplayWriter(Recorder):
+    """Records a game as it's played: its seed, then every player action and level change with the tick it
+    happened on, and a keyframe of the board every so often for seeking.  Entries are written to a buffered
+    file as they happen, so a crash loses at most the unflushed buffer."""
+
+    def __init__(self, path: str, simulation: Simulation, keyframe_interval: int = 600, buffer_size: int = 65536) -> None:
+        """Class constructor.  Starts recording a game that has just started, keyframes are at least
+        KEYFRAME_INTERVAL ticks apart."""
+        engine = simulation.engine
+        generator = engine.matrix.generator
+        name = generator.name.encode("ascii")
+        self.__keyframe_interval: int = keyframe_interval
+        self.__last_tick: int = 0
+        self.__last_keyframe: int = -keyframe_interval
+        self.__file: Optional[BinaryIO] = open(path, "wb", buffering=buffer_size)
+        self.__file.write(HEADER.pack(MAGIC, VERSION, simulation.scheduler.tick_rate, generator.seed))
+        self.__file.write(bytes([len(name)]) + name)
+        self.__file.write(bytes([len(engine.level_drop_intervals)]))
+        self.__file.write(struct.pack("<{0}d".format(len(engine.level_drop_intervals)), *engine.level_drop_intervals))
+        self.__file.write(bytes([INSTANT_DROP if simulation.instant_drop else 0]))
+
+    @property
+    def closed(self) -> bool:
+        """Returns true once recording has finished."""
+        return self.__file is None
+
+    def __write(self, tick: int, code: int, payload: bytes = b"") -> None:
+        """Writes an entry."""
+        if self.__file is not None:
+            self.__file.write(_varint(tick - self.__last_tick) + bytes([code]) + payload)
+            self.__last_tick = tick
+
+    def action(self, tick: int, action: int) -> None:
+        """Records a player action applied on a tick."""
+        self.__write(tick, action)
+
+    def level(self, tick: int, level: int) -> None:
+        """Records a level change before a tick."""
+        self.__write(tick, LEVEL, bytes([level]))
+
+    def checkpoint(self, tick: int, simulation: Simulation) -> None:
+        """Records a keyframe if the last is at least a keyframe interval ago, and there's a live brick to save."""
+        if (tick - self.__last_keyframe >= self.__keyframe_interval) and (simulation.engine.matrix.brick is not None):
+            self.__write(tick, KEYFRAME_CODE, self.keyframe(simulation.engine))
+            self.__last_keyframe = tick
+
+    def close(self, tick: int) -> None:
+        """Finishes recording, at the tick the game ended or was abandoned."""
+        if self.__file is not None:
+            self.__write(tick, END)
+            self.__file.close()
+            self.__file = None
+
+    @staticmethod
+    def keyframe(engine: Engine) -> bytes:
+        """Returns the state of a settled game: board, live brick, stats, clock and position in the piece sequence.
+        Raises ValueError if there's no live brick (game over)."""
+        matrix = engine.matrix
+        brick = matrix.brick
+        if brick is None:
+            raise ValueError("No live brick to keyframe")
+        stats = engine.stats
+        cells = bytes(matrix.color_index_at(x, y) for y in range(1, 21) for x in range(1, 11))
+        return KEYFRAME.pack(engine.time, engine.last_drop_time, stats.current_score, stats.lines, matrix.generator.dealt,
+                             stats.level, brick.shape_num, brick.rotation, brick.x, brick.y, cells)
+
+
+class Replay:
+    """A recorded game, parsed for playback.  A recording cut short (e.g. by a crash) plays up to where it ends."""
+
+    def __init__(self, data: bytes) -> None:
+        """Class constructor.  Parses the recording, raises ValueError if it isn't one."""
+        if len(data) < HEADER.size:
+            raise ValueError("Not a Bricker replay")
+        magic, version, tick_rate, seed = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a Bricker replay")
+        if (version < 1) or (version > VERSION):
+            raise ValueError("Unsupported replay version {0}".format(version))
+        offset = HEADER.size
+        name = data[offset + 1:offset + 1 + data[offset]].decode("ascii")
+        offset += 1 + data[offset]
+        count = data[offset]
+        self.__tick_rate: int = tick_rate
+        self.__seed: int = seed
+        self.__generator: str = name
+        self.__drop_intervals: List[float] = list(struct.unpack_from("<{0}d".format(count), data, offset + 1))
+        offset += 1 + (count * 8)
+        flags = data[offset] if version >= 2 else 0
+        self.__instant_drop: bool = (flags & INSTANT_DROP) != 0
+        self.__input_ticks: array = array("I")
+        self.__input_codes: bytearray = bytearray()
+        self.__keyframes: List[Tuple[int, int, bytes]] = []     # (tick, index of next input, keyframe)
+        self.__ticks: int = 0
+        self.__complete: bool = False
+        self.__parse(data, offset + (1 if version >= 2 else 0))
+
+    @staticmethod
+    def load(path: str) -> 'Replay':
+        """Returns a replay read from a file."""
+        with open(path, "rb") as file:
+            return Replay(file.read())
+
+    def __parse(self, data: bytes, offset: int) -> None:
+        """Reads entries, up to the end of the recording or the last whole entry."""
+        tick = 0
+        try:
+            while offset < len(data):
+                delta, position = _read_varint(data, offset)
+                code = data[position]
+                position += 1
+                if code == END:
+                    tick += delta
+                    self.__complete = True
+                    break
+                elif code == KEYFRAME_CODE:
+                    keyframe = data[position:position + KEYFRAME.size]
+                    if len(keyframe) < KEYFRAME.size:
+                        break
+                    position += KEYFRAME.size
+                    self.__keyframes.append((tick + delta, len(self.__input_codes), keyframe))
+                else:
+                    if code == LEVEL:
+                        code += data[position]
+                        position += 1
+                    self.__input_ticks.append(tick + delta)
+                    self.__input_codes.append(code)
+                tick += delta
+                offset = position
+        except IndexError:
+            pass
+        self.__ticks = tick
+
+    @property
+    def tick_rate(self) -> int:
+        """Returns simulation ticks per second."""
+        return self.__tick_rate
+
+    @property
+    def seed(self) -> int:
+        """Returns the seed of the piece sequence."""
+        return self.__seed
+
+    @property
+    def generator(self) -> str:
+        """Returns the piece generator's name."""
+        return self.__generator
+
+    @property
+    def drop_intervals(self) -> List[float]:
+        """Returns brick drop interval (seconds) for each level."""
+        return self.__drop_intervals
+
+    @property
+    def instant_drop(self) -> bool:
+        """Returns true if the game was played with instant hard drops."""
+        return self.__instant_drop
+
+    @property
+    def ticks(self) -> int:
+        """Returns length of the recording, in ticks."""
+        return self.__ticks
+
+    @property
+    def complete(self) -> bool:
+        """Returns true if the recording was finished, rather than cut short."""
+        return self.__complete
+
+    @property
+    def inputs(self) -> int:
+        """Returns number of recorded actions and level changes."""
+        return len(self.__input_codes)
+
+    @property
+    def keyframes(self) -> List[int]:
+        """Returns ticks of the keyframes."""
+        return [x[0] for x in self.__keyframes]
+
+    def input(self, index: int) -> Tuple[int, int]:
+        """Returns (tick, code) of a recorded input: an action, or LEVEL plus the level set."""
+        return self.__input_ticks[index], self.__input_codes[index]
+
+    def keyframe_before(self, tick: int) -> Tuple[int, int, bytes]:
+        """Returns (tick, index of next input, keyframe) of the last keyframe at or before a tick."""
+        i = bisect_right(self.__keyframes, (tick, len(self.__input_codes) + 1, b""))
+        if i == 0:
+            raise ValueError("Replay has no keyframe")
+        return self.__keyframes[i - 1]
+
+    def playback(self, speed: float = 1.0, drop_intervals: Optional[List[float]] = None, line_points: Optional[Dict[int, int]] = None,
+                 drop_trail: bool = False) -> 'Playback':
+        """Returns a playback at the start of the recording.  SPEED sizes the tick scheduler's catch-up limit,
+        for playing through the renderer faster than real time.  Drop intervals and line points can be replaced
+        to see how the same inputs fare under other rules, though seeking past the start is then meaningless.
+        Instant drops leave trails if DROP_TRAIL is set, for watching."""
+        engine = Engine(GameStats(False), auto_clear=False, drop_intervals=drop_intervals if drop_intervals is not None else self.__drop_intervals,
+                        generator=GENERATORS[self.__generator](self.__seed), line_points=line_points)
+        scheduler = FixedStepScheduler(self.__tick_rate, max(5, int(math.ceil(5 * speed))))
+        return Playback(self, Simulation(engine, scheduler, self.__instant_drop, drop_trail))
+
+
+class Playback:
+    """Plays a replay by feeding its inputs to a simulation on the ticks they were recorded.  Seeking restores
+    the nearest keyframe, then simulates the few ticks after it."""
+
+    def __init__(self, replay: Replay, simulation: Simulation) -> None:
+        """Class constructor."""
+        self.__replay: Replay = replay
+        self.__simulation: Simulation = simulation
+        self.__next_input: int = 0
+        self.seek(0)
+
+    @property
+    def replay(self) -> Replay:
+        """Returns the replay."""
+        return self.__replay
+
+    @property
+    def simulation(self) -> Simulation:
+        """Returns the simulation being played."""
+        return self.__simulation
+
+    @property
+    def done(self) -> bool:
+        """Returns true once the end of the recording has been played."""
+        simulation = self.__simulation
+        if simulation.engine.game_over and not simulation.scheduler.busy:
+            return True
+        return simulation.ticks >= self.__replay.ticks
+
+    def seek(self, tick: int) -> None:
+        """Moves playback to a tick, restoring the last keyframe at or before it and simulating from there."""
+        keyframe_tick, self.__next_input, keyframe = self.__replay.keyframe_before(tick)
+        self.__restore(keyframe_tick, keyframe)
+        while (self.__simulation.ticks < tick) and not self.done:
+            self.tick()
+
+    def __restore(self, tick: int, keyframe: bytes) -> None:
+        """Sets the simulation to the state saved in a keyframe.  Raises ValueError if the piece sequence doesn't deal
+        the saved brick, i.e. the keyframe doesn't belong to this replay's seed and generator."""
+        time, last_drop_time, score, lines, dealt, level, shape, rotation, x, y, cells = KEYFRAME.unpack(keyframe)
+        simulation = self.__simulation
+        simulation.new_game(GameStats(False))
+        engine = simulation.engine
+        matrix = engine.matrix
+        matrix.generator.reset(self.__replay.seed, dealt - 1)
+        i = 0
+        for y_cell in range(1, 21):
+            for x_cell in range(1, 11):
+                matrix.set_cell_index(x_cell, y_cell, 1 if cells[i] != 0 else 0, cells[i])
+                i += 1
+        matrix.spawn_brick()
+        brick = matrix.brick
+        if (brick is None) or (brick.shape_num != shape):
+            raise ValueError("Replay keyframe doesn't match its piece sequence")
+        brick.place(x, y, rotation)
+        engine.stats.increment_score(score)
+        engine.stats.add_lines(lines)
+        engine.stats.level = level
+        engine.set_clock(time, last_drop_time)
+        simulation.ticks = tick
+
+    def tick(self) -> List[GameEvent]:
+        """Applies the inputs recorded for the current tick, then advances the simulation one tick.  Returns the
+        game events that happened."""
+        simulation = self.__simulation
+        replay = self.__replay
+        tick = simulation.ticks
+        while self.__next_input < replay.inputs:
+            input_tick, code = replay.input(self.__next_input)
+            if input_tick != tick:
+                break
+            if code >= LEVEL:
+                simulation.set_level(code - LEVEL)
+            else:
+                simulation.push(code)
+            self.__next_input += 1
+        return simulation.tick()
+
+    def run(self) -> None:
+        """Plays the rest of the recording as fast as possible."""
+        while not self.done:
+            self.tick()
+
+
+def main() -> None:
+    """Plays replays headlessly, prints each one's final state."""
+    parser = argparse.ArgumentParser(description="Plays Bricker replays headlessly at full speed.")
+    parser.add_argument("files", metavar="FILE", nargs="+", help="replay files")
+    parser.add_argument("--seek", type=int, metavar="TICK", help="stop at TICK instead of the end")
+    args = parser.parse_args()
+    print("{0:<32}{1:>8}{2:>8}{3:>10}{4:>8}{5:>10}".format("replay", "ticks", "inputs", "score", "lines", "msec"))
+    for path in args.files:
+        start = perf_counter()
+        replay = Replay.load(path)
+        playback = replay.playback()
+        if args.seek is not None:
+            playback.seek(args.seek)
+        else:
+            playback.run()
+        stats = playback.simulation.engine.stats
+        print("{0:<32}{1:>8}{2:>8}{3:>10}{4:>8}{5:>10.1f}".format(
+            path, playback.simulation.ticks, replay.inputs, stats.current_score, stats.lines, (perf_counter() - start) * 1000.0))
+
+
+# start main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List
+from abc import ABC, abstractmethod
+from engine import GameEvent
+
+
+class Animation(ABC):
+    """A non-blocking animation state machine, advanced one fixed tick at a time by the scheduler."""
+
+    blocking = True     # holds up play while running, see FixedStepScheduler.busy
+
+    def __init__(self) -> None:
+        """Class constructor."""
+        self.__done: bool = False
+
+    @property
+    def done(self) -> bool:
+        """Returns true once the animation has finished."""
+        return self.__done
+
+    def finish(self) -> None:
+        """Marks the animation finished, it's removed after the current tick."""
+        self.__done = True
+
+    @abstractmethod
+    def tick(self, seconds: float) -> List[GameEvent]:
+        """Advances the animation by one tick of SECONDS.  Returns game events it caused."""
+
+
+class FixedStepScheduler:
+    """Advances the simulation in fixed, deterministic ticks, independent of render rate.  Real elapsed time
+    is added to an accumulator, which is spent in whole ticks; the remainder gives the interpolation factor
+    for rendering between the last two ticks."""
+
+    def __init__(self, tick_rate: int = 60, max_ticks: int = 5) -> None:
+        """Class constructor.  At most MAX_TICKS run per frame, so a load spike slows the game down
+        briefly rather than stalling it catching up."""
+        self.__tick_rate: int = tick_rate
+        self.__tick_seconds: float = 1.0 / tick_rate
+        self.__max_ticks: int = max_ticks
+        self.__accumulator: float = 0.0
+        self.__ticks: int = 0
+        self.__animations: List[Animation] = []
+
+    @property
+    def tick_rate(self) -> int:
+        """Returns simulation ticks per second."""
+        return self.__tick_rate
+
+    @property
+    def tick_seconds(self) -> float:
+        """Returns length of a tick, in seconds."""
+        return self.__tick_seconds
+
+    @property
+    def ticks(self) -> int:
+        """Returns ticks run since the last reset."""
+        return self.__ticks
+
+    @property
+    def alpha(self) -> float:
+        """Returns fraction of a tick elapsed since the last tick, for interpolated rendering."""
+        return self.__accumulator / self.__tick_seconds
+
+    @property
+    def busy(self) -> bool:
+        """Returns true while any animation that holds up play is running."""
+        for animation in self.__animations:
+            if animation.blocking:
+                return True
+        return False
+
+    def reset(self) -> None:
+        """Clears the accumulator, tick count and running animations."""
+        self.__accumulator = 0.0
+        self.__ticks = 0
+        self.__animations = []
+
+    def advance(self, elapsed: float) -> int:
+        """Adds ELAPSED real seconds to the accumulator.  Returns number of ticks due to run now."""
+        self.__accumulator += elapsed
+        ticks = int(self.__accumulator / self.__tick_seconds)
+        if ticks > self.__max_ticks:
+            ticks = self.__max_ticks
+            self.__accumulator = self.__tick_seconds * ticks
+        self.__accumulator -= self.__tick_seconds * ticks
+        return ticks
+
+    def start(self, animation: Animation) -> None:
+        """Starts an animation, first advanced on the next tick."""
+        self.__animations.append(animation)
+
+    def tick(self) -> List[GameEvent]:
+        """Runs one tick of every running animation, removing finished ones.  Returns game events they caused."""
+        self.__ticks += 1
+        events: List[GameEvent] = []
+        for animation in list(self.__animations):
+            events += animation.tick(self.__tick_seconds)
+        self.__animations = [x for x in self.__animations if not x.done]
+        return events
@@ -28,6 +28,9 @@ setup(
     include_package_data=True,
     zip_safe=False,
     install_requires=requirements,
+    extras_require={
+        "numpy": ["numpy>=1.17"]
+    },
     package_data={
         "": ["*.py", "*.txt", "*.png", "*.ttf"]
     },
@@ -0,0 +1,176 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Deque, Optional
+from abc import ABC, abstractmethod
+from collections import deque
+from engine import Engine, EngineState, Actions, GameEvent
+from scheduler import FixedStepScheduler
+from animations import DropAnimation, DropTrailAnimation, EraseRowsAnimation
+from game_stats import GameStats
+
+
+class Simulation:
+    """Headless game play in fixed ticks: the engine, the animations that hold up play, and the buffered player
+    actions.  Shared by the game loop and replay playback, so both advance the game identically.  Everything
+    that changes the game is reported to an optional recorder."""
+
+    def __init__(self, engine: Engine, scheduler: Optional[FixedStepScheduler] = None, instant_drop: bool = False, drop_trail: bool = False,
+                 undo_depth: int = 0) -> None:
+        """Class constructor.  With instant drop, a hard drop lands the brick on the tick it's applied, instead of
+        animating its fall while later actions wait.  With drop trail, an instant drop also leaves a trail behind,
+        which doesn't hold up play.  Up to UNDO_DEPTH placed bricks can be taken back, see undo()."""
+        self.__engine: Engine = engine
+        self.__scheduler: FixedStepScheduler = scheduler if scheduler is not None else FixedStepScheduler(60)
+        self.__instant_drop: bool = instant_drop
+        self.__drop_trail: bool = drop_trail
+        self.__trail: Optional[DropTrailAnimation] = None
+        self.__actions: Deque[int] = deque()
+        self.__ticks: int = 0
+        self.__recorder: Optional['Recorder'] = None
+        self.__undo_depth: int = undo_depth
+        self.__spawns: Deque[EngineState] = deque(maxlen=undo_depth + 1)     # game as each brick spawned, newest last
+
+    @property
+    def engine(self) -> Engine:
+        """Returns the game engine."""
+        return self.__engine
+
+    @property
+    def scheduler(self) -> FixedStepScheduler:
+        """Returns the tick scheduler, which also runs the animations."""
+        return self.__scheduler
+
+    @property
+    def instant_drop(self) -> bool:
+        """Returns true if hard drops land instantly, rather than animating."""
+        return self.__instant_drop
+
+    @property
+    def trail(self) -> Optional[DropTrailAnimation]:
+        """Returns the last instant drop's trail while it's showing, else none."""
+        if (self.__trail is not None) and self.__trail.done:
+            self.__trail = None
+        return self.__trail
+
+    @property
+    def ticks(self) -> int:
+        """Returns ticks run since the game started."""
+        return self.__ticks
+
+    @ticks.setter
+    def ticks(self, value: int) -> None:
+        """Sets the tick count, used to resume a game from saved state."""
+        self.__ticks = value
+
+    @property
+    def recorder(self) -> Optional['Recorder']:
+        """Returns the recorder, if any."""
+        return self.__recorder
+
+    @recorder.setter
+    def recorder(self, value: Optional['Recorder']) -> None:
+        """Sets the recorder, or none to stop recording."""
+        self.__recorder = value
+
+    @property
+    def settled(self) -> bool:
+        """Returns true between bricks' moves: no animation running, no filled rows waiting, game not over."""
+        return (not self.__scheduler.busy) and (len(self.__engine.pending_rows) == 0) and (not self.__engine.game_over)
+
+    def new_game(self, stats: Optional[GameStats] = None, seed: Optional[int] = None) -> None:
+        """Resets state and starts a new game.  If a seed is given the piece sequence restarts from it."""
+        self.__scheduler.reset()
+        self.__actions.clear()
+        self.__ticks = 0
+        self.__trail = None
+        self.__engine.new_game(stats, seed)
+        self.__spawns.clear()
+        if self.__undo_depth > 0:
+            self.__spawns.append(self.__engine.snapshot())
+
+    def push(self, action: int) -> None:
+        """Buffers a player action, applied on the first tick play isn't held up by an animation."""
+        self.__actions.append(action)
+
+    def set_level(self, level: int) -> None:
+        """Sets the level, from the next tick on."""
+        self.__engine.stats.level = level
+        if self.__recorder is not None:
+            self.__recorder.level(self.__ticks, level)
+
+    def undo(self) -> bool:
+        """Takes back the last brick placed, returning the game to when it spawned.  Running animations and buffered
+        actions are dropped.  Not available while recording, as replays can't express it.  Returns true if undone."""
+        if (self.__recorder is not None) or (len(self.__spawns) == 0):
+            return False
+        placed = self.__engine.game_over or (len(self.__engine.pending_rows) > 0)
+        if not placed:
+            if len(self.__spawns) < 2:
+                return False
+            self.__spawns.pop()
+        self.__scheduler.reset()
+        self.__actions.clear()
+        self.__trail = None
+        self.__engine.restore(self.__spawns[-1])
+        return True
+
+    def tick(self) -> List[GameEvent]:
+        """Advances the game one fixed tick: running animations, or else the next buffered player action and gravity.
+        Returns the game events that happened."""
+
+        # saved state?
+        tick = self.__ticks
+        self.__ticks += 1
+        if (self.__recorder is not None) and self.settled:
+            self.__recorder.checkpoint(tick, self)
+
+        # animations hold up play, actions stay buffered meanwhile
+        if self.__scheduler.busy:
+            events = self.__scheduler.tick()
+            self.handle_events(events)
+            return events
+        self.__scheduler.tick()
+        if self.__engine.game_over:
+            return []
+
+        # player action, drop brick on timer
+        action = self.__actions.popleft() if len(self.__actions) > 0 else Actions.Nothing
+        if (action != Actions.Nothing) and (self.__recorder is not None):
+            self.__recorder.action(tick, action)
+        if action == Actions.Drop:
+            if not self.__instant_drop:
+                self.__scheduler.start(DropAnimation(self.__engine))
+                return []
+            matrix = self.__engine.matrix
+            if self.__drop_trail and (matrix.brick is not None):
+                self.__trail = DropTrailAnimation(matrix.brick, matrix.drop_distance())
+                self.__scheduler.start(self.__trail)
+        events = self.__engine.step(action, self.__scheduler.tick_seconds)
+        self.handle_events(events)
+        return events
+
+    def handle_events(self, events: List[GameEvent]) -> None:
+        """Starts animations for game events emitted by the engine."""
+        for event in events:
+            if event.event_type == GameEvent.RowsFilled:
+                self.__scheduler.start(EraseRowsAnimation(self.__engine, event.rows))
+            elif (event.event_type == GameEvent.BrickSpawned) and (self.__undo_depth > 0):
+                self.__spawns.append(self.__engine.snapshot())
+
+
+class Recorder(ABC):
+    """Receives everything that changes a simulated game, see Simulation."""
+
+    @abstractmethod
+    def action(self, tick: int, action: int) -> None:
+        """Called when a player action is applied on a tick."""
+
+    @abstractmethod
+    def level(self, tick: int, level: int) -> None:
+        """Called when the level is set, before a tick."""
+
+    @abstractmethod
+    def checkpoint(self, tick: int, simulation: 'Simulation') -> None:
+        """Called before each tick the game is settled, a chance to save its state."""
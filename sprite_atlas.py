@@ -0,0 +1,103 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Tuple, List, Dict, Sequence
+import pygame
+from pygame import Surface, Rect
+from color import Colors, Color
+
+
+class SpriteAtlas:
+    """Pre-rendered matrix space tiles, one per palette color, packed into one surface for batched blits.
+    Tiles can be looked up by RGB value, or by index into the palette the atlas was built from.  Outlined ghost
+    tiles, showing where a brick will land, are by palette index only."""
+
+    TILE_SIZE = 32          # matrix space
+    BORDERED_SIZE = 35      # exploding space, 34x34 plus closing border line
+    DOT_SIZE = 2            # debug dot
+
+    def __init__(self, colors: Sequence[Color]) -> None:
+        """Class constructor.  Must be called after display mode is set."""
+        stride = self.BORDERED_SIZE
+        self.__surface: Surface = Surface(((len(colors) + 1) * stride, stride * 3))
+        self.__surface = self.__surface.convert(self.__surface)
+        self.__surface.fill(Colors.Black.value)
+        self.__tiles: Dict[Tuple[int, int, int], Tuple[Surface, Rect]] = {}
+        self.__bordered_tiles: Dict[Tuple[int, int, int], Tuple[Surface, Rect]] = {}
+        self.__ghost_tiles: Dict[Tuple[int, int, int], Tuple[Surface, Rect]] = {}
+        for i, color in enumerate(colors):
+            self.__add_tiles(self.__surface, i * stride, color.value)
+        self.__indexed_tiles: List[Tuple[Surface, Rect]] = [self.__tiles[x.value] for x in colors]
+        self.__indexed_bordered_tiles: List[Tuple[Surface, Rect]] = [self.__bordered_tiles[x.value] for x in colors]
+        self.__indexed_ghost_tiles: List[Tuple[Surface, Rect]] = [self.__ghost_tiles[x.value] for x in colors]
+        self.__shard_tiles: Dict[int, List[Tuple[Surface, Rect]]] = {}
+        dot_rect = Rect(len(colors) * stride, 0, self.DOT_SIZE, self.DOT_SIZE)
+        self.__surface.fill(Colors.White.value, dot_rect)
+        self.__dot: Tuple[Surface, Rect] = (self.__surface, dot_rect)
+
+    @property
+    def surface(self) -> Surface:
+        """Returns the atlas surface."""
+        return self.__surface
+
+    @property
+    def dot(self) -> Tuple[Surface, Rect]:
+        """Returns source surface and area of the debug dot."""
+        return self.__dot
+
+    def tile(self, color: Tuple[int, int, int]) -> Tuple[Surface, Rect]:
+        """Returns source surface and area of a matrix space tile."""
+        tile = self.__tiles.get(color)
+        if tile is None:
+            tile = self.__add_color(color)[0]
+        return tile
+
+    def tile_at(self, index: int) -> Tuple[Surface, Rect]:
+        """Returns source surface and area of a matrix space tile, by palette index."""
+        return self.__indexed_tiles[index]
+
+    def ghost_tile_at(self, index: int) -> Tuple[Surface, Rect]:
+        """Returns source surface and area of an outlined ghost tile, by palette index."""
+        return self.__indexed_ghost_tiles[index]
+
+    def bordered_tile(self, color: Tuple[int, int, int]) -> Tuple[Surface, Rect]:
+        """Returns source surface and area of a bordered exploding space tile."""
+        tile = self.__bordered_tiles.get(color)
+        if tile is None:
+            tile = self.__add_color(color)[1]
+        return tile
+
+    def shard_tiles(self, shards: int) -> List[Tuple[Surface, Rect]]:
+        """Returns source surface and area of bordered tile shards, split shards x shards, by particle sprite
+        number (palette index * shards^2 + shard number, rows first)."""
+        tiles = self.__shard_tiles.get(shards)
+        if tiles is None:
+            size = self.BORDERED_SIZE // shards
+            tiles = []
+            for surface, rect in self.__indexed_bordered_tiles:
+                for shard in range(0, shards * shards):
+                    tiles.append((surface, Rect(rect.x + ((shard % shards) * size), rect.y + ((shard // shards) * size), size, size)))
+            self.__shard_tiles[shards] = tiles
+        return tiles
+
+    def __add_color(self, color: Tuple[int, int, int]) -> Tuple[Tuple[Surface, Rect], Tuple[Surface, Rect]]:
+        """Renders tiles for a color missing from the palette onto their own surface."""
+        surface = Surface((self.BORDERED_SIZE, self.BORDERED_SIZE * 3))
+        surface = surface.convert(surface)
+        self.__add_tiles(surface, 0, color)
+        return self.__tiles[color], self.__bordered_tiles[color]
+
+    def __add_tiles(self, surface: Surface, x: int, color: Tuple[int, int, int]) -> None:
+        """Renders plain, bordered and ghost tiles for a color at X position of surface."""
+        tile_rect = Rect(x, 0, self.TILE_SIZE, self.TILE_SIZE)
+        surface.fill(color, tile_rect)
+        self.__tiles[color] = (surface, tile_rect)
+        bordered_rect = Rect(x, self.BORDERED_SIZE, self.BORDERED_SIZE, self.BORDERED_SIZE)
+        surface.fill(color, bordered_rect)
+        pygame.draw.rect(surface, Colors.Black.value, bordered_rect, 1)
+        self.__bordered_tiles[color] = (surface, bordered_rect)
+        ghost_rect = Rect(x, self.BORDERED_SIZE * 2, self.TILE_SIZE, self.TILE_SIZE)
+        surface.fill(Colors.Black.value, ghost_rect)
+        pygame.draw.rect(surface, color, ghost_rect, 2)
+        self.__ghost_tiles[color] = (surface, ghost_rect)
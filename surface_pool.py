@@ -0,0 +1,45 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Dict, List, Tuple
+import pygame
+from pygame import Surface
+
+
+class SurfacePool:
+    """Pre-converted transparent surfaces, handed out by size and reused once released, so redrawing
+    panels doesn't allocate and pixel-convert new surfaces."""
+
+    def __init__(self, max_free: int = 4) -> None:
+        """Class constructor.  Keeps at most MAX_FREE released surfaces of each size."""
+        self.__max_free: int = max_free
+        self.__free: Dict[Tuple[int, int], List[Surface]] = {}
+        self.__allocations: int = 0
+
+    @property
+    def allocations(self) -> int:
+        """Returns number of surfaces allocated, because none of the size were free."""
+        return self.__allocations
+
+    @property
+    def free(self) -> int:
+        """Returns number of released surfaces waiting for reuse."""
+        return sum(len(x) for x in self.__free.values())
+
+    def acquire(self, size: Tuple[int, int]) -> Surface:
+        """Returns a cleared surface of the given size, reusing a released one if possible."""
+        free = self.__free.get(size)
+        if free:
+            surface = free.pop()
+            surface.fill((0, 0, 0, 0))
+            return surface
+        self.__allocations += 1
+        surface = Surface(size, pygame.SRCALPHA, 32)
+        return surface.convert_alpha(surface)
+
+    def release(self, surface: Surface) -> None:
+        """Returns a surface to the pool.  It mustn't be used by the caller afterwards."""
+        free = self.__free.setdefault(surface.get_size(), [])
+        if len(free) < self.__max_free:
+            free.append(surface)
@@ -0,0 +1,250 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Tuple, Any
+from random import Random
+import pytest
+from matrix import Matrix
+from engine import Engine
+from game_stats import GameStats
+from pieces import PieceGenerator, RandomGenerator, BagGenerator
+from simulation import Simulation
+from scheduler import FixedStepScheduler
+from replay import Replay, ReplayWriter
+from bot import Bot
+from transposition import TABLES
+import zobrist
+
+
+class FixedGenerator(PieceGenerator):
+    """Deals a given sequence of shapes, then I bricks."""
+
+    name = "fixed"
+
+    def __init__(self, shapes: List[int]) -> None:
+        """Class constructor."""
+        self.__shapes: List[int] = list(shapes)
+        super().__init__(1)
+
+    def generate_batch(self, count: int) -> List[int]:
+        """Returns the next COUNT shapes of the sequence."""
+        batch = self.__shapes[0:count]
+        del self.__shapes[0:count]
+        return batch + ([1] * (count - len(batch)))
+
+
+def check_indexes(matrix: Matrix) -> None:
+    """Asserts a matrix's incremental indexes and hash match a recount of its spaces."""
+    grid = matrix.matrix
+    holes = 0
+    for y in range(1, 21):
+        assert matrix.row_fill_counts[y] == sum(grid[x][y] for x in range(1, 11))
+    for x in range(1, 11):
+        solid = [y for y in range(1, 21) if grid[x][y] == 1]
+        height = (21 - solid[0]) if len(solid) > 0 else 0
+        assert matrix.column_heights[x] == height
+        assert matrix.column_holes[x] == height - len(solid)
+        holes += height - len(solid)
+    assert matrix.holes == holes
+    assert matrix.identify_solid_rows() == [y for y in range(1, 21) if all(grid[x][y] == 1 for x in range(1, 11))]
+    assert matrix.board_hash == zobrist.board_hash(matrix.rows)
+
+
+def engine_state(engine: Engine) -> Tuple[Any, ...]:
+    """Returns everything that decides how a game plays on."""
+    matrix = engine.matrix
+    brick = matrix.brick
+    return (bytes(matrix.color_indexes), list(matrix.rows), engine.stats.current_score, engine.stats.lines, engine.stats.level,
+            engine.time, engine.game_over, brick.snapshot() if brick is not None else None, matrix.generator.dealt)
+
+
+def test_matrix_indexes_match_recount() -> None:
+    """Random edits and row clears keep counts, heights, holes and hash in step with the spaces."""
+    random = Random(1)
+    matrix = Matrix(RandomGenerator(1))
+    matrix.new_game(1)
+    for i in range(0, 5000):
+        matrix.set_cell_index(random.randint(1, 10), random.randint(1, 20), 1 if random.random() < 0.6 else 0, 3)
+        if i % 97 == 0:
+            matrix.clear_rows(matrix.identify_solid_rows() if random.random() < 0.7 else [random.randint(1, 20)])
+        if i % 13 == 0:
+            check_indexes(matrix)
+    check_indexes(matrix)
+    matrix.new_game()
+    check_indexes(matrix)
+
+
+def test_bot_game_indexes_match_recount() -> None:
+    """Bricks added and rows cleared by real play keep the indexes in step."""
+    engine = Engine(GameStats(False), generator=RandomGenerator(4))
+    engine.new_game(seed=4)
+    bot = Bot()
+    for _ in range(0, 3000):
+        engine.step(bot.next_action(engine.matrix), 1 / 60)
+        check_indexes(engine.matrix)
+        if engine.game_over:
+            break
+    assert engine.stats.lines > 0
+
+
+def test_snapshot_restore_and_clone() -> None:
+    """Restoring a snapshot replays identically, and clones don't share changes with the original."""
+    engine = Engine(GameStats(False), generator=BagGenerator(2))
+    engine.new_game(seed=2)
+    bot = Bot()
+    for _ in range(0, 600):
+        engine.step(bot.next_action(engine.matrix), 1 / 60)
+    state = engine.snapshot()
+    before = engine_state(engine)
+    after = []
+    for _ in range(0, 600):
+        engine.step(bot.next_action(engine.matrix), 1 / 60)
+        after.append(engine_state(engine))
+    engine.restore(state)
+    check_indexes(engine.matrix)
+    assert engine_state(engine) == before
+    bot.reset()
+    for expected in after:
+        engine.step(bot.next_action(engine.matrix), 1 / 60)
+        assert engine_state(engine) == expected
+
+    # clone diverges without touching the original
+    matrix = engine.matrix
+    rows = list(matrix.rows)
+    clone = matrix.clone()
+    assert clone.state_hash == matrix.state_hash
+    clone.drop_brick()
+    clone.add_brick_to_matrix()
+    clone.spawn_brick()
+    check_indexes(clone)
+    check_indexes(matrix)
+    assert matrix.rows == rows
+    assert matrix.generator.dealt + 1 == clone.generator.dealt
+
+
+@pytest.mark.parametrize("generator", [RandomGenerator, BagGenerator])
+def test_replay_round_trip_and_seek(tmp_path: Any, generator: Any) -> None:
+    """A recorded game plays back tick for tick, and seeking lands on the recorded state."""
+    random = Random(3)
+    path = str(tmp_path / "game.rep")
+    simulation = Simulation(Engine(GameStats(False), auto_clear=False, generator=generator()), FixedStepScheduler(60))
+    simulation.new_game(GameStats(False), 3)
+    writer = ReplayWriter(path, simulation, keyframe_interval=300)
+    simulation.recorder = writer
+    states = [engine_state(simulation.engine)]
+    while (simulation.scheduler.busy or not simulation.engine.game_over) and (simulation.ticks < 20000):
+        if random.random() < 0.05:
+            simulation.push(random.choice([1, 2, 1, 2, 3, 4, 4, 5]))
+        if random.random() < 0.002:
+            simulation.set_level(random.randint(1, 10))
+        simulation.tick()
+        states.append(engine_state(simulation.engine))
+    writer.close(simulation.ticks)
+
+    # play through
+    replay = Replay.load(path)
+    playback = replay.playback()
+    assert engine_state(playback.simulation.engine) == states[0]
+    while not playback.done:
+        playback.tick()
+        assert engine_state(playback.simulation.engine) == states[playback.simulation.ticks]
+    assert playback.simulation.ticks == len(states) - 1
+
+    # seek
+    for tick in list(replay.keyframes) + [random.randrange(len(states)) for _ in range(0, 10)]:
+        playback.seek(tick)
+        assert engine_state(playback.simulation.engine) == states[tick]
+
+
+def test_replay_skips_keyframes_without_brick(tmp_path: Any) -> None:
+    """With no live brick (between a lock and the next spawn), no keyframe is written and the replay still loads."""
+    path = str(tmp_path / "game.rep")
+    simulation = Simulation(Engine(GameStats(False), auto_clear=False, generator=RandomGenerator(1)), FixedStepScheduler(60))
+    simulation.new_game(GameStats(False), 1)
+    writer = ReplayWriter(path, simulation, keyframe_interval=1)
+    simulation.recorder = writer
+    for _ in range(0, 30):
+        simulation.tick()
+    simulation.engine.matrix.add_brick_to_matrix()
+    with pytest.raises(ValueError):
+        ReplayWriter.keyframe(simulation.engine)
+    writer.checkpoint(simulation.ticks + 1, simulation)
+    writer.close(simulation.ticks)
+    assert max(Replay.load(path).keyframes) <= simulation.ticks
+
+
+def test_numpy_board_clear_matches_matrix() -> None:
+    """Clearing rows on a NumPy board leaves the same spaces and colors as Matrix.clear_rows."""
+    numpy = pytest.importorskip("numpy")
+    from numpy_board import NumpyBoard
+    random = Random(5)
+    for _ in range(0, 50):
+        matrix = Matrix(RandomGenerator(1))
+        matrix.new_game(1)
+        for y in range(random.randint(1, 20), 21):
+            for x in range(1, 11):
+                if (random.random() < 0.85) or (y % 3 == 0):
+                    matrix.set_cell_index(x, y, 1, random.randint(1, 16))
+        board = NumpyBoard.from_matrix(matrix)
+        solid = matrix.identify_solid_rows()
+        assert board.identify_solid_rows() == solid
+        assert board.clear_solid_rows() == len(solid)
+        matrix.clear_rows(solid)
+        expected = NumpyBoard.from_matrix(matrix)
+        assert numpy.array_equal(board.occupancy, expected.occupancy)
+        assert numpy.array_equal(board.colors, expected.colors)
+
+
+def test_vector_env_matches_engine() -> None:
+    """Each VectorEnv board plays out exactly as an Engine dealt the same shapes and given the same actions."""
+    numpy = pytest.importorskip("numpy")
+    from vector_env import VectorEnv
+    count, steps, gravity = 16, 600, 7
+    env = VectorEnv(count, seed=3, gravity_steps=gravity, auto_reset=False)
+    actions = numpy.random.default_rng(5).choice(6, size=(steps, count), p=[0.3, 0.15, 0.15, 0.1, 0.2, 0.1])
+    shapes: List[List[int]] = [[int(env.shapes[i])] for i in range(0, count)]
+    history = []
+    alive = numpy.ones(count, dtype=bool)
+    for step in range(0, steps):
+        pieces = env.pieces.copy()
+        _, dones = env.step(numpy.where(alive, actions[step], 0))
+        for i in numpy.flatnonzero((env.pieces > pieces) & alive):
+            shapes[i].append(int(env.shapes[i]))
+        history.append((env.occupancy.copy(), env.shapes.copy(), env.rotations.copy(), env.xs.copy(), env.ys.copy(),
+                        env.scores.copy(), env.lines.copy(), dones.copy(), alive.copy()))
+        alive &= ~dones
+
+    # replay each board through the engine
+    for i in range(0, count):
+        engine = Engine(GameStats(False), drop_intervals=[float(gravity)] * 20, generator=FixedGenerator(shapes[i]))
+        engine.new_game()
+        for step in range(0, steps):
+            occupancy, shape, rotation, x, y, score, lines, done, was_alive = history[step]
+            if not was_alive[i]:
+                break
+            engine.step(int(actions[step, i]), 1.0)
+            matrix = engine.matrix
+            solid = numpy.array([[matrix.matrix[column][row] for column in range(0, 12)] for row in range(0, 22)], dtype=numpy.uint8)
+            assert numpy.array_equal(solid, occupancy[i])
+            assert (engine.stats.current_score, engine.stats.lines, engine.game_over) == (score[i], lines[i], bool(done[i]))
+            if not engine.game_over:
+                brick = matrix.brick
+                assert brick is not None
+                assert (brick.shape_num, brick.rotation, brick.x, brick.y) == (shape[i], rotation[i], x[i], y[i])
+
+
+@pytest.mark.parametrize("name", sorted(TABLES))
+def test_transposition_table_bounds_and_depth(name: str) -> None:
+    """Tables never hold more than their capacity, and only answer lookups no deeper than stored."""
+    random = Random(7)
+    table = TABLES[name](64)
+    for i in range(0, 1000):
+        table.put(random.getrandbits(64), i, random.randint(0, 3))
+    assert table.count <= 64
+    table = TABLES[name](64)
+    table.put(7, "seven", 2)
+    assert table.get(7) == "seven"
+    assert table.get(7, 2) == "seven"
+    assert table.get(7, 3) is None
+    assert (table.hits, table.misses) == (2, 1)
@@ -0,0 +1,84 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Any, Iterator, Tuple
+import os
+import pytest
+from matrix import Matrix
+from game_stats import GameStats
+from pieces import RandomGenerator
+
+pygame = pytest.importorskip("pygame")
+SCREEN_SIZE = (1000, 700)
+BOARD_AREA = ((SCREEN_SIZE[0] - 333) // 2, (SCREEN_SIZE[1] - 663) // 2, 333, 663)
+
+
+@pytest.fixture
+def screen(monkeypatch: Any) -> Iterator[Any]:
+    """Yields an offscreen display, fonts loaded from the game folder."""
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    pygame.init()
+    yield pygame.display.set_mode(SCREEN_SIZE)
+    pygame.quit()
+
+
+def new_renderer(screen: Any) -> Any:
+    """Returns a renderer drawing to the screen."""
+    from pygame.time import Clock
+    from renderer import Renderer
+    return Renderer("1.0", SCREEN_SIZE, screen, Clock())
+
+
+def filled_matrix(seed: int, top: int) -> Matrix:
+    """Returns a seeded matrix with rows top to 20 filled, one seeded gap per row."""
+    matrix = Matrix(RandomGenerator(seed))
+    matrix.new_game(seed)
+    for y in range(top, 21):
+        for x in range(1, 11):
+            if x != ((y * seed) % 10) + 1:
+                matrix.set_cell_index(x, y, 1, (x + y + seed) % 15 + 1)
+    matrix.spawn_brick()
+    return matrix
+
+
+def pixels(screen: Any, area: Tuple[int, int, int, int]) -> bytes:
+    """Returns the RGB pixels of part of the screen."""
+    return pygame.image.tostring(screen.subsurface(area), "RGB")
+
+
+def test_frame_after_another_matrix(screen: Any) -> None:
+    """A matrix drawn after another shows its own spaces, as if drawn by a fresh renderer."""
+    game = filled_matrix(1, 12)
+    demo = filled_matrix(2, 5)
+    stats = GameStats(False)
+    new_renderer(screen).update_frame(game, stats, None)
+    expected = pixels(screen, BOARD_AREA)
+
+    renderer = new_renderer(screen)
+    renderer.update_frame(game, stats, None)
+    renderer.update_frame(demo, stats, None)
+    assert pixels(screen, BOARD_AREA) != expected
+    renderer.invalidate()
+    renderer.update_frame(game, stats, None)
+    assert pixels(screen, BOARD_AREA) == expected
+    renderer.update_frame(demo, stats, None)
+    renderer.update_frame(game, stats, None)
+    assert pixels(screen, BOARD_AREA) == expected
+
+
+def test_menu_after_another_matrix(screen: Any) -> None:
+    """The menu's snapshot of a paused game isn't left showing a game drawn in between."""
+    game = filled_matrix(1, 12)
+    demo = filled_matrix(2, 5)
+    stats = GameStats(False)
+    new_renderer(screen).draw_menu(game, stats, 1, True)
+    expected = pixels(screen, (0, 0) + SCREEN_SIZE)
+
+    renderer = new_renderer(screen)
+    renderer.draw_menu(game, stats, 1, True)
+    renderer.update_frame(demo, stats, None)
+    renderer.invalidate()
+    renderer.draw_menu(game, stats, 1, True)
+    assert pixels(screen, (0, 0) + SCREEN_SIZE) == expected
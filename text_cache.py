@@ -0,0 +1,60 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Tuple
+from collections import OrderedDict
+from pygame import Surface
+from pygame.font import Font
+
+
+class TextCache:
+    """Caches rendered text surfaces, evicting the least recently used when full."""
+
+    def __init__(self, max_size: int = 256) -> None:
+        """Class constructor."""
+        self.__max_size: int = max_size
+        self.__surfaces: 'OrderedDict[Tuple[Font, str, bool, Tuple[int, int, int]], Surface]' = OrderedDict()
+        self.__hits: int = 0
+        self.__misses: int = 0
+
+    @property
+    def max_size(self) -> int:
+        """Returns maximum number of cached surfaces."""
+        return self.__max_size
+
+    @property
+    def size(self) -> int:
+        """Returns number of cached surfaces."""
+        return len(self.__surfaces)
+
+    @property
+    def hits(self) -> int:
+        """Returns number of renders served from cache."""
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        """Returns number of renders that had to be rasterized."""
+        return self.__misses
+
+    def render(self, font: Font, text: str, antialias: bool, color: Tuple[int, int, int]) -> Surface:
+        """Returns rendered text surface, rasterizing only on cache miss.  Surfaces are shared, don't draw on them."""
+        key = (font, text, antialias, color)
+        surface = self.__surfaces.get(key)
+        if surface is not None:
+            self.__hits += 1
+            self.__surfaces.move_to_end(key)
+            return surface
+        self.__misses += 1
+        surface = font.render(text, antialias, color)
+        self.__surfaces[key] = surface
+        if len(self.__surfaces) > self.__max_size:
+            self.__surfaces.popitem(last=False)
+        return surface
+
+    def clear(self) -> None:
+        """Empties the cache and resets counters."""
+        self.__surfaces.clear()
+        self.__hits = 0
+        self.__misses = 0
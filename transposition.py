@@ -0,0 +1,153 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Tuple, Optional, Any, Dict, Type
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class TranspositionTable(ABC):
+    """Bounded cache of search results keyed by position hash (see zobrist module), each stored with the depth
+    it was searched to.  A result is only returned for lookups of the same depth or shallower.  Subclasses
+    decide what's evicted once the table is full."""
+
+    name = ""
+
+    def __init__(self, capacity: int = 16384) -> None:
+        """Class constructor.  Holds at most CAPACITY results."""
+        self.__capacity: int = max(capacity, 1)
+        self.__hits: int = 0
+        self.__misses: int = 0
+
+    @property
+    def capacity(self) -> int:
+        """Returns the most results held at once."""
+        return self.__capacity
+
+    @property
+    def hits(self) -> int:
+        """Returns lookups that found a result since the table was created or cleared."""
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        """Returns lookups that didn't find a result since the table was created or cleared."""
+        return self.__misses
+
+    @property
+    @abstractmethod
+    def count(self) -> int:
+        """Returns number of results held."""
+
+    def get(self, key: int, depth: int = 0) -> Optional[Any]:
+        """Returns the result stored for a position searched to at least DEPTH, or none."""
+        entry = self.lookup(key)
+        if (entry is None) or (entry[1] < depth):
+            self.__misses += 1
+            return None
+        self.__hits += 1
+        return entry[0]
+
+    def clear(self) -> None:
+        """Forgets all results and resets the hit counts."""
+        self.__hits = 0
+        self.__misses = 0
+
+    @abstractmethod
+    def lookup(self, key: int) -> Optional[Tuple[Any, int]]:
+        """Returns (result, depth) stored for a position, or none."""
+
+    @abstractmethod
+    def put(self, key: int, value: Any, depth: int = 0) -> None:
+        """Stores the result of a position searched to DEPTH, evicting another if full."""
+
+
+class LRUTable(TranspositionTable):
+    """Evicts the least recently used result, keeping whatever the search is currently working on."""
+
+    name = "lru"
+
+    def __init__(self, capacity: int = 16384) -> None:
+        """Class constructor."""
+        super().__init__(capacity)
+        self.__entries: 'OrderedDict[int, Tuple[Any, int]]' = OrderedDict()
+
+    @property
+    def count(self) -> int:
+        """Returns number of results held."""
+        return len(self.__entries)
+
+    def clear(self) -> None:
+        """Forgets all results and resets the hit counts."""
+        super().clear()
+        self.__entries.clear()
+
+    def lookup(self, key: int) -> Optional[Tuple[Any, int]]:
+        """Returns (result, depth) stored for a position, or none, marking it most recently used."""
+        entry = self.__entries.get(key)
+        if entry is not None:
+            self.__entries.move_to_end(key)
+        return entry
+
+    def put(self, key: int, value: Any, depth: int = 0) -> None:
+        """Stores the result of a position searched to DEPTH, evicting the least recently used if full."""
+        entries = self.__entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.capacity:
+            entries.popitem(last=False)
+        entries[key] = (value, depth)
+
+
+class DepthTable(TranspositionTable):
+    """Fixed slots addressed by hash, with no per-entry allocation or bookkeeping.  When two positions share a
+    slot, the one searched deeper is kept, as it cost more to work out."""
+
+    name = "depth"
+
+    def __init__(self, capacity: int = 16384) -> None:
+        """Class constructor."""
+        super().__init__(capacity)
+        self.__keys: List[int] = [-1] * self.capacity
+        self.__values: List[Any] = [None] * self.capacity
+        self.__depths: List[int] = [-1] * self.capacity
+        self.__count: int = 0
+
+    @property
+    def count(self) -> int:
+        """Returns number of results held."""
+        return self.__count
+
+    def clear(self) -> None:
+        """Forgets all results and resets the hit counts."""
+        super().clear()
+        self.__keys = [-1] * self.capacity
+        self.__values = [None] * self.capacity
+        self.__depths = [-1] * self.capacity
+        self.__count = 0
+
+    def lookup(self, key: int) -> Optional[Tuple[Any, int]]:
+        """Returns (result, depth) stored for a position, or none."""
+        slot = key % self.capacity
+        if self.__keys[slot] != key:
+            return None
+        return self.__values[slot], self.__depths[slot]
+
+    def put(self, key: int, value: Any, depth: int = 0) -> None:
+        """Stores the result of a position searched to DEPTH, unless its slot holds another searched deeper."""
+        slot = key % self.capacity
+        if self.__keys[slot] < 0:
+            self.__count += 1
+        elif (self.__keys[slot] != key) and (self.__depths[slot] > depth):
+            return
+        self.__keys[slot] = key
+        self.__values[slot] = value
+        self.__depths[slot] = depth
+
+
+# table name -> class
+TABLES: Dict[str, Type[TranspositionTable]] = {
+    LRUTable.name: LRUTable,
+    DepthTable.name: DepthTable
+}
@@ -0,0 +1,279 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import Tuple, Dict, Optional, Any
+from brick import SHAPES, SHAPE_COLOR_INDEXES, ROTATION_KICKS
+from engine import Engine, Actions
+from numpy_board import HEIGHT, WIDTH, new_boards, solid_rows, clear_solid_rows, require_numpy
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # type: ignore[assignment]
+
+
+def _shape_tables() -> Tuple[Any, Any, Any, Any]:
+    """Returns cell x and y offsets by shape, rotation and cell, shaped (8, 4, 4), and spawn x and y by shape."""
+    cell_x = numpy.zeros((8, 4, 4), dtype=numpy.int16)
+    cell_y = numpy.zeros((8, 4, 4), dtype=numpy.int16)
+    spawn_x = numpy.zeros(8, dtype=numpy.int16)
+    spawn_y = numpy.zeros(8, dtype=numpy.int16)
+    for shape_num in range(1, 8):
+        for rotation, orientation in enumerate(SHAPES[shape_num]):
+            for i, (x, y) in enumerate(orientation.cells):
+                cell_x[shape_num, rotation, i] = x
+                cell_y[shape_num, rotation, i] = y
+        spawn_x[shape_num] = int((WIDTH - SHAPES[shape_num][0].width) / 2)
+        spawn_y[shape_num] = 1 - SHAPES[shape_num][0].top_space
+    return cell_x, cell_y, spawn_x, spawn_y
+
+
+class VectorEnv:
+    """Steps many independent games at once, each board a slice of one (count, 22, 12) occupancy array with the
+    same walls, floor and ceiling as Matrix, and each live brick a slot in (shape, rotation, x, y) arrays.  Moves,
+    rotation kicks, gravity, locking, line clears and scoring follow Engine, but are applied to every board with a
+    handful of NumPy operations.  A step is one action per board, then gravity every few steps.
+
+    The arrays returned by the properties are the environment's own storage, updated in place by each step and
+    never reallocated, so agents can hold on to them as zero-copy observations."""
+
+    def __init__(self, count: int, seed: Optional[int] = None, gravity_steps: int = 30, auto_reset: bool = True,
+                 line_points: Optional[Dict[int, int]] = None) -> None:
+        """Class constructor.  Creates COUNT boards, each with a brick spawned.  Gravity moves bricks down every
+        GRAVITY_STEPS steps.  With auto reset, boards that top out are reset on the same step."""
+        require_numpy()
+        self.__count: int = count
+        self.__gravity_steps: int = gravity_steps
+        self.__auto_reset: bool = auto_reset
+        self.__random: Any = numpy.random.default_rng(seed)
+        points = line_points if line_points is not None else Engine.line_points
+        self.__line_points: Any = numpy.array([0] + [points[x] for x in range(1, 5)], dtype=numpy.int64)
+        self.__cell_x, self.__cell_y, self.__spawn_x, self.__spawn_y = _shape_tables()
+        self.__kicks: Any = numpy.array(ROTATION_KICKS, dtype=numpy.int16)
+        self.__colors_by_shape: Any = numpy.array(SHAPE_COLOR_INDEXES, dtype=numpy.uint8)
+        self.__occupancy, self.__colors = new_boards(count)
+        self.__empty_occupancy: Any = self.__occupancy[0].copy()
+        self.__shapes: Any = numpy.zeros(count, dtype=numpy.int16)
+        self.__rotations: Any = numpy.zeros(count, dtype=numpy.int16)
+        self.__xs: Any = numpy.zeros(count, dtype=numpy.int16)
+        self.__ys: Any = numpy.zeros(count, dtype=numpy.int16)
+        self.__next_shapes: Any = self.__random.integers(1, 8, count).astype(numpy.int16)
+        self.__timers: Any = numpy.zeros(count, dtype=numpy.int32)
+        self.__scores: Any = numpy.zeros(count, dtype=numpy.int64)
+        self.__lines: Any = numpy.zeros(count, dtype=numpy.int64)
+        self.__steps: Any = numpy.zeros(count, dtype=numpy.int64)
+        self.__pieces: Any = numpy.zeros(count, dtype=numpy.int64)
+        self.__rewards: Any = numpy.zeros(count, dtype=numpy.int64)
+        self.__dones: Any = numpy.zeros(count, dtype=bool)
+        self.__all: Any = numpy.arange(count)
+        self.__spawn(self.__all)
+
+    @property
+    def count(self) -> int:
+        """Returns number of boards."""
+        return self.__count
+
+    @property
+    def occupancy(self) -> Any:
+        """Returns the boards' occupancy, (count, 22, 12) [board][y][x], 1 if solid.  Live bricks aren't included."""
+        return self.__occupancy
+
+    @property
+    def colors(self) -> Any:
+        """Returns the boards' colors, (count, 22, 12) [board][y][x] palette indexes."""
+        return self.__colors
+
+    @property
+    def shapes(self) -> Any:
+        """Returns each board's live brick shape number (1-7)."""
+        return self.__shapes
+
+    @property
+    def rotations(self) -> Any:
+        """Returns each board's live brick rotation (0-3)."""
+        return self.__rotations
+
+    @property
+    def xs(self) -> Any:
+        """Returns each board's live brick X position."""
+        return self.__xs
+
+    @property
+    def ys(self) -> Any:
+        """Returns each board's live brick Y position."""
+        return self.__ys
+
+    @property
+    def next_shapes(self) -> Any:
+        """Returns each board's next brick shape number."""
+        return self.__next_shapes
+
+    @property
+    def scores(self) -> Any:
+        """Returns each board's score this game."""
+        return self.__scores
+
+    @property
+    def lines(self) -> Any:
+        """Returns each board's lines cleared this game."""
+        return self.__lines
+
+    @property
+    def pieces(self) -> Any:
+        """Returns each board's bricks spawned this game."""
+        return self.__pieces
+
+    @property
+    def steps(self) -> Any:
+        """Returns each board's steps taken this game."""
+        return self.__steps
+
+    def reset(self, boards: Optional[Any] = None) -> None:
+        """Starts new games on some boards, given as indexes or a boolean mask, or all of them."""
+        boards = self.__all if boards is None else self.__indexes(boards)
+        if len(boards) == 0:
+            return
+        self.__occupancy[boards] = self.__empty_occupancy
+        self.__colors[boards] = 0
+        self.__scores[boards] = 0
+        self.__lines[boards] = 0
+        self.__steps[boards] = 0
+        self.__pieces[boards] = 0
+        self.__next_shapes[boards] = self.__random.integers(1, 8, len(boards))
+        self.__spawn(boards)
+
+    def step(self, actions: Any) -> Tuple[Any, Any]:
+        """Applies one action per board (see engine.Actions), then gravity where due.  Returns (rewards, dones):
+        points scored this step, and boards that topped out (already reset, with auto reset).  Both arrays are
+        reused by the next step."""
+        actions = numpy.asarray(actions)
+        rewards = self.__rewards
+        rewards[:] = 0
+        self.__steps += 1
+
+        # player actions, down also restarts the gravity timer and scores a point when blocked, as in Engine
+        self.__move(numpy.flatnonzero(actions == Actions.Left), -1, 0)
+        self.__move(numpy.flatnonzero(actions == Actions.Right), 1, 0)
+        down = numpy.flatnonzero(actions == Actions.Down)
+        rewards[down[~self.__move(down, 0, 1)]] += 1
+        self.__timers[down] = 0
+        self.__rotate(numpy.flatnonzero(actions == Actions.Rotate))
+        drop = actions == Actions.Drop
+        dropped = numpy.flatnonzero(drop)
+        self.__ys[dropped] += self.__drop_distances(dropped)
+        rewards[dropped] += 3
+
+        # gravity, locks the brick if it can't move down
+        self.__timers += 1
+        due = numpy.flatnonzero((self.__timers >= self.__gravity_steps) & ~drop)
+        self.__timers[due] = 0
+        hit = due[~self.__move(due, 0, 1)]
+        rewards[hit] += 1
+
+        # lock, clear, spawn
+        locked = numpy.union1d(dropped, hit)
+        self.__lock(locked)
+        self.__scores += rewards
+        topped = locked[self.__spawn(locked)]
+        self.__dones[:] = False
+        self.__dones[topped] = True
+        if self.__auto_reset:
+            self.reset(topped)
+        return rewards, self.__dones
+
+    def drop_distances(self) -> Any:
+        """Returns how many rows each board's live brick can fall before it comes to rest."""
+        return self.__drop_distances(self.__all)
+
+    def observe(self, out: Optional[Any] = None) -> Any:
+        """Returns occupancy with the live bricks drawn in, (count, 22, 12), written into OUT if given so no array
+        is allocated."""
+        if out is None:
+            out = numpy.empty_like(self.__occupancy)
+        out[:] = self.__occupancy
+        x, y = self.__cells(self.__shapes, self.__rotations, self.__xs, self.__ys)
+        out[self.__all[:, None], y, x] = 1
+        return out
+
+    def __indexes(self, boards: Any) -> Any:
+        """Returns board indexes, given indexes or a boolean mask."""
+        boards = numpy.asarray(boards)
+        return numpy.flatnonzero(boards) if boards.dtype == bool else boards
+
+    def __cells(self, shapes: Any, rotations: Any, xs: Any, ys: Any) -> Tuple[Any, Any]:
+        """Returns x and y of each brick cell, shaped (boards, 4)."""
+        x = self.__cell_x[shapes, rotations] + xs[..., None]
+        y = self.__cell_y[shapes, rotations] + ys[..., None]
+        return x, y
+
+    def __collides(self, boards: Any, x: Any, y: Any) -> Any:
+        """Returns true where cells, shaped (boards, ..., 4), overlap a solid space or leave the matrix."""
+        inside = (x >= 0) & (x < WIDTH) & (y >= 0) & (y < HEIGHT)
+        index = boards.reshape(boards.shape + ((1,) * (x.ndim - 1)))
+        solid = self.__occupancy[index, numpy.clip(y, 0, HEIGHT - 1), numpy.clip(x, 0, WIDTH - 1)] != 0
+        return (solid | ~inside).any(axis=-1)
+
+    def __move(self, boards: Any, x: int, y: int) -> Any:
+        """Moves some boards' bricks, those that don't collide.  Returns true for each board that moved."""
+        if len(boards) == 0:
+            return numpy.zeros(0, dtype=bool)
+        cells_x, cells_y = self.__cells(self.__shapes[boards], self.__rotations[boards], self.__xs[boards] + x, self.__ys[boards] + y)
+        moved = ~self.__collides(boards, cells_x, cells_y)
+        self.__xs[boards[moved]] += x
+        self.__ys[boards[moved]] += y
+        return moved
+
+    def __rotate(self, boards: Any) -> None:
+        """Rotates some boards' bricks clockwise, trying each kick offset in turn, as Brick.rotate does."""
+        if len(boards) == 0:
+            return
+        rotations = (self.__rotations[boards] + 1) % 4
+        shapes = self.__shapes[boards]
+        cells_x = self.__cell_x[shapes, rotations][:, None, :] + (self.__xs[boards][:, None] + self.__kicks[:, 0])[..., None]
+        cells_y = self.__cell_y[shapes, rotations][:, None, :] + (self.__ys[boards][:, None] + self.__kicks[:, 1])[..., None]
+        fits = ~self.__collides(boards, cells_x, cells_y)
+        turned = fits.any(axis=1)
+        kick = self.__kicks[fits.argmax(axis=1)]
+        boards = boards[turned]
+        self.__rotations[boards] = rotations[turned]
+        self.__xs[boards] += kick[turned, 0]
+        self.__ys[boards] += kick[turned, 1]
+
+    def __drop_distances(self, boards: Any) -> Any:
+        """Returns how many rows some boards' bricks can fall, testing every distance at once."""
+        if len(boards) == 0:
+            return numpy.zeros(0, dtype=numpy.int16)
+        cells_x, cells_y = self.__cells(self.__shapes[boards], self.__rotations[boards], self.__xs[boards], self.__ys[boards])
+        distances = numpy.arange(HEIGHT, dtype=numpy.int16)[None, :, None]
+        hits = self.__collides(boards, numpy.broadcast_to(cells_x[:, None, :], (len(boards), HEIGHT, 4)), cells_y[:, None, :] + distances)
+        return (hits.argmax(axis=1) - 1).astype(numpy.int16)
+
+    def __lock(self, boards: Any) -> None:
+        """Adds some boards' bricks to their boards, clears filled rows and scores them."""
+        cells_x, cells_y = self.__cells(self.__shapes[boards], self.__rotations[boards], self.__xs[boards], self.__ys[boards])
+        index = boards[:, None]
+        self.__occupancy[index, cells_y, cells_x] = 1
+        self.__colors[index, cells_y, cells_x] = self.__colors_by_shape[self.__shapes[boards]][:, None]
+        filled = boards[solid_rows(self.__occupancy[boards]).any(axis=-1)]
+        if len(filled) > 0:
+            occupancy = self.__occupancy[filled]
+            colors = self.__colors[filled]
+            lines = clear_solid_rows(occupancy, colors)
+            self.__occupancy[filled] = occupancy
+            self.__colors[filled] = colors
+            self.__lines[filled] += lines
+            self.__rewards[filled] += self.__line_points[numpy.minimum(lines, 4)]
+
+    def __spawn(self, boards: Any) -> Any:
+        """Spawns the next brick on some boards.  Returns true for each board it collides on (game over)."""
+        shapes = self.__next_shapes[boards]
+        self.__shapes[boards] = shapes
+        self.__rotations[boards] = 0
+        self.__xs[boards] = self.__spawn_x[shapes]
+        self.__ys[boards] = self.__spawn_y[shapes]
+        self.__timers[boards] = 0
+        self.__pieces[boards] += 1
+        self.__next_shapes[boards] = self.__random.integers(1, 8, len(boards))
+        cells_x, cells_y = self.__cells(shapes, self.__rotations[boards], self.__xs[boards], self.__ys[boards])
+        return self.__collides(boards, cells_x, cells_y)
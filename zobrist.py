@@ -0,0 +1,47 @@
+"""Bricker - A Tetris-like brick game.
+Copyright (C) 2017-2020  John Hyland
+GNU GENERAL PUBLIC LICENSE Version 3"""
+
+from typing import List, Tuple
+from random import Random
+import bitboard
+
+
+# Zobrist keys: a board's hash is the XOR of the keys of its solid visible spaces, so filling or emptying a space
+# updates it with one XOR.  The live brick's key is the XOR of its shape and rotation, x and y keys.  Keys are
+# seeded, so hashes are the same from run to run.
+_random = Random(0x5EED2017)
+_HEIGHT = 22
+_Y_RANGE = _HEIGHT + (bitboard.PAD * 2)
+_X_RANGE = bitboard.MATRIX_WIDTH + (bitboard.PAD * 2)
+
+# y -> x -> key of a solid space
+CELL_KEYS: Tuple[Tuple[int, ...], ...] = tuple(tuple(_random.getrandbits(64) for _ in range(0, bitboard.MATRIX_WIDTH)) for _ in range(0, _HEIGHT))
+
+# shape number (1-7) -> rotation (0-3) -> key of a live brick's shape and rotation
+SHAPE_KEYS: Tuple[Tuple[int, ...], ...] = tuple(tuple(_random.getrandbits(64) for _ in range(0, 4)) for _ in range(0, 8))
+
+# x + PAD, y + PAD -> key of a live brick's position
+X_KEYS: Tuple[int, ...] = tuple(_random.getrandbits(64) for _ in range(0, _X_RANGE))
+Y_KEYS: Tuple[int, ...] = tuple(_random.getrandbits(64) for _ in range(0, _Y_RANGE))
+
+# shape number (1-7) -> key of the next brick, for hashing lookahead positions
+NEXT_KEYS: Tuple[int, ...] = tuple(_random.getrandbits(64) for _ in range(0, 8))
+
+
+def brick_key(shape_num: int, rotation: int, x: int, y: int) -> int:
+    """Returns the key of a live brick's shape, rotation and position."""
+    return SHAPE_KEYS[shape_num][rotation] ^ X_KEYS[x + bitboard.PAD] ^ Y_KEYS[y + bitboard.PAD]
+
+
+def board_hash(rows: List[int]) -> int:
+    """Returns the hash of a board's solid visible spaces, given as row bitmasks (see bitboard), worked out from scratch."""
+    value = 0
+    for y in range(1, len(rows) - 1):
+        row = rows[y]
+        if row != bitboard.EMPTY_ROW:
+            keys = CELL_KEYS[y]
+            for x in range(1, bitboard.MATRIX_WIDTH - 1):
+                if row & bitboard.cell_bit(x):
+                    value ^= keys[x]
+    return value